@@ -13,7 +13,7 @@ from PIL import Image
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from matching import multi_scale_template_match, basic_metrics
-from features import dominant_color, color_distance
+from features import dominant_colors_batch, color_distance_matrix
 
 
 def example_1_basic_matching():
@@ -63,24 +63,20 @@ def example_2_color_analysis():
     
     try:
         piece_files = [f for f in os.listdir(pieces_dir) if f.endswith('.png')][:5]
-        
-        colors = []
-        for piece_file in piece_files:
-            piece_path = os.path.join(pieces_dir, piece_file)
-            piece_img = Image.open(piece_path)
-            
-            dom_color = dominant_color(piece_img)
-            colors.append((piece_file, dom_color))
-            
+        piece_imgs = [Image.open(os.path.join(pieces_dir, f)) for f in piece_files]
+
+        # One vectorised call for all pieces
+        colors = dominant_colors_batch(piece_imgs)
+        for piece_file, dom_color in zip(piece_files, colors):
             print(f"{piece_file}: RGB{dom_color}")
-        
-        # Find most similar colors
-        print("\nColor similarities:")
-        for i, (file1, color1) in enumerate(colors):
-            for j, (file2, color2) in enumerate(colors[i+1:], i+1):
-                distance = color_distance(color1, color2)
-                print(f"{file1} <-> {file2}: distance = {distance:.1f}")
-        
+
+        # All-pairs colour distances (CIE Lab) in a single matrix
+        distances = color_distance_matrix(colors)
+        print("\nColor similarities (Lab delta E):")
+        for i, file1 in enumerate(piece_files):
+            for j in range(i + 1, len(piece_files)):
+                print(f"{file1} <-> {piece_files[j]}: distance = {distances[i, j]:.1f}")
+
     except Exception as e:
         print(f"Error in color analysis: {e}")
 
@@ -3,34 +3,50 @@
 Contains functions that interact with the user (input/print) to load
 the main puzzle image and an individual piece image. These functions
 loop until a valid image is loaded and always return a PIL Image.
+
+Non-interactive helpers (``open_image``, ``load_images``) decode files at
+reduced resolution when only a coarse level is needed and decode many
+piece files in parallel, returning lazily materialised images. Pillow is
+imported by the functions that decode, so importing this module (as the
+CLI does at start-up) stays cheap.
 """
 
+from __future__ import annotations
+
 import os
-from PIL import Image
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+	from PIL import Image
 
 
 def _select_image_from_directory(directory_path: str, label: str) -> Image.Image:
 	"""List images in a directory and let user choose one by index.
 
+	The listing comes from the directory's ``PieceIndex`` (header-only
+	metadata, refreshed incrementally), so large folders list instantly.
 	Returns a loaded PIL Image or raises an exception if selection fails.
 	"""
-	images_iter = os.scandir(directory_path)
-	images_list: list[str] = []
+	from .indexing import PieceIndex
+
+	with PieceIndex(directory_path) as index:
+		index.scan()
+		entries = index.query()
 	print(f"\nWhich {label} image do you want to select?")
-	for idx, entry in enumerate(images_iter):
-		if entry.is_file():
-			print(f"{idx}. {entry.name}")
-			images_list.append(entry.name)
+	for idx, entry in enumerate(entries):
+		dims = f" ({entry['width']}x{entry['height']})" if entry["width"] else ""
+		print(f"{idx}. {entry['name']}{dims}")
 
-	if not images_list:
+	if not entries:
 		raise FileNotFoundError("No images found in directory.")
 
 	while True:
 		try:
 			choice = int(input("\nImage number: "))
-			if 0 <= choice < len(images_list):
-				path = os.path.join(directory_path, images_list[choice])
-				return Image.open(path)
+			if 0 <= choice < len(entries):
+				return open_image(entries[choice]["path"])
 			print("❌ Number out of range!")
 		except ValueError:
 			print("❌ Please enter a valid number!")
@@ -62,7 +78,7 @@ def load_puzzle() -> Image.Image:
 				print(f"❌ File {puzzle_path} does not exist! Try again.")
 				continue
 			try:
-				image = Image.open(puzzle_path)
+				image = open_image(puzzle_path)
 				print(f"✅ Puzzle loaded successfully! Size: {image.size[0]} x {image.size[1]} Format: {image.format}")
 				return image
 			except Exception as e:
@@ -98,7 +114,7 @@ def load_piece() -> Image.Image:
 				print(f"❌ File {piece_path} does not exist! Try again.")
 				continue
 			try:
-				image = Image.open(piece_path)
+				image = open_image(piece_path)
 				print(f"✅ Piece loaded successfully! Size: {image.size[0]} x {image.size[1]} Format: {image.format}")
 				return image
 			except Exception as e:
@@ -108,5 +124,142 @@ def load_piece() -> Image.Image:
 			print("❌ Please choose 1 or 2!")
 
 
-__all__ = ["load_puzzle", "load_piece"]
+# ===== Fast non-interactive loading =====
+def open_image(path: str, max_size: int | None = None) -> Image.Image:
+	"""Open and decode an image, optionally at reduced resolution.
+
+	With ``max_size`` the longer side of the result is at most ``max_size``.
+	JPEGs are decoded directly at 1/2, 1/4 or 1/8 scale (libjpeg draft mode),
+	so a coarse level never pays for a full-resolution decode; other formats
+	are reduced right after decoding. The returned image is fully loaded.
+	"""
+	from PIL import Image
+
+	img = Image.open(path)
+	if max_size and max(img.size) > max_size:
+		w, h = img.size
+		if img.format == "JPEG":
+			# Ask for the smallest DCT scale that still covers max_size
+			ratio = max_size / max(w, h)
+			img.draft(img.mode, (max(1, int(w * ratio)), max(1, int(h * ratio))))
+		img.load()
+		if max(img.size) > max_size:
+			img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+	else:
+		img.load()
+	return img
+
+
+class LazyImage:
+	"""Handle to an image file that is decoded in the background.
+
+	``size``, ``width``, ``height``, ``mode`` and ``format`` come from the file
+	header and never wait for decoding (with ``max_size`` the size is an
+	estimate until the image is decoded). Any other attribute (``convert``,
+	``resize``, ``copy``...) is forwarded to the decoded ``PIL.Image``,
+	blocking until it is ready, so a LazyImage can be passed wherever the
+	matching and feature functions expect a PIL image.
+	"""
+
+	def __init__(self, path: str, future: Future | None = None, max_size: int | None = None):
+		self.path = path
+		self.max_size = max_size
+		self._future = future
+		self._image: Image.Image | None = None
+		self._header: tuple | None = None
+		self._lock = threading.Lock()
+
+	def _read_header(self) -> tuple:
+		if self._header is None:
+			if self._image is not None:
+				img = self._image
+				self._header = (img.size, img.mode, img.format)
+			else:
+				from PIL import Image
+
+				with Image.open(self.path) as img:
+					size = img.size
+					if self.max_size and max(size) > self.max_size:
+						ratio = self.max_size / max(size)
+						size = (max(1, round(size[0] * ratio)), max(1, round(size[1] * ratio)))
+					self._header = (size, img.mode, img.format)
+		return self._header
+
+	@property
+	def image(self) -> Image.Image:
+		"""The decoded image (decodes now if no background job was started)."""
+		if self._image is None:
+			with self._lock:
+				if self._image is None:
+					if self._future is not None:
+						self._image = self._future.result()
+						self._future = None
+					else:
+						self._image = open_image(self.path, self.max_size)
+					self._header = (self._image.size, self._image.mode, self._image.format)
+		return self._image
+
+	def release(self) -> None:
+		"""Drop the decoded pixels (they are decoded again on next access)."""
+		with self._lock:
+			if self._future is not None and not self._future.done():
+				return
+			self._future = None
+			self._image = None
+
+	@property
+	def loaded(self) -> bool:
+		return self._image is not None or (self._future is not None and self._future.done())
+
+	@property
+	def size(self) -> tuple[int, int]:
+		return self._read_header()[0]
+
+	@property
+	def width(self) -> int:
+		return self.size[0]
+
+	@property
+	def height(self) -> int:
+		return self.size[1]
+
+	@property
+	def mode(self) -> str:
+		return self._read_header()[1]
+
+	@property
+	def format(self) -> str | None:
+		return self._read_header()[2]
+
+	def __getattr__(self, name):
+		# Only called for attributes not found on LazyImage itself
+		if name.startswith("_"):
+			raise AttributeError(name)
+		return getattr(self.image, name)
+
+	def __repr__(self) -> str:
+		state = "loaded" if self.loaded else "pending"
+		return f"<LazyImage {os.path.basename(self.path)} {state}>"
+
+
+def load_images(paths, max_size: int | None = None, max_workers: int | None = None) -> list[LazyImage]:
+	"""Start decoding ``paths`` on a thread pool and return LazyImage handles.
+
+	Returns immediately; Pillow releases the GIL while decoding, so files are
+	decoded in parallel and loading is bound by I/O rather than by decode.
+	``max_size`` enables reduced-resolution decoding (see ``open_image``).
+	Decoding errors surface when the image is first accessed.
+	"""
+	paths = list(paths)
+	if not paths:
+		return []
+	workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+	executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-load")
+	handles = [LazyImage(p, executor.submit(open_image, p, max_size), max_size) for p in paths]
+	# Queued jobs keep running; the pool's threads exit once they are done
+	executor.shutdown(wait=False)
+	return handles
+
+
+__all__ = ["load_puzzle", "load_piece", "open_image", "LazyImage", "load_images"]
 
@@ -0,0 +1,118 @@
+"""Approximate nearest-neighbour search over fixed-length float vectors (pure numpy).
+
+``IVFIndex`` is an inverted-file index: a small k-means codebook partitions
+the vectors into lists, and a query is compared exactly only against the
+vectors in its ``n_probe`` closest lists. With ``n_lists ~ sqrt(N)`` a query
+touches a few percent of the data instead of all of it. Every step is a
+batched matrix product: queries are grouped by the lists they probe and
+each list is re-ranked against all of its queries at once.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+def _sq_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+	"""Squared Euclidean distances between the rows of ``a`` and ``b``."""
+	d = (a * a).sum(1)[:, None] - 2.0 * (a @ b.T) + (b * b).sum(1)[None, :]
+	return np.maximum(d, 0.0)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0, sample: int = 20000) -> np.ndarray:
+	"""k-means centroids (k-means++ seeding) on at most ``sample`` rows."""
+	rng = np.random.default_rng(seed)
+	data = vectors if len(vectors) <= sample else vectors[rng.choice(len(vectors), sample, replace=False)]
+	k = max(1, min(k, len(data)))
+	centers = [data[rng.integers(len(data))]]
+	closest = _sq_distances(data, centers[0][None])[:, 0]
+	for _ in range(1, k):
+		total = closest.sum()
+		pick = rng.choice(len(data), p=closest / total) if total > 0 else rng.integers(len(data))
+		centers.append(data[pick])
+		closest = np.minimum(closest, _sq_distances(data, data[pick][None])[:, 0])
+	centers = np.array(centers)
+	for _ in range(iterations):
+		labels = _sq_distances(data, centers).argmin(1)
+		counts = np.bincount(labels, minlength=k)
+		sums = np.zeros_like(centers)
+		np.add.at(sums, labels, data)
+		filled = counts > 0
+		centers[filled] = sums[filled] / counts[filled, None]
+	return centers
+
+
+class IVFIndex:
+	"""Inverted-file ANN index over the rows of ``vectors``.
+
+	Usage::
+
+		index = IVFIndex(descriptors)
+		ids, dist = index.search(queries, k=5)
+	"""
+
+	def __init__(self, vectors, n_lists: int | None = None, seed: int = 0):
+		self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+		n = len(self.vectors)
+		self.n_lists = max(1, min(n_lists or int(np.sqrt(n)), n)) if n else 1
+		if not n:
+			self.centroids = np.zeros((1, self.vectors.shape[1] if self.vectors.ndim == 2 else 0), np.float32)
+			self._order = np.zeros(0, dtype=np.int64)
+			self._starts = np.zeros(2, dtype=np.int64)
+			return
+		self.centroids = kmeans(self.vectors, self.n_lists, seed=seed).astype(np.float32)
+		self.n_lists = len(self.centroids)
+		labels = _sq_distances(self.vectors, self.centroids).argmin(1)
+		# CSR layout: list l holds _order[_starts[l]:_starts[l + 1]]
+		self._order = np.argsort(labels, kind="stable")
+		self._starts = np.searchsorted(labels[self._order], np.arange(self.n_lists + 1))
+
+	def __len__(self) -> int:
+		return len(self.vectors)
+
+	def search(self, queries, k: int = 5, n_probe: int = 4, exclude=None) -> tuple[np.ndarray, np.ndarray]:
+		"""``k`` nearest rows for each query: (indices, squared distances), -1 / inf padded.
+
+		Queries are grouped by probed list, so each list is re-ranked against
+		all of its queries in one matrix product and merged into the running
+		top ``k`` of those queries. ``exclude`` (optional callable
+		``(query_indices, candidate_ids) -> (len(query_indices), len(candidate_ids))
+		bool mask``) drops candidates before ranking, e.g. edges of the
+		query's own piece.
+		"""
+		queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+		ids = np.full((len(queries), k), -1, dtype=np.int64)
+		dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+		if not len(self) or not len(queries):
+			return ids, dist
+		n_probe = min(n_probe, self.n_lists)
+		probes = np.argsort(_sq_distances(queries, self.centroids), axis=1)[:, :n_probe]
+		# Queries probing each list, grouped by list
+		pairs = np.argsort(probes.ravel(), kind="stable")
+		probe_lists = probes.ravel()[pairs]
+		probe_queries = pairs // n_probe
+		bounds = np.searchsorted(probe_lists, np.arange(self.n_lists + 1))
+		for l in range(self.n_lists):
+			members = self._order[self._starts[l]:self._starts[l + 1]]
+			qs = probe_queries[bounds[l]:bounds[l + 1]]
+			if not len(members) or not len(qs):
+				continue
+			d = _sq_distances(queries[qs], self.vectors[members]).astype(np.float32, copy=False)
+			if exclude is not None:
+				d[exclude(qs, members)] = np.inf
+			# Best k of this list per query, then merged with the running best
+			if d.shape[1] > k:
+				part = np.argpartition(d, k - 1, axis=1)[:, :k]
+				block_ids, d = members[part], np.take_along_axis(d, part, axis=1)
+			else:
+				block_ids = np.broadcast_to(members, d.shape)
+			merged_ids = np.concatenate([ids[qs], block_ids], axis=1)
+			merged = np.concatenate([dist[qs], d], axis=1)
+			top = np.argsort(merged, axis=1, kind="stable")[:, :k]
+			ids[qs] = np.take_along_axis(merged_ids, top, axis=1)
+			dist[qs] = np.take_along_axis(merged, top, axis=1)
+		ids[~np.isfinite(dist)] = -1
+		return ids, dist
+
+
+__all__ = ["IVFIndex", "kmeans"]
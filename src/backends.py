@@ -0,0 +1,304 @@
+"""Interchangeable compute backends for template matching.
+
+A backend supplies the three primitives the matcher needs: grayscale
+conversion and resizing, the correlation map itself (``match``, same layout
+and value ranges as ``cv2.matchTemplate``) and peak finding (``min_max_loc``).
+
+- ``opencv``: ``cv2.matchTemplate`` on the CPU (default when cv2 is installed).
+- ``numpy``: correlation through ``numpy.fft`` plus integral images; needs
+  only numpy and Pillow.
+- ``cuda``: OpenCV CUDA template matching, an example accelerator backend.
+
+Other accelerators plug in with ``register_backend``. ``get_backend("auto")``
+picks the first available of opencv, numpy. ``benchmark_backends`` runs every
+available backend on the same inputs and reports timing and agreement.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+METHODS = ("SQDIFF", "SQDIFF_NORMED", "CCOEFF_NORMED")
+
+
+class MatchBackend:
+	"""Base class; subclasses override ``match`` and optionally the rest."""
+
+	name = "base"
+	# Whether ``match`` may be called from several threads at once
+	thread_safe = True
+
+	@classmethod
+	def available(cls) -> bool:
+		return True
+
+	def get_num_threads(self) -> int:
+		"""Threads the backend uses internally per call (1 if it has no pool)."""
+		return 1
+
+	def set_num_threads(self, n: int) -> None:
+		"""Cap the backend's internal threading (no-op by default)."""
+
+	@contextmanager
+	def limit_threads(self, n: int):
+		"""Temporarily cap internal threads, e.g. while running calls in parallel."""
+		previous = self.get_num_threads()
+		self.set_num_threads(max(1, n))
+		try:
+			yield
+		finally:
+			self.set_num_threads(previous)
+
+	def to_gray(self, rgb: np.ndarray) -> np.ndarray:
+		"""RGB uint8 array -> 2D uint8 luma (ITU-R 601, as cv2 and Pillow)."""
+		return np.asarray(Image.fromarray(np.ascontiguousarray(rgb)).convert("L"))
+
+	def resize(self, arr: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+		"""Resize to ``size`` (w, h): box filter when shrinking, Lanczos when growing."""
+		shrinking = size[0] * size[1] < arr.shape[0] * arr.shape[1]
+		resample = Image.Resampling.BOX if shrinking else Image.Resampling.LANCZOS
+		return np.asarray(Image.fromarray(np.ascontiguousarray(arr)).resize(size, resample))
+
+	def match(self, image: np.ndarray, templ: np.ndarray, method: str) -> np.ndarray:
+		"""Score map of shape (H - h + 1, W - w + 1) for every template position."""
+		raise NotImplementedError
+
+	def min_max_loc(self, res: np.ndarray) -> tuple[float, float, tuple[int, int], tuple[int, int]]:
+		"""(min_val, max_val, min_loc, max_loc) with (x, y) locations, like cv2.minMaxLoc."""
+		lo = int(np.argmin(res))
+		hi = int(np.argmax(res))
+		width = res.shape[1]
+		return (
+			float(res.flat[lo]), float(res.flat[hi]),
+			(lo % width, lo // width), (hi % width, hi // width),
+		)
+
+
+class OpenCVBackend(MatchBackend):
+	name = "opencv"
+
+	@classmethod
+	def available(cls) -> bool:
+		try:
+			import cv2  # noqa: F401
+		except ImportError:
+			return False
+		return True
+
+	def __init__(self):
+		import cv2
+		self._cv2 = cv2
+		self._methods = {
+			"SQDIFF": cv2.TM_SQDIFF,
+			"SQDIFF_NORMED": cv2.TM_SQDIFF_NORMED,
+			"CCOEFF_NORMED": cv2.TM_CCOEFF_NORMED,
+		}
+
+	def get_num_threads(self) -> int:
+		return self._cv2.getNumThreads()
+
+	def set_num_threads(self, n: int) -> None:
+		self._cv2.setNumThreads(n)
+
+	def to_gray(self, rgb: np.ndarray) -> np.ndarray:
+		return self._cv2.cvtColor(rgb, self._cv2.COLOR_RGB2GRAY)
+
+	def resize(self, arr: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+		shrinking = size[0] * size[1] < arr.shape[0] * arr.shape[1]
+		interpolation = self._cv2.INTER_AREA if shrinking else self._cv2.INTER_LANCZOS4
+		return self._cv2.resize(arr, size, interpolation=interpolation)
+
+	def match(self, image: np.ndarray, templ: np.ndarray, method: str) -> np.ndarray:
+		return self._cv2.matchTemplate(image, templ, self._methods[method])
+
+	def min_max_loc(self, res: np.ndarray):
+		return self._cv2.minMaxLoc(res)
+
+
+class CudaBackend(OpenCVBackend):
+	"""OpenCV CUDA matching; the last uploaded image stays on the device."""
+
+	name = "cuda"
+	thread_safe = False  # One device image cache; the GPU serialises calls anyway
+
+	@classmethod
+	def available(cls) -> bool:
+		if not OpenCVBackend.available():
+			return False
+		import cv2
+		try:
+			return hasattr(cv2, "cuda") and cv2.cuda.getCudaEnabledDeviceCount() > 0
+		except Exception:
+			return False
+
+	def __init__(self):
+		super().__init__()
+		self._uploaded = (None, None)
+
+	def match(self, image: np.ndarray, templ: np.ndarray, method: str) -> np.ndarray:
+		cv2 = self._cv2
+		if self._uploaded[0] is not image:
+			gpu_image = cv2.cuda_GpuMat()
+			gpu_image.upload(np.ascontiguousarray(image))
+			self._uploaded = (image, gpu_image)
+		gpu_image = self._uploaded[1]
+		gpu_templ = cv2.cuda_GpuMat()
+		gpu_templ.upload(np.ascontiguousarray(templ))
+		matcher = cv2.cuda.createTemplateMatching(gpu_image.type(), self._methods[method])
+		return matcher.match(gpu_image, gpu_templ).download()
+
+
+def _fast_len(n: int) -> int:
+	"""Smallest 2^a * 3^b * 5^c >= n (sizes numpy.fft handles quickly)."""
+	best = 1 << max(0, (n - 1).bit_length())
+	p5 = 1
+	while p5 < best:
+		p35 = p5
+		while p35 < best:
+			p = p35
+			while p < n:
+				p *= 2
+			best = min(best, p)
+			p35 *= 3
+		p5 *= 5
+	return best
+
+
+def _window_sums(arr: np.ndarray, h: int, w: int) -> np.ndarray:
+	"""Sum of every h x w window (valid positions) via an integral image."""
+	integral = np.zeros((arr.shape[0] + 1, arr.shape[1] + 1), dtype=np.float64)
+	np.cumsum(np.cumsum(arr, axis=0), axis=1, out=integral[1:, 1:])
+	return integral[h:, w:] - integral[:-h, w:] - integral[h:, :-w] + integral[:-h, :-w]
+
+
+class NumpyFFTBackend(MatchBackend):
+	"""Correlation via ``numpy.fft``; runs where OpenCV is not installed.
+
+	Cost is O(N log N) in the image size regardless of template size, so it
+	is competitive with spatial correlation for large templates.
+	"""
+
+	name = "numpy"
+
+	def match(self, image: np.ndarray, templ: np.ndarray, method: str) -> np.ndarray:
+		if method not in METHODS:
+			raise ValueError(f"method must be one of {METHODS}")
+		img = np.asarray(image, dtype=np.float64)
+		tpl = np.asarray(templ, dtype=np.float64)
+		height, width = img.shape
+		th, tw = tpl.shape
+		if method == "CCOEFF_NORMED":
+			tpl = tpl - tpl.mean()
+		shape = (_fast_len(height), _fast_len(width))
+		spectrum = np.fft.rfft2(img, shape) * np.conj(np.fft.rfft2(tpl, shape))
+		corr = np.fft.irfft2(spectrum, shape)[:height - th + 1, :width - tw + 1]
+
+		if method == "CCOEFF_NORMED":
+			n = th * tw
+			sums = _window_sums(img, th, tw)
+			var = np.maximum(_window_sums(img * img, th, tw) - sums * sums / n, 0.0)
+			denom = np.sqrt(var * float((tpl * tpl).sum()))
+			res = np.divide(corr, denom, out=np.zeros_like(corr), where=denom > 1e-9)
+			return np.clip(res, -1.0, 1.0).astype(np.float32)
+
+		image_sq = _window_sums(img * img, th, tw)
+		templ_sq = float((tpl * tpl).sum())
+		res = np.maximum(image_sq - 2.0 * corr + templ_sq, 0.0)
+		if method == "SQDIFF_NORMED":
+			denom = np.sqrt(image_sq * templ_sq)
+			res = np.divide(res, denom, out=np.ones_like(res), where=denom > 1e-9)
+		return res.astype(np.float32)
+
+
+_BACKENDS: dict[str, type[MatchBackend]] = {
+	"opencv": OpenCVBackend,
+	"numpy": NumpyFFTBackend,
+	"cuda": CudaBackend,
+}
+_AUTO_ORDER = ["opencv", "numpy"]
+_instances: dict[str, MatchBackend] = {}
+
+
+def register_backend(name: str, backend_cls: type[MatchBackend], auto: bool = False) -> None:
+	"""Add a backend; ``auto=True`` makes "auto" prefer it when available."""
+	_BACKENDS[name] = backend_cls
+	_instances.pop(name, None)
+	if auto and name not in _AUTO_ORDER:
+		_AUTO_ORDER.insert(0, name)
+
+
+def available_backends() -> list[str]:
+	"""Names of the registered backends usable in this environment."""
+	return [name for name, cls in _BACKENDS.items() if cls.available()]
+
+
+def get_backend(name: str | MatchBackend = "auto") -> MatchBackend:
+	"""Backend instance by name ("auto", "opencv", "numpy", "cuda", ...).
+
+	Raises ``ValueError`` for unknown names and ``RuntimeError`` when the
+	backend is not usable here.
+	"""
+	if isinstance(name, MatchBackend):
+		return name
+	if name == "auto":
+		name = next((n for n in _AUTO_ORDER if _BACKENDS[n].available()), "numpy")
+	if name not in _BACKENDS:
+		raise ValueError(f"unknown backend {name!r}; choose from {sorted(_BACKENDS)}")
+	if name not in _instances:
+		if not _BACKENDS[name].available():
+			raise RuntimeError(f"{name}_not_available")
+		_instances[name] = _BACKENDS[name]()
+	return _instances[name]
+
+
+def benchmark_backends(
+	image: np.ndarray,
+	templ: np.ndarray,
+	method: str = "SQDIFF_NORMED",
+	names: list[str] | None = None,
+	repeats: int = 3,
+) -> list[dict]:
+	"""Time ``match`` + ``min_max_loc`` for each backend on the same inputs.
+
+	Returns one dict per backend with ``backend``, ``seconds`` (best of
+	``repeats``), best ``location`` and ``max_abs_diff`` of the score map
+	against the first backend listed.
+	"""
+	image = np.ascontiguousarray(image)
+	templ = np.ascontiguousarray(templ)
+	reference = None
+	report = []
+	for name in names or available_backends():
+		backend = get_backend(name)
+		timings = []
+		for _ in range(max(1, repeats)):
+			start = time.perf_counter()
+			res = backend.match(image, templ, method)
+			min_val, max_val, min_loc, max_loc = backend.min_max_loc(res)
+			timings.append(time.perf_counter() - start)
+		if reference is None:
+			reference = res
+		report.append({
+			"backend": name,
+			"seconds": min(timings),
+			"location": min_loc if method.startswith("SQDIFF") else max_loc,
+			"max_abs_diff": float(np.abs(np.asarray(res, dtype=np.float64) - reference).max()),
+		})
+	return report
+
+
+__all__ = [
+	"MatchBackend",
+	"OpenCVBackend",
+	"CudaBackend",
+	"NumpyFFTBackend",
+	"METHODS",
+	"register_backend",
+	"available_backends",
+	"get_backend",
+	"benchmark_backends",
+]
@@ -0,0 +1,226 @@
+"""Perceptual hashes of piece images and near-duplicate detection.
+
+A scanning station often captures the same piece more than once. Each image
+is reduced to a tiny grayscale thumbnail and hashed to 64 bits:
+
+- ``dhash`` (difference hash, 9x8 thumbnail): one bit per horizontal
+  brightness gradient; the cheapest, and robust to exposure changes,
+- ``phash`` (DCT hash, 32x32 thumbnail): signs of the lowest 8x8 DCT
+  frequencies against their median; more tolerant of blur and rescaling.
+
+Hashes of near-identical images differ in a few bits. ``MultiIndexHash``
+finds them by exact lookups on bit chunks instead of comparing every pair,
+and ``find_duplicates`` marks every image that repeats an earlier one.
+Paths are decoded at reduced size (JPEGs straight to gray at 1/8 scale), so
+hashing does not pay for full-resolution decodes.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+HASH_METHODS = ("dhash", "phash")
+_THUMB_SIZES = {"dhash": (9, 8), "phash": (32, 32)}
+_DCT_KEEP = 8
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+	"""Orthonormal DCT-II basis (rows are frequencies)."""
+	k = np.arange(n)[:, None]
+	x = np.arange(n)[None, :]
+	basis = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+	basis[0] /= np.sqrt(2.0)
+	return basis.astype(np.float32)
+
+
+_DCT32 = _dct_matrix(_THUMB_SIZES["phash"][0])
+
+
+def _gray_thumbnail(source, size: tuple[int, int]) -> tuple[np.ndarray, tuple[int, int]]:
+	"""(H, W) float32 gray thumbnail of ``source`` at ``size`` and its full (w, h).
+
+	Files (and ``LazyImage`` handles not decoded yet) are opened directly at
+	reduced size; JPEGs are decoded as gray at the smallest DCT scale.
+	"""
+	from .imagearray import ImageArray
+
+	path = source if isinstance(source, (str, os.PathLike)) else None
+	if path is None and getattr(source, "path", None) and not getattr(source, "loaded", True):
+		path = source.path
+	if path is not None:
+		with Image.open(path) as img:
+			full_size = img.size
+			if img.format == "JPEG":
+				img.draft("L", (size[0] * 2, size[1] * 2))
+			thumb = img.convert("L").resize(size, Image.Resampling.BOX, reducing_gap=2.0)
+		return np.asarray(thumb, dtype=np.float32), full_size
+	if isinstance(source, ImageArray):
+		return source.resized(size, cache=False).gray.astype(np.float32), source.size
+	if isinstance(source, np.ndarray):
+		return _gray_thumbnail(ImageArray(source), size)
+	img = source if source.mode in ("L", "RGB", "RGBA") else source.convert("RGB")
+	thumb = img.resize(size, Image.Resampling.BOX, reducing_gap=2.0).convert("L")
+	return np.asarray(thumb, dtype=np.float32), tuple(source.size)
+
+
+def _pack_bits(bits: np.ndarray) -> np.ndarray:
+	"""(N, 64) bool rows -> (N,) uint64 hashes, first bit most significant."""
+	return np.packbits(bits.astype(np.uint8), axis=1).view(">u8")[:, 0].astype(np.uint64)
+
+
+def hash_thumbnails(thumbs: np.ndarray, method: str = "phash") -> np.ndarray:
+	"""64-bit hashes of a stack of gray thumbnails (N, H, W) -> (N,) uint64."""
+	thumbs = np.asarray(thumbs, dtype=np.float32)
+	if method == "dhash":
+		bits = thumbs[:, :, 1:] > thumbs[:, :, :-1]
+	elif method == "phash":
+		coeffs = (_DCT32 @ thumbs @ _DCT32.T)[:, :_DCT_KEEP, :_DCT_KEEP].reshape(len(thumbs), -1)
+		# The DC term only encodes mean brightness; keep it out of the median
+		median = np.median(coeffs[:, 1:], axis=1, keepdims=True)
+		bits = coeffs > median
+	else:
+		raise ValueError(f"method must be one of {HASH_METHODS}")
+	return _pack_bits(bits.reshape(len(thumbs), -1))
+
+
+def image_hashes(sources, method: str = "phash", max_workers: int | None = None) -> tuple[np.ndarray, list]:
+	"""Perceptual hashes of ``sources`` (paths, PIL / ``LazyImage`` / ``ImageArray``).
+
+	Thumbnails are built on a thread pool (Pillow releases the GIL while
+	decoding). Returns ``(hashes, sizes)``: (N,) uint64 hashes and the
+	full-resolution (w, h) of each source, or None for unreadable ones
+	(their hash is 0 and they are never reported as duplicates).
+	"""
+	if method not in HASH_METHODS:
+		raise ValueError(f"method must be one of {HASH_METHODS}")
+	sources = list(sources)
+	size = _THUMB_SIZES[method]
+
+	def thumbnail(source):
+		try:
+			return _gray_thumbnail(source, size)
+		except Exception:
+			return None
+
+	if len(sources) > 1:
+		workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+		with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-hash") as pool:
+			thumbs = list(pool.map(thumbnail, sources))
+	else:
+		thumbs = [thumbnail(source) for source in sources]
+	stack = np.zeros((len(sources), size[1], size[0]), dtype=np.float32)
+	sizes = []
+	for i, item in enumerate(thumbs):
+		if item is not None:
+			stack[i] = item[0]
+		sizes.append(None if item is None else item[1])
+	hashes = hash_thumbnails(stack, method) if len(sources) else np.zeros(0, dtype=np.uint64)
+	return hashes, sizes
+
+
+def hamming(a: int, b: int) -> int:
+	"""Number of differing bits between two hashes."""
+	return (int(a) ^ int(b)).bit_count()
+
+
+class MultiIndexHash:
+	"""Near-duplicate lookup over 64-bit hashes under Hamming distance.
+
+	Multi-index hashing: the hash is split into ``radius + 1`` disjoint bit
+	chunks, each with its own exact-match table. Two hashes within ``radius``
+	bits must agree exactly on at least one chunk (pigeonhole), so a search
+	only verifies the few entries that share a chunk with the query instead
+	of scanning every stored hash.
+
+	Usage::
+
+		index = MultiIndexHash(radius=4)
+		index.add(hash_a, "a.jpg")
+		index.search(hash_b)  # [(distance, "a.jpg"), ...]
+	"""
+
+	def __init__(self, radius: int = 4, bits: int = 64):
+		self.radius = radius
+		chunks = max(1, min(radius + 1, bits))
+		bounds = np.linspace(0, bits, chunks + 1).astype(int)
+		# (shift, mask) of each chunk
+		self._chunks = [(int(lo), (1 << int(hi - lo)) - 1) for lo, hi in zip(bounds[:-1], bounds[1:])]
+		self._tables: list[dict[int, list[int]]] = [{} for _ in self._chunks]
+		self._values: list[int] = []
+		self._items: list = []
+
+	def __len__(self) -> int:
+		return len(self._values)
+
+	def add(self, value: int, item) -> None:
+		value = int(value)
+		slot = len(self._values)
+		self._values.append(value)
+		self._items.append(item)
+		for table, (shift, mask) in zip(self._tables, self._chunks):
+			table.setdefault((value >> shift) & mask, []).append(slot)
+
+	def search(self, value: int, radius: int | None = None) -> list[tuple[int, object]]:
+		"""All (distance, item) within ``radius`` (at most the index radius), nearest first."""
+		value = int(value)
+		radius = self.radius if radius is None else min(radius, self.radius)
+		seen = set()
+		found = []
+		for table, (shift, mask) in zip(self._tables, self._chunks):
+			for slot in table.get((value >> shift) & mask, ()):
+				if slot in seen:
+					continue
+				seen.add(slot)
+				distance = (self._values[slot] ^ value).bit_count()
+				if distance <= radius:
+					found.append((distance, self._items[slot]))
+		found.sort(key=lambda pair: pair[0])
+		return found
+
+
+def find_duplicates(
+	sources,
+	max_distance: int = 4,
+	method: str = "phash",
+	max_size_ratio: float = 1.25,
+	hashes: np.ndarray | None = None,
+	sizes: list | None = None,
+) -> list[int | None]:
+	"""For each source, the index of the earlier source it duplicates (or None).
+
+	Two images are duplicates when their hashes differ in at most
+	``max_distance`` bits and neither side is more than ``max_size_ratio``
+	times larger than the other (flat, featureless pieces hash alike, but
+	differently sized pieces are not the same scan). Duplicates always point
+	at the first copy, never at another duplicate. Precomputed ``hashes`` and
+	``sizes`` (from ``image_hashes``) skip the hashing step.
+	"""
+	if hashes is None or sizes is None:
+		hashes, sizes = image_hashes(sources, method)
+	index_by_hash = MultiIndexHash(max_distance)
+	duplicate_of: list[int | None] = []
+	for index, (value, size) in enumerate(zip(hashes.tolist(), sizes)):
+		original = None
+		if size is not None:
+			for _, other in index_by_hash.search(value):
+				if all(max(a, b) <= max_size_ratio * min(a, b) for a, b in zip(size, sizes[other])):
+					original = other
+					break
+			if original is None:
+				index_by_hash.add(value, index)
+		duplicate_of.append(original)
+	return duplicate_of
+
+
+__all__ = [
+	"image_hashes",
+	"hash_thumbnails",
+	"hamming",
+	"MultiIndexHash",
+	"find_duplicates",
+	"HASH_METHODS",
+]
@@ -0,0 +1,210 @@
+"""Edge-shape descriptors and an index of compatible piece edges.
+
+Works from the pieces alone; no reference puzzle image is needed. Each
+piece's outline (from its alpha mask, e.g. ``segmentation.segment_pieces``)
+is split at its four corners into edges. Every edge is described by:
+
+- a shape profile: signed deviation from the corner-to-corner chord at evenly
+  spaced arc-length samples, normalised by the chord length (tab > 0,
+  blank < 0, flat ~ 0),
+- a colour strip: Lab colours sampled just inside the boundary,
+- its chord length.
+
+Two edges mate when one profile is the other reversed and negated, and the
+colour strips match reversed. ``EdgeIndex`` stores each edge's descriptor
+and queries its mate-transformed descriptor in an inverted-file ANN index
+(``ann.IVFIndex``), so compatible neighbours are found without comparing
+all edge pairs.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image
+
+from .ann import IVFIndex
+from .features import rgb_to_lab
+
+SIDES = ("top", "right", "bottom", "left")
+FLAT, TAB, BLANK = 0, 1, -1
+
+# Relative weights of the descriptor parts (shape dominates, colour refines)
+_SHAPE_WEIGHT = 4.0
+_COLOR_WEIGHT = 1.0 / 25.0  # Lab units -> ~unit scale
+_LENGTH_WEIGHT = 2.0
+
+
+def _outline(mask: np.ndarray) -> np.ndarray:
+	"""Outer contour of the largest mask component, clockwise in image coords, (N, 2) x/y."""
+	import cv2  # local import
+
+	contours, _ = cv2.findContours(mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+	if not contours:
+		raise ValueError("empty piece mask")
+	pts = max(contours, key=cv2.contourArea)[:, 0, :].astype(np.float64)
+	# Shoelace: positive area means clockwise with the y axis pointing down
+	x, y = pts[:, 0], pts[:, 1]
+	if (x * np.roll(y, -1) - np.roll(x, -1) * y).sum() < 0:
+		pts = pts[::-1]
+	return pts
+
+
+def _corner_indices(pts: np.ndarray) -> list[int]:
+	"""Contour indices of the top-left, top-right, bottom-right, bottom-left corners.
+
+	Corners are the points extremal along the diagonals. Tabs sit mid-edge
+	and protrude less than half a side, so they never win.
+	"""
+	x, y = pts[:, 0], pts[:, 1]
+	return [int(np.argmin(x + y)), int(np.argmax(x - y)), int(np.argmax(x + y)), int(np.argmin(x - y))]
+
+
+def _resample(path: np.ndarray, n: int) -> np.ndarray:
+	"""``n`` points evenly spaced by arc length along a polyline."""
+	seg = np.hypot(*np.diff(path, axis=0).T)
+	arc = np.concatenate([[0.0], np.cumsum(seg)])
+	if arc[-1] == 0:
+		return np.repeat(path[:1], n, axis=0)
+	t = np.linspace(0.0, arc[-1], n)
+	return np.stack([np.interp(t, arc, path[:, 0]), np.interp(t, arc, path[:, 1])], axis=1)
+
+
+def edge_descriptors(
+	piece: Image.Image,
+	mask: np.ndarray | None = None,
+	samples: int = 32,
+	strip_samples: int = 8,
+	strip_depth: int = 4,
+	flat_tolerance: float = 0.06,
+) -> list[dict]:
+	"""Describe the four edges of one piece, in ``SIDES`` order.
+
+	``piece`` is an RGBA crop (alpha = piece) or an RGB crop with ``mask``.
+	Each dict holds ``side``, ``kind`` (FLAT / TAB / BLANK), ``length``,
+	``profile`` (``samples`` floats) and ``colors`` (``strip_samples`` x 3 Lab).
+	"""
+	rgba = np.asarray(piece.convert("RGBA"))
+	rgb = rgba[..., :3]
+	if mask is None:
+		mask = rgba[..., 3] > 127
+	pts = _outline(mask)
+	centroid = pts.mean(axis=0)
+	corners = _corner_indices(pts)
+	height, width = mask.shape
+
+	edges = []
+	for side, (a, b) in enumerate(zip(corners, corners[1:] + corners[:1])):
+		path = pts[a:b + 1] if a <= b else np.concatenate([pts[a:], pts[:b + 1]])
+		pts_n = _resample(path, samples)
+		start, end = pts_n[0], pts_n[-1]
+		chord = end - start
+		length = float(np.hypot(*chord)) or 1.0
+		along = chord / length
+		normal = np.array([along[1], -along[0]])
+		# Outward normal points away from the piece centre
+		if np.dot((start + end) / 2 - centroid, normal) < 0:
+			normal = -normal
+		profile = (pts_n - start) @ normal / length
+
+		# Colour strip just inside the boundary, averaged into strip_samples bins
+		inner = pts_n - normal * strip_depth
+		xs = np.clip(np.round(inner[:, 0]).astype(int), 0, width - 1)
+		ys = np.clip(np.round(inner[:, 1]).astype(int), 0, height - 1)
+		colors = rgb_to_lab(np.array([c.mean(axis=0) for c in np.array_split(rgb[ys, xs].astype(np.float64), strip_samples)]))
+
+		peak = profile[np.argmax(np.abs(profile))]
+		kind = FLAT if abs(peak) < flat_tolerance else (TAB if peak > 0 else BLANK)
+		edges.append({
+			"side": SIDES[side],
+			"kind": kind,
+			"length": length,
+			"profile": profile,
+			"colors": colors,
+		})
+	return edges
+
+
+def _descriptor(profile: np.ndarray, colors: np.ndarray, length: float) -> np.ndarray:
+	return np.concatenate([
+		profile * _SHAPE_WEIGHT,
+		colors.ravel() * _COLOR_WEIGHT,
+		[np.log(max(length, 1.0)) * _LENGTH_WEIGHT],
+	])
+
+
+class EdgeIndex:
+	"""Index of all piece edges for adjacency queries.
+
+	Usage::
+
+		index = EdgeIndex([p["image"] for p in segment_pieces(photo)])
+		graph = index.adjacency_graph(k=3)
+	"""
+
+	def __init__(self, pieces, samples: int = 32, strip_samples: int = 8, n_lists: int | None = None):
+		piece_ids, sides, kinds, lengths, stored, mates = [], [], [], [], [], []
+		self.failed: list[int] = []
+		for pid, piece in enumerate(pieces):
+			try:
+				edges = edge_descriptors(piece, samples=samples, strip_samples=strip_samples)
+			except ValueError:
+				self.failed.append(pid)
+				continue
+			for side, edge in enumerate(edges):
+				piece_ids.append(pid)
+				sides.append(side)
+				kinds.append(edge["kind"])
+				lengths.append(edge["length"])
+				stored.append(_descriptor(edge["profile"], edge["colors"], edge["length"]))
+				# The mating edge runs the other way round with the bump inverted
+				mates.append(_descriptor(-edge["profile"][::-1], edge["colors"][::-1], edge["length"]))
+		dim = samples + 3 * strip_samples + 1
+		self.piece_ids = np.array(piece_ids, dtype=np.int64)
+		self.sides = np.array(sides, dtype=np.int8)
+		self.kinds = np.array(kinds, dtype=np.int8)
+		self.lengths = np.array(lengths, dtype=np.float64)
+		self.descriptors = np.array(stored, dtype=np.float32).reshape(-1, dim)
+		self._mates = np.array(mates, dtype=np.float32).reshape(-1, dim)
+		self._index = IVFIndex(self.descriptors, n_lists=n_lists)
+
+	def __len__(self) -> int:
+		return len(self.piece_ids)
+
+	def _exclude(self, query_edges: np.ndarray):
+		def exclude(qi, candidates):
+			edge = query_edges[qi][:, None]
+			# Never the same piece; a tab only mates a blank (and vice versa)
+			return (self.piece_ids[candidates] == self.piece_ids[edge]) | (self.kinds[candidates] != -self.kinds[edge])
+		return exclude
+
+	def neighbors(self, piece: int, side: int | str, k: int = 5, n_probe: int = 8) -> list[dict]:
+		"""Best-matching edges for one edge of one piece, closest first."""
+		side = SIDES.index(side) if isinstance(side, str) else side
+		hit = np.flatnonzero((self.piece_ids == piece) & (self.sides == side))
+		if not len(hit) or self.kinds[hit[0]] == FLAT:
+			return []
+		ids, dist = self._index.search(self._mates[hit], k=k, n_probe=n_probe, exclude=self._exclude(hit))
+		return [
+			{"piece": int(self.piece_ids[e]), "side": SIDES[self.sides[e]], "distance": float(d)}
+			for e, d in zip(ids[0], dist[0]) if e >= 0
+		]
+
+	def adjacency_graph(self, k: int = 3, n_probe: int = 8) -> dict:
+		"""Candidate adjacencies for every non-flat edge.
+
+		Returns dict with ``edges`` (E x 4 int array: piece_a, side_a, piece_b,
+		side_b) and ``distance`` (E,), ``k`` candidates per edge, best first.
+		"""
+		query = np.flatnonzero(self.kinds != FLAT)
+		ids, dist = self._index.search(self._mates[query], k=k, n_probe=n_probe, exclude=self._exclude(query))
+		src = np.repeat(query, k)
+		dst, dist = ids.ravel(), dist.ravel()
+		ok = dst >= 0
+		src, dst, dist = src[ok], dst[ok], dist[ok]
+		return {
+			"edges": np.stack([self.piece_ids[src], self.sides[src], self.piece_ids[dst], self.sides[dst]], axis=1),
+			"distance": dist,
+		}
+
+
+__all__ = ["EdgeIndex", "edge_descriptors", "SIDES", "FLAT", "TAB", "BLANK"]
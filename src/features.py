@@ -4,6 +4,9 @@ from __future__ import annotations
 from typing import Tuple
 from PIL import Image
 import math
+import numpy as np
+
+from .imagearray import as_image_array
 
 
 def get_image_size(img: Image.Image) -> tuple[int, int]:
@@ -15,20 +18,246 @@ def compute_area(size: tuple[int, int]) -> int:
 	return w * h
 
 
-def dominant_color(img: Image.Image, k: int = 4) -> tuple[int, int, int]:
-	"""Approximate dominant color by downscaling and taking most common pixel.
+# Thumbnail side used for colour statistics and the per-channel quantisation
+# depth of the colour histogram (4 bits -> 16^3 = 4096 bins).
+_COLOR_SAMPLE_SIZE = 64
+_COLOR_QUANT_BITS = 4
+# Max pixels per image fed to the k-means refinement (strided subsample).
+_KMEANS_SAMPLES = 1024
+# Images per vectorised pass of ``dominant_colors_batch`` (bounds its memory).
+_COLOR_CHUNK = 256
+
+
+def _color_samples(img: Image.Image, size: int = _COLOR_SAMPLE_SIZE) -> tuple[np.ndarray, np.ndarray]:
+	"""Return ((size*size, 3) uint8 RGB pixels, (size*size,) bool validity mask).
+
+	The image is reduced before conversion so large photos never get a
+	full-resolution RGB copy; the thumbnail is cached on the ``ImageArray``.
+	Transparent pixels (alpha < 128), typically the background around a
+	cut-out piece, are marked invalid.
+	"""
+	small = as_image_array(img).resized((size, size))
+	pixels = small.rgb.reshape(-1, 3)
+	if small.alpha is not None:
+		valid = small.alpha.reshape(-1) >= 128
+		if not valid.any():
+			valid = np.ones(len(pixels), dtype=bool)
+	else:
+		valid = np.ones(len(pixels), dtype=bool)
+	return pixels, valid
+
+
+def _quantize(pixels: np.ndarray, bits: int) -> np.ndarray:
+	"""Map (..., 3) uint8 RGB values to flat colour-bin indices (``bits`` per channel)."""
+	q = (pixels >> (8 - bits)).astype(np.intp)
+	return (q[..., 0] << (2 * bits)) | (q[..., 1] << bits) | q[..., 2]
+
+
+def dominant_colors_batch(images, k: int = 4, iterations: int = 3, chunk_size: int = _COLOR_CHUNK) -> list[tuple[int, int, int]]:
+	"""Dominant colour of many images in vectorised passes of ``chunk_size`` images.
+
+	Each image is reduced to a small thumbnail and its colours are quantised
+	into a 4096-bin histogram (a single ``np.bincount`` per chunk). The ``k``
+	most populated bins seed ``iterations`` rounds of k-means on a pixel
+	subsample; the centre of the largest cluster is returned. With
+	``iterations=0`` the mean colour of the most populated bin is returned.
+	Working memory is bounded by the chunk, whatever the number of images.
+	"""
+	images = list(images)
+	colors: list[tuple[int, int, int]] = []
+	chunk_size = max(1, int(chunk_size))
+	for start in range(0, len(images), chunk_size):
+		colors.extend(_dominant_colors_chunk(images[start:start + chunk_size], max(1, int(k)), iterations))
+	return colors
+
+
+def _dominant_colors_chunk(images, k: int, iterations: int) -> list[tuple[int, int, int]]:
+	samples = [_color_samples(img) for img in images]
+	pixels = np.stack([s[0] for s in samples])  # (n, s, 3) uint8
+	valid = np.stack([s[1] for s in samples])  # (n, s) bool
+	del samples
+	n, s, _ = pixels.shape
+	bins = 1 << (3 * _COLOR_QUANT_BITS)
+
+	idx = _quantize(pixels, _COLOR_QUANT_BITS) + np.arange(n)[:, None] * bins  # (n, s)
+	counts = np.bincount(idx[valid], minlength=n * bins).reshape(n, bins)
+
+	# Seed bins: the k most populated (descending, ties by bin index); only
+	# those k bins need colour sums
+	k = min(k, bins)
+	# Unique sort key: count first, lower bin index first among equal counts
+	key = counts * bins + (bins - 1 - np.arange(bins))
+	del counts
+	top = np.argpartition(-key, k - 1, axis=1)[:, :k] if k < bins else np.tile(np.arange(bins), (n, 1))
+	top = np.take_along_axis(top, np.argsort(-np.take_along_axis(key, top, axis=1), axis=1), axis=1)
+	seed_counts = np.take_along_axis(key, top, axis=1) // bins
+	del key
+	rank = np.full(n * bins, -1, dtype=np.int16)
+	rank[(top + np.arange(n)[:, None] * bins).ravel()] = np.tile(np.arange(k, dtype=np.int16), n)
+	pixel_rank = rank[idx]
+	del rank, idx
+	seeded = valid & (pixel_rank >= 0)
+	slot = (np.nonzero(seeded)[0] * k + pixel_rank[seeded])
+	sums = np.stack([
+		np.bincount(slot, weights=pixels[..., c][seeded], minlength=n * k) for c in range(3)
+	], axis=-1).reshape(n, k, 3)
+	centers = sums / np.maximum(seed_counts, 1)[..., None]
+	# Empty seeds (fewer than k distinct colours) fall back to the top bin.
+	centers = np.where((seed_counts > 0)[..., None], centers, centers[:, :1, :])
+
+	if iterations > 0:
+		step = max(1, s // _KMEANS_SAMPLES)
+		px = pixels[:, ::step].astype(np.float32)
+		w = valid[:, ::step].astype(np.float32)
+		centers = centers.astype(np.float32)
+		sizes = None
+		for _ in range(iterations):
+			# Squared distances via |p|^2 - 2 p.c + |c|^2 -> (n, s, k)
+			d = (
+				np.einsum("nsc,nsc->ns", px, px)[..., None]
+				- 2.0 * np.einsum("nsc,nkc->nsk", px, centers)
+				+ np.einsum("nkc,nkc->nk", centers, centers)[:, None, :]
+			)
+			onehot = (d.argmin(axis=2)[..., None] == np.arange(k)).astype(np.float32) * w[..., None]
+			sizes = onehot.sum(axis=1)  # (n, k)
+			new_centers = np.einsum("nsk,nsc->nkc", onehot, px) / np.maximum(sizes, 1.0)[..., None]
+			centers = np.where((sizes > 0)[..., None], new_centers, centers)
+		best = sizes.argmax(axis=1)
+	else:
+		best = np.zeros(n, dtype=np.int64)
+
+	chosen = centers[np.arange(n), best]
+	chosen = np.clip(np.rint(chosen), 0, 255).astype(np.int64)
+	return [(int(r), int(g), int(b)) for r, g, b in chosen]
+
+
+def dominant_color(img: Image.Image, k: int = 4, iterations: int = 3) -> tuple[int, int, int]:
+	"""Dominant colour of a single image (see ``dominant_colors_batch``)."""
+	return dominant_colors_batch([img], k=k, iterations=iterations)[0]
+
 
-	Simple + fast approach (no k-means yet)."""
-	small = img.convert("RGB").resize((50, 50))
-	pixels = list(small.getdata())
-	freq = {}
-	for p in pixels:
-		freq[p] = freq.get(p, 0) + 1
-	return max(freq.items(), key=lambda kv: kv[1])[0]
+def color_histogram(img: Image.Image, bits: int = 3) -> np.ndarray:
+	"""Normalised quantised colour histogram (``2**(3*bits)`` bins, sums to 1).
+
+	Computed on a small thumbnail; transparent pixels are ignored.
+	"""
+	pixels, valid = _color_samples(img)
+	hist = np.bincount(_quantize(pixels[valid], bits), minlength=1 << (3 * bits)).astype(np.float32)
+	return hist / max(float(hist.sum()), 1.0)
+
+
+def block_color_histograms(img: Image.Image, grid: int = 64, bits: int = 3, block_px: int = 8) -> np.ndarray:
+	"""Quantised colour histograms of a regular block grid laid over ``img``.
+
+	The longer image side is split into ``grid`` blocks. The image is reduced so
+	each block is ``block_px`` x ``block_px`` pixels, then all block histograms
+	are built with one ``np.bincount``. Returns a (rows, cols, bins) float32
+	array whose histograms are normalised to sum to 1.
+	"""
+	w, h = img.size
+	longest = max(w, h, 1)
+	cols = max(1, round(grid * w / longest))
+	rows = max(1, round(grid * h / longest))
+	small = as_image_array(img).resized((cols * block_px, rows * block_px))
+	idx = _quantize(small.rgb, bits)
+	bins = 1 << (3 * bits)
+	block_y = (np.arange(rows * block_px) // block_px)[:, None]
+	block_x = (np.arange(cols * block_px) // block_px)[None, :]
+	flat = ((block_y * cols + block_x) * bins + idx).ravel()
+	hists = np.bincount(flat, minlength=rows * cols * bins).astype(np.float32)
+	return hists.reshape(rows, cols, bins) / float(block_px * block_px)
+
+
+def backproject_blocks(block_hists: np.ndarray, piece_hist: np.ndarray) -> np.ndarray:
+	"""Score every block by the share of its pixels that have piece-like colours.
+
+	Uses ratio-histogram backprojection: each colour bin is weighted by
+	``min(piece / puzzle, 1)`` so colours that are common everywhere count for
+	little. Returns a (rows, cols) array with values in 0..1.
+	"""
+	bins = block_hists.shape[-1]
+	global_hist = block_hists.reshape(-1, bins).mean(axis=0)
+	ratio = np.where(global_hist > 0, piece_hist / np.maximum(global_hist, 1e-12), 0.0)
+	ratio = np.minimum(ratio, 1.0).astype(np.float32)
+	return block_hists @ ratio
 
 
 def color_distance(c1: tuple[int, int, int], c2: tuple[int, int, int]) -> float:
-	return math.sqrt(sum((a - b) ** 2 for a, b in zip(c1, c2)))
+	return math.dist(c1, c2)
+
+
+def rgb_to_lab(colors) -> np.ndarray:
+	"""Convert sRGB colours (..., 3) in 0..255 to CIE Lab (D65), float32."""
+	rgb = np.asarray(colors, dtype=np.float32) / 255.0
+	linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+	m = np.array([
+		[0.4124564, 0.3575761, 0.1804375],
+		[0.2126729, 0.7151522, 0.0721750],
+		[0.0193339, 0.1191920, 0.9503041],
+	], dtype=np.float32)
+	xyz = linear @ m.T / np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+	f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+	return np.stack([
+		116 * f[..., 1] - 16,
+		500 * (f[..., 0] - f[..., 1]),
+		200 * (f[..., 1] - f[..., 2]),
+	], axis=-1).astype(np.float32)
+
+
+def color_distance_matrix(colors, lab: bool = True) -> np.ndarray:
+	"""All-pairs Euclidean distance matrix (n, n) float32 between colours.
+
+	``colors`` is (n, 3) RGB 0..255; with ``lab=True`` (default) distances are
+	computed in CIE Lab (delta E 1976). Uses |a|^2 + |b|^2 - 2ab, so 10,000
+	colours take one matrix product (~400 MB result).
+	"""
+	pts = rgb_to_lab(colors) if lab else np.asarray(colors, dtype=np.float32)
+	pts = pts.reshape(-1, 3)
+	sq = np.einsum("ij,ij->i", pts, pts)
+	d2 = sq[:, None] + sq[None, :] - 2.0 * (pts @ pts.T)
+	np.maximum(d2, 0.0, out=d2)
+	np.fill_diagonal(d2, 0.0)
+	return np.sqrt(d2, out=d2)
+
+
+def cluster_by_color(colors, n_clusters: int = 8, iterations: int = 20, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+	"""Group colours (n, 3) RGB into ``n_clusters`` bins with k-means in Lab.
+
+	Uses k-means++ seeding; cost is O(n * n_clusters) per iteration, so no
+	distance matrix is needed. Returns (labels (n,) int, centres (k, 3) Lab),
+	with clusters relabelled from largest to smallest.
+	"""
+	pts = rgb_to_lab(colors).reshape(-1, 3)
+	n = len(pts)
+	if n == 0:
+		return np.zeros(0, dtype=np.int64), np.zeros((0, 3), dtype=np.float32)
+	k = max(1, min(int(n_clusters), n))
+	rng = np.random.default_rng(seed)
+
+	centers = np.empty((k, 3), dtype=np.float32)
+	centers[0] = pts[rng.integers(n)]
+	closest = ((pts - centers[0]) ** 2).sum(axis=1)
+	for i in range(1, k):
+		total = float(closest.sum())
+		pick = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+		centers[i] = pts[pick]
+		closest = np.minimum(closest, ((pts - centers[i]) ** 2).sum(axis=1))
+
+	labels = np.zeros(n, dtype=np.int64)
+	for it in range(max(1, iterations)):
+		d2 = (pts ** 2).sum(axis=1)[:, None] - 2.0 * (pts @ centers.T) + (centers ** 2).sum(axis=1)[None, :]
+		new_labels = d2.argmin(axis=1)
+		if it > 0 and np.array_equal(new_labels, labels):
+			break
+		labels = new_labels
+		sizes = np.bincount(labels, minlength=k)
+		sums = np.stack([np.bincount(labels, weights=pts[:, c], minlength=k) for c in range(3)], axis=1)
+		centers = np.where(sizes[:, None] > 0, sums / np.maximum(sizes, 1)[:, None], centers).astype(np.float32)
+
+	order = np.argsort(-np.bincount(labels, minlength=k), kind="stable")
+	remap = np.empty(k, dtype=np.int64)
+	remap[order] = np.arange(k)
+	return remap[labels], centers[order]
 
 
 def estimate_scale(puzzle_width_px: int, real_width_cm: float) -> float:
@@ -42,7 +271,14 @@ __all__ = [
 	"get_image_size",
 	"compute_area",
 	"dominant_color",
+	"dominant_colors_batch",
+	"color_histogram",
+	"block_color_histograms",
+	"backproject_blocks",
 	"color_distance",
+	"rgb_to_lab",
+	"color_distance_matrix",
+	"cluster_by_color",
 	"estimate_scale",
 ]
 
@@ -1,9 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk, ImageDraw, ImageFont
 import os
+import queue
 import threading
 import time
+from collections import deque
 
 class _TooltipManager:
     def __init__(self, root):
@@ -29,7 +30,34 @@ class _TooltipManager:
             self.tip.destroy()
             self.tip = None
 
+class _JobWorker:
+    """Thread de trabalho única e persistente: executa os jobs por ordem de chegada."""
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="gui-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        self._jobs.put(job)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                job()
+            except Exception:
+                pass  # Os jobs reportam os seus próprios erros à UI
+            finally:
+                self._jobs.task_done()
+
 class PuzzleGUI(tk.Tk):
+    UI_PUMP_MS = 50          # Frequência de atualização da UI (20 Hz)
+    UI_PUMP_BUDGET_S = 0.02  # Tempo máximo por ciclo a processar eventos
+    LOG_MAX_LINES = 2000     # Ring buffer do log
+    AMBIGUITY_WARN = 0.2     # Razão melhor/segunda a partir da qual o match é ambíguo
+    DUPLICATE_COLOR = "#999999"  # Overlay de peças repetidas (resultado reutilizado)
+
     def __init__(self):
         super().__init__()
         self.title("Puzzle Solver GUI")
@@ -39,7 +67,43 @@ class PuzzleGUI(tk.Tk):
         self.pieces_imgs = []
         self.current_piece_idx = 0
         self.matching_cancelled = False  # Para controlar cancelamento
+        self._cancel_event = threading.Event()  # Interrompe o pool de processos do batch
+        self._overlay_results = []  # Resultados desenhados, em coordenadas da imagem
+        self._session_records = ()  # Sessão carregada (results_io.SessionRecords), desenhada antes destes
+        self._export_writer = None  # Sessão em gravação (results_io.ResultWriter)
+        self._match_session = None  # Puzzle de trabalho em cache (matching.MatchSession)
+        self._result_cache = None  # Resultados persistentes entre execuções (result_cache.MatchCache)
+        self._thumbnails = None  # viewer.ThumbnailCache, criado em _finish_startup
+        # Eventos worker -> UI, drenados a ritmo fixo por _pump_events
+        self._events = queue.SimpleQueue()
+        self._pending_progress = None  # Só o último progresso interessa (coalescido)
+        self._log_lines = deque(maxlen=self.LOG_MAX_LINES)
+        self._worker = _JobWorker()
         self._build_widgets()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.after(self.UI_PUMP_MS, self._pump_events)
+        # Arranque rápido: a janela é pintada primeiro (só Tk); NumPy/PIL, o
+        # viewer e o pré-aquecimento do matching vêm logo a seguir
+        self.after_idle(lambda: self.after(1, self._finish_startup))
+
+    def _finish_startup(self):
+        """Segunda fase do arranque, já com a janela visível."""
+        from .viewer import OverlayLayer, PuzzleViewer, ThumbnailCache
+        self._thumbnails = ThumbnailCache(budget_bytes=64 * 1024 * 1024)
+        self.overlay_layer = OverlayLayer()
+        self.viewer = PuzzleViewer(self.puzzle_canvas, on_click=self._on_puzzle_click)
+        self.viewer.overlay = self.overlay_layer
+        # cv2 + primeira chamada do matcher enquanto o utilizador escolhe ficheiros
+        self._worker.submit(self._prewarm)
+
+    def _prewarm(self):
+        from .startup import prewarm
+        timings = prewarm()
+        if "error" in timings:
+            self._log(f"⚠️ Pré-aquecimento do matching falhou: {timings['error']}")
+        else:
+            self._log(f"⚡ Matching pronto ({timings['backend']}): imports {timings['import_s']:.2f}s, "
+                      f"1º match {timings['first_match_s']:.2f}s")
 
     def _build_widgets(self):
         # Layout: main (left) | logs (right)
@@ -79,8 +143,20 @@ class PuzzleGUI(tk.Tk):
         self.gpu_var = tk.BooleanVar(value=False)
         self.gpu_cb = ttk.Checkbutton(row2, text="GPU", variable=self.gpu_var)
         self.gpu_cb.pack(side=tk.LEFT)
+        self.prefilter_var = tk.BooleanVar(value=False)
+        self.prefilter_cb = ttk.Checkbutton(row2, text="Color prefilter", variable=self.prefilter_var)
+        self.prefilter_cb.pack(side=tk.LEFT, padx=(10, 0))
+        self.dedup_var = tk.BooleanVar(value=True)
+        self.dedup_cb = ttk.Checkbutton(row2, text="Skip duplicates", variable=self.dedup_var)
+        self.dedup_cb.pack(side=tk.LEFT, padx=(10, 0))
+        self.patch_var = tk.BooleanVar(value=False)
+        self.patch_cb = ttk.Checkbutton(row2, text="Patch index", variable=self.patch_var)
+        self.patch_cb.pack(side=tk.LEFT, padx=(10, 0))
         self._tooltip.bind(self.downscale_cb, "Coarse downscale do puzzle para acelerar; refina em full-res no fim.")
         self._tooltip.bind(self.gpu_cb, "Usa OpenCV CUDA se disponível; caso contrário, usa CPU automaticamente.")
+        self._tooltip.bind(self.prefilter_cb, "Histograma de cor da peça restringe o matching às regiões mais prováveis do puzzle.")
+        self._tooltip.bind(self.dedup_cb, "Hash perceptual das peças: digitalizações repetidas reutilizam o resultado da primeira cópia.")
+        self._tooltip.bind(self.patch_cb, "Localização aproximada por vizinhos mais próximos num índice de patches do puzzle (sem correlação).")
 
         row3 = ttk.Frame(controls)
         row3.pack(fill=tk.X, pady=3)
@@ -92,10 +168,12 @@ class PuzzleGUI(tk.Tk):
         match_all_btn.pack(side=tk.LEFT, padx=(6, 0))
         cancel_btn = ttk.Button(row3, text="Cancel", command=self.cancel_matching, state='disabled')
         cancel_btn.pack(side=tk.LEFT, padx=(6, 0))
-        clear_btn = ttk.Button(row3, text="Clear Overlay", command=lambda: self.puzzle_canvas.delete("overlay"))
+        clear_btn = ttk.Button(row3, text="Clear Overlay", command=self._clear_overlays)
         clear_btn.pack(side=tk.LEFT, padx=(6, 0))
         export_btn = ttk.Button(row3, text="Export Results", command=self.export_results)
         export_btn.pack(side=tk.LEFT, padx=(6, 0))
+        session_btn = ttk.Button(row3, text="Load Session", command=self.load_session)
+        session_btn.pack(side=tk.LEFT, padx=(6, 0))
         
         # Guardar referência aos botões para controle de estado
         self.compute_btn = compute_btn
@@ -109,7 +187,8 @@ class PuzzleGUI(tk.Tk):
         self._tooltip.bind(match_all_btn, "Matching simultâneo de todas as peças carregadas com traçados identificados.")
         self._tooltip.bind(cancel_btn, "Cancelar o processo de matching em andamento.")
         self._tooltip.bind(clear_btn, "Limpar todos os traçados/overlays do puzzle.")
-        self._tooltip.bind(export_btn, "Exportar resultados para arquivo JSON.")
+        self._tooltip.bind(export_btn, "Gravar resultados (JSONL ou .npz) à medida que são produzidos; clicar de novo termina a gravação.")
+        self._tooltip.bind(session_btn, "Recarregar uma sessão exportada no puzzle, sem refazer o matching.")
 
         # Puzzle + Piece side by side
         center_row = ttk.Frame(main)
@@ -121,6 +200,9 @@ class PuzzleGUI(tk.Tk):
         ttk.Label(puzzle_frame, text="Puzzle").pack(anchor='w')
         self.puzzle_canvas = tk.Canvas(puzzle_frame, background="#1f1f1f", highlightthickness=1, highlightbackground="#555")
         self.puzzle_canvas.pack(fill=tk.BOTH, expand=True, padx=2, pady=(2, 0))
+        # Zoom (roda do rato), pan (arrastar) e ajuste à janela (duplo clique):
+        # o PuzzleViewer é ligado ao canvas em _finish_startup
+        self._tooltip.bind(self.puzzle_canvas, "Roda do rato: zoom · Arrastar: mover · Duplo clique: ajustar à janela · Clique: identificar peça")
 
         # Piece navigation and display
         piece_panel = ttk.Labelframe(center_row, text='Piece')
@@ -154,12 +236,20 @@ class PuzzleGUI(tk.Tk):
     def _show_progress(self, message="Processando..."):
         """Mostrar barra de progresso."""
         self.progress_label.config(text=message)
+        self.progress_bar.configure(mode='indeterminate', value=0)
         self.progress_bar.pack(fill=tk.X)
         self.progress_bar.start(10)
         self.update_idletasks()
 
+    def _update_progress(self, completed, total, message):
+        """Barra determinada: peças concluídas / total."""
+        self.progress_bar.stop()
+        self.progress_bar.configure(mode='determinate', maximum=max(total, 1), value=completed)
+        self.progress_label.config(text=message)
+
     def _hide_progress(self):
         """Esconder barra de progresso."""
+        self._pending_progress = None
         self.progress_bar.stop()
         self.progress_bar.pack_forget()
         self.progress_label.config(text="")
@@ -176,6 +266,7 @@ class PuzzleGUI(tk.Tk):
         if hasattr(self, 'cancel_btn'):
             self.cancel_btn.configure(state='normal')  # Habilitar cancelar
         self.matching_cancelled = False  # Reset flag
+        self._cancel_event.clear()
 
     def _enable_buttons(self):
         """Reabilitar botões após processamento."""
@@ -214,18 +305,48 @@ class PuzzleGUI(tk.Tk):
             self.current_piece_idx = (self.current_piece_idx + 1) % len(self.pieces_imgs)
             self._display_piece_by_idx(self.current_piece_idx)
 
-    def _display_piece_by_idx(self, idx):
+    def _piece_display_size(self):
+        self.piece_canvas.update_idletasks()
+        max_w = self.piece_canvas.winfo_width()
+        max_h = self.piece_canvas.winfo_height()
+        if max_w < 10 or max_h < 10:
+            max_w, max_h = 240, 160
+        return max_w, max_h
+
+    def _display_piece_by_idx(self, idx, prefetch=3):
         if not self.pieces_imgs:
             return
         piece = self.pieces_imgs[idx]
-        self._display_image(piece['img_annotated'], self.piece_canvas, 'piece')
+        size = self._piece_display_size()
+        # Miniatura gerada à medida (cache LRU) em vez de cópias anotadas em full-res
+        try:
+            thumb = self._thumbnails.get(piece['path'], size, label=str(piece['id']))
+        except Exception as e:
+            self._log(f"❌ Erro ao mostrar peça {piece['id']}: {e}")
+            return
+        from PIL import ImageTk
+        tk_img = ImageTk.PhotoImage(thumb)
+        self.piece_canvas.configure(image=tk_img, text='')
+        self.piece_canvas.image = tk_img
+        # Pré-carregar as próximas peças (e a anterior) para navegação instantânea
+        n = len(self.pieces_imgs)
+        upcoming = [(idx + k) % n for k in range(1, prefetch + 1)] + [(idx - 1) % n]
+        self._thumbnails.prefetch(
+            [(self.pieces_imgs[i]['path'], str(self.pieces_imgs[i]['id'])) for i in dict.fromkeys(upcoming) if i != idx],
+            size,
+        )
 
     def load_puzzle(self):
         path = filedialog.askopenfilename(title="Select Puzzle Image", initialdir=self._default_puzzle_dir())
         if not path:
             return
         try:
-            self.puzzle_img = Image.open(path)
+            from .acquisition import open_image
+            self.puzzle_img = open_image(path)
+            self.puzzle_path = path
+            self._stop_export()  # A sessão gravada pertence ao puzzle anterior
+            self._match_session = None  # Puzzle reduzido/prefiltro do puzzle anterior
+            self._clear_overlays()
             self._display_image(self.puzzle_img, self.puzzle_canvas, 'puzzle')
             self._log(f"Puzzle carregado: {path}")
         except Exception as e:
@@ -236,6 +357,7 @@ class PuzzleGUI(tk.Tk):
         if not path:
             return
         try:
+            from PIL import Image
             self.piece_img = Image.open(path)
             self._display_image(self.piece_img, self.piece_canvas, 'piece')
             self._log(f"Loaded piece: {path}")
@@ -246,19 +368,16 @@ class PuzzleGUI(tk.Tk):
         paths = filedialog.askopenfilenames(title="Select Piece Images", initialdir=self._default_piece_dir(), filetypes=[("Image Files", "*.png;*.jpg;*.jpeg;*.bmp")])
         if not paths:
             return
+        from .acquisition import LazyImage
         self.pieces_imgs = []
+        self._thumbnails.clear()
+        # Handles preguiçosos: só o cabeçalho é lido aqui; os píxeis são
+        # descodificados quando a peça é usada no matching
         for idx, path in enumerate(paths):
             try:
-                img = Image.open(path)
-                img_ = img.copy()
-                draw = ImageDraw.Draw(img_)
-                try:
-                    font = ImageFont.truetype("arial.ttf", 60)
-                except Exception:
-                    font = ImageFont.load_default()
-                draw.rectangle([0,0,70,50], fill=(255,255,255,200))
-                draw.text((8,2), str(idx+1), fill=(0,0,0), font=font)
-                self.pieces_imgs.append({'img': img, 'img_annotated': img_, 'id': idx+1, 'path': path})
+                img = LazyImage(path)
+                img.size  # Valida o ficheiro (leitura do cabeçalho apenas)
+                self.pieces_imgs.append({'img': img, 'id': idx+1, 'path': path})
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load piece: {path}\n{e}")
         if self.pieces_imgs:
@@ -266,46 +385,75 @@ class PuzzleGUI(tk.Tk):
             self._display_piece_by_idx(0)
 
     def _display_image(self, img, widget, kind):
+        if kind == 'puzzle':
+            # Puzzle: pirâmide de resolução + render só do viewport visível
+            self.viewer.set_image(img)
+            return
         if kind == 'piece' and hasattr(self, 'piece_canvas'):
             self.piece_canvas.update_idletasks()
             max_w = self.piece_canvas.winfo_width()
             max_h = self.piece_canvas.winfo_height()
             if max_w < 10 or max_h < 10:
                 max_w, max_h = 240, 160
-        elif kind == 'puzzle':
-            # Para o puzzle, usar o tamanho do canvas
-            if hasattr(widget, 'winfo_width'):
-                widget.update_idletasks()
-                max_w = widget.winfo_width()
-                max_h = widget.winfo_height()
-                if max_w < 50 or max_h < 50:
-                    max_w, max_h = 600, 400
-            else:
-                max_w, max_h = 600, 400
         else:
             max_w, max_h = 240, 160
-        
+
+        from PIL import Image, ImageTk
         w, h = img.size
         scale = min(max_w / w, max_h / h, 1.0)
-        new_size = (int(w * scale), int(h * scale))
+        new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
         img_resized = img.resize(new_size, Image.Resampling.LANCZOS)
         tk_img = ImageTk.PhotoImage(img_resized)
-        
-        if kind == 'puzzle':
-            # Para Canvas (puzzle)
-            widget.delete("image")  # Remove imagem anterior
-            widget.create_image(max_w//2, max_h//2, anchor='center', image=tk_img, tags="image")
-            widget.image = tk_img  # Manter referência
-        else:
-            # Para Label (pieces)
-            try:
-                widget.configure(image=tk_img, text='')
-            except Exception:
-                pass
-            widget.image = tk_img
+
+        # Para Label (pieces)
+        try:
+            widget.configure(image=tk_img, text='')
+        except Exception:
+            pass
+        widget.image = tk_img
 
     def _log(self, text):
-        self.text.insert(tk.END, text + "\n")
+        """Registar uma linha no log (seguro a partir de qualquer thread)."""
+        self._events.put(('log', text))
+
+    def _post(self, callback):
+        """Agendar callback na thread da UI (seguro a partir de qualquer thread)."""
+        self._events.put(('call', callback))
+
+    def _post_progress(self, completed, total, message):
+        """Atualização de progresso coalescida: só a mais recente é desenhada."""
+        self._pending_progress = (completed, total, message)
+
+    def _pump_events(self):
+        """Drenar eventos dos workers a ritmo fixo, em lote, dentro de um orçamento."""
+        lines = []
+        deadline = time.perf_counter() + self.UI_PUMP_BUDGET_S
+        while time.perf_counter() < deadline:
+            try:
+                kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'log':
+                lines.append(payload)
+            else:
+                try:
+                    payload()
+                except Exception as e:
+                    lines.append(f"❌ Erro na UI: {e}")
+        if lines:
+            self._flush_log(lines)
+        progress, self._pending_progress = self._pending_progress, None
+        if progress is not None and self.progress_bar.winfo_ismapped():
+            self._update_progress(*progress)
+        self.after(self.UI_PUMP_MS, self._pump_events)
+
+    def _flush_log(self, lines):
+        """Inserir as linhas num só passo e manter o widget limitado ao ring buffer."""
+        self._log_lines.extend(lines)
+        self.text.insert(tk.END, "\n".join(lines) + "\n")
+        excess = int(self.text.index('end-1c').split('.')[0]) - 1 - self.LOG_MAX_LINES
+        if excess > 0:
+            self.text.delete('1.0', f'{excess + 1}.0')
         self.text.see(tk.END)
 
     def _default_puzzle_dir(self):
@@ -339,90 +487,140 @@ class PuzzleGUI(tk.Tk):
         
         self._show_progress(f"Matching {len(self.pieces_imgs)} peças...")
         self._disable_buttons()
-        
+        self._clear_overlays()
+        use_gpu = self.gpu_var.get()
+        use_prefilter = self.prefilter_var.get()
+        use_downscale = self.downscale_var.get()
+        use_dedup = self.dedup_var.get()
+        use_patch_index = self.patch_var.get()
+
         def matching_all_thread():
             try:
-                results = self._perform_batch_matching(num_pieces)
-                self.after(0, lambda: self._handle_batch_results(results))
+                results = self._perform_batch_matching(num_pieces, use_gpu, use_prefilter, use_downscale, use_dedup,
+                                                       use_patch_index)
+                if not self._cancel_event.is_set():
+                    self._post(lambda: self._handle_batch_results(results))
             except Exception as e:
-                self.after(0, lambda: self._handle_batch_error(e))
-        
-        thread = threading.Thread(target=matching_all_thread, daemon=True)
-        thread.start()
+                self._post(lambda: self._handle_batch_error(e))
+
+        self._worker.submit(matching_all_thread)
 
     def cancel_matching(self):
         """Cancelar processo de matching em andamento."""
         self.matching_cancelled = True
+        self._cancel_event.set()
         self._log("🛑 Cancelamento solicitado...")
         self._hide_progress()
         self._enable_buttons()
         # Limpar qualquer overlay parcial
-        self.puzzle_canvas.delete("overlay")
+        self._clear_overlays()
+
+    def _perform_batch_matching(self, num_pieces, use_gpu=False, use_prefilter=False, use_downscale=True,
+                                use_dedup=True, use_patch_index=False):
+        """Matching paralelo num pool de processos; cada resultado é enviado
+        para a UI assim que chega (overlay + progresso com ETA). Com ``use_dedup``
+        as peças repetidas reutilizam o resultado da primeira cópia; com
+        ``use_patch_index`` as peças são localizadas no índice de patches
+        (nesta thread, sem pool: cada consulta leva milissegundos)."""
+        session = self._matching_session(use_downscale)
 
-    def _perform_batch_matching(self, num_pieces):
-        """Executar matching de múltiplas peças com otimizações."""
         results = []
         total_pieces = len(self.pieces_imgs)
-        
-        for i, piece_data in enumerate(self.pieces_imgs):
-            # Verificar se foi cancelado
-            if self.matching_cancelled:
-                self.after(0, lambda: self._log("🛑 Matching cancelado pelo usuário."))
-                break
-                
-            piece_img = piece_data['img']
-            piece_id = piece_data['id']
-            
-            # Atualizar progresso
-            progress_msg = f"Processando peça {piece_id} ({i+1}/{total_pieces})"
-            self.after(0, lambda msg=progress_msg: self._show_progress(msg))
-            
-            try:
-                # Usar o método otimizado
-                result = self._perform_optimized_matching(piece_img, piece_id, num_pieces)
-                
-                if "error" not in result:
-                    # Extrair informações do resultado
-                    best_pos = result.get("best_position", (0, 0))
-                    scale = result.get("scale", 1.0)
-                    similarity = result.get("refined_similarity", 0.0)
-                    piece_size = result.get("piece_size_final", piece_img.size)
-                    
-                    results.append({
-                        'piece_id': piece_id,
-                        'position': best_pos,
-                        'size': piece_size,
-                        'similarity': similarity,
-                        'scale': scale,
-                        'color': "#0066FF"
-                    })
-                    
-                    # Log no thread principal
-                    self.after(0, lambda pid=piece_id, pos=best_pos, sim=similarity, sc=scale: 
-                              self._log(f"     ✅ Peça {pid}: pos=({pos[0]}, {pos[1]}), sim={sim:.1%}, escala={sc:.2f}"))
-                else:
-                    self.after(0, lambda pid=piece_id, err=result['error']: 
-                              self._log(f"     ❌ Peça {pid}: {err}"))
-                    
-            except Exception as e:
-                self.after(0, lambda pid=piece_id, err=str(e): 
-                          self._log(f"     ❌ Erro peça {pid}: {err}"))
-                continue
-        
+        completed = 0
+        start_time = time.perf_counter()
+        if use_patch_index:
+            batch = self._iter_patch_index(session, num_pieces)
+        else:
+            batch = session.iter_batch(
+                [piece_data['path'] for piece_data in self.pieces_imgs],
+                use_prefilter=use_prefilter,
+                dedup=use_dedup,
+                cancel_event=self._cancel_event,
+                num_pieces=num_pieces,
+                use_gpu=use_gpu,
+                method='SQDIFF_NORMED',
+            )
+        cached = duplicates = 0
+        for idx, result in batch:
+            completed += 1
+            cached += bool(result.get("cached"))
+            piece_data = self.pieces_imgs[idx]
+            original = result.get("duplicate_of")
+            duplicate_of = self.pieces_imgs[original]['id'] if original is not None else None
+            duplicates += duplicate_of is not None
+
+            entry = None
+            if "error" not in result:
+                entry = {
+                    'piece_id': piece_data['id'],
+                    'position': result.get("best_position", (0, 0)),
+                    'size': result.get("piece_size_final", piece_data['img'].size),
+                    'similarity': result.get("refined_similarity", 0.0),
+                    'scale': result.get("scale", 1.0),
+                    'angle': result.get("angle", 0.0),
+                    'elapsed_s': result.get("elapsed_s", 0.0),
+                    'path': piece_data['path'],
+                    'ambiguity': result.get("ambiguity"),
+                    'alternatives': result.get("candidates", [])[1:],
+                    'duplicate_of': duplicate_of,
+                    'color': self.DUPLICATE_COLOR if duplicate_of is not None else "#0066FF"
+                }
+                results.append(entry)
+
+            # Throughput medido -> ETA
+            elapsed = time.perf_counter() - start_time
+            rate = completed / elapsed if elapsed > 0 else 0.0
+            eta = (total_pieces - completed) / rate if rate > 0 else 0.0
+            self._post(lambda pid=piece_data['id'], res=result, e=entry: self._on_batch_result(pid, res, e))
+            self._post_progress(completed, total_pieces,
+                                f"{completed}/{total_pieces} peças · {rate:.1f} peças/s · ETA {eta:.0f}s")
+
+        if duplicates:
+            self._log(f"🔁 {duplicates} peça(s) repetida(s) reutilizaram o resultado da primeira cópia")
+        if cached:
+            self._log(f"💾 {cached}/{total_pieces} resultados vindos do cache (peças e puzzle inalterados)")
+        if self._cancel_event.is_set():
+            self._log("🛑 Matching cancelado pelo usuário.")
         return results
 
+    def _iter_patch_index(self, session, num_pieces):
+        """(índice, resultado) de cada peça localizada no índice de patches."""
+        index = session.patch_index(num_pieces)
+        self._log(f"⚡ Índice de patches: {len(index)} patches em {len(index.sides)} tamanhos")
+        for idx, piece_data in enumerate(self.pieces_imgs):
+            if self._cancel_event.is_set():
+                return
+            piece = piece_data['img']
+            result = session.locate(piece, num_pieces=num_pieces)
+            # Handle preguiçoso: não reter os píxeis de todas as peças do lote
+            if hasattr(piece, 'release'):
+                piece.release()
+            yield idx, result
+
+    def _on_batch_result(self, piece_id, result, entry):
+        """Um resultado do batch chegou: desenhar o overlay (o progresso é coalescido à parte)."""
+        if self._cancel_event.is_set():
+            return
+        if entry is not None and entry.get('duplicate_of') is not None:
+            self._draw_piece_overlays([entry])
+            self._log(f"     🔁 Peça {piece_id}: duplicada da peça {entry['duplicate_of']} (resultado reutilizado)")
+        elif entry is not None:
+            pos = entry['position']
+            self._draw_piece_overlays([entry])
+            self._log(f"     ✅ Peça {piece_id}: pos=({pos[0]}, {pos[1]}), "
+                      f"sim={entry['similarity']:.1%}, escala={entry['scale']:.2f}")
+            self._log_ambiguity(entry, indent="     ")
+        else:
+            self._log(f"     ❌ Peça {piece_id}: {result['error']}")
+
     def _handle_batch_results(self, results):
         """Processar resultados do batch matching."""
         self._hide_progress()
         self._enable_buttons()
         
         if results:
-            # Limpar overlays anteriores
-            self.puzzle_canvas.delete("overlay")
-            
-            # Analisar e reportar resultados
+            # Overlays já foram desenhados à medida que os resultados chegaram
             self._analyze_multi_piece_results(results)
-            self._draw_piece_overlays(results)
             self._log(f"✅ Matching completo! {len(results)}/{len(self.pieces_imgs)} peças processadas com sucesso.")
         else:
             self._log("❌ Nenhuma peça foi processada com sucesso.")
@@ -449,93 +647,28 @@ class PuzzleGUI(tk.Tk):
         self._log(f"   Similaridade média: {avg_sim:.1%}")
         self._log(f"   Escala média: {avg_scale:.2f}")
         
-        # Detectar sobreposições potenciais
-        overlaps = []
-        for i, r1 in enumerate(results):
-            for j, r2 in enumerate(results[i+1:], i+1):
-                if self._check_overlap(r1, r2):
-                    overlaps.append((r1['piece_id'], r2['piece_id']))
-        
-        if overlaps:
-            self._log(f"⚠️  Sobreposições detectadas: {overlaps}")
+        # Detectar sobreposições: índice espacial em grelha + razão
+        # interseção/área-mínima vetorizada (quase linear no nº de peças)
+        from .spatial import overlap_pairs, conflict_components
+        # Cópias repetidas ocupam o lugar do original por definição: não contam
+        results = [r for r in results if r.get('duplicate_of') is None]
+        if len(results) < 2:
+            return
+        xs, ys = zip(*(r['position'] for r in results))
+        ws, hs = zip(*(r['size'] for r in results))
+        first, second, ratio = overlap_pairs(xs, ys, ws, hs, threshold=0.3)
+
+        if len(first):
+            ids = [r['piece_id'] for r in results]
+            overlaps = [(ids[a], ids[b]) for a, b in zip(first[:20].tolist(), second[:20].tolist())]
+            more = f" (+{len(first) - 20})" if len(first) > 20 else ""
+            self._log(f"⚠️  Sobreposições detectadas: {overlaps}{more}")
+            groups = conflict_components(len(results), first, second)
+            biggest = max(len(g) for g in groups)
+            self._log(f"   {len(groups)} grupos em conflito (maior: {biggest} peças)")
         else:
             self._log("✅ Nenhuma sobreposição detectada.")
 
-    def _check_overlap(self, result1, result2, threshold=0.3):
-        """Verificar se duas peças se sobrepõem significativamente."""
-        x1, y1 = result1['position']
-        w1, h1 = result1['size']
-        
-        x2, y2 = result2['position']
-        w2, h2 = result2['size']
-        
-        # Calcular área de interseção
-        left = max(x1, x2)
-        top = max(y1, y2)
-        right = min(x1 + w1, x2 + w2)
-        bottom = min(y1 + h1, y2 + h2)
-        
-        if left >= right or top >= bottom:
-            return False  # Sem interseção
-        
-        intersection_area = (right - left) * (bottom - top)
-        area1 = w1 * h1
-        area2 = w2 * h2
-        min_area = min(area1, area2)
-        
-        return (intersection_area / min_area) > threshold
-
-    def export_results(self):
-        """Exportar resultados do matching para arquivo JSON."""
-        if not hasattr(self, 'puzzle_img') or not self.pieces_imgs:
-            self._log("❌ Nenhum resultado para exportar.")
-            return
-            
-        try:
-            from tkinter import filedialog
-            import json
-            from datetime import datetime
-            
-            # Verificar se há overlays (resultados de matching)
-            overlay_items = self.puzzle_canvas.find_withtag("overlay")
-            if not overlay_items:
-                self._log("❌ Execute primeiro o matching das peças.")
-                return
-            
-            # Preparar dados para exportação
-            export_data = {
-                "timestamp": datetime.now().isoformat(),
-                "puzzle_info": {
-                    "size": self.puzzle_img.size,
-                    "mode": self.puzzle_img.mode
-                },
-                "pieces_count": len(self.pieces_imgs),
-                "pieces": []
-            }
-            
-            # Adicionar informações das peças (note: isso é uma simplificação)
-            for piece_data in self.pieces_imgs:
-                export_data["pieces"].append({
-                    "id": piece_data['id'],
-                    "path": piece_data['path'],
-                    "size": piece_data['img'].size
-                })
-            
-            # Salvar arquivo
-            filename = filedialog.asksaveasfilename(
-                title="Salvar resultados",
-                defaultextension=".json",
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
-            )
-            
-            if filename:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(export_data, f, indent=2, ensure_ascii=False)
-                self._log(f"✅ Resultados exportados para: {filename}")
-            
-        except Exception as e:
-            self._log(f"❌ Erro ao exportar: {str(e)}")
-
     def compute_metrics(self):
         """Calcular métricas das imagens carregadas."""
         if not hasattr(self, 'puzzle_img'):
@@ -554,15 +687,21 @@ class PuzzleGUI(tk.Tk):
         if self.pieces_imgs:
             self._log(f"📊 Métricas das {len(self.pieces_imgs)} peças carregadas:")
             
+            # Cores dominantes de todas as peças numa única chamada vetorizada
+            # (descodificação reduzida e paralela: a cor usa só uma miniatura)
+            from .acquisition import load_images
+            from .features import dominant_colors_batch
+            colors = dominant_colors_batch(load_images([p['path'] for p in self.pieces_imgs], max_size=256))
+
             total_piece_area = 0
-            for piece_data in self.pieces_imgs:
+            for piece_data, color in zip(self.pieces_imgs, colors):
                 piece_w, piece_h = piece_data['img'].size
                 piece_area = piece_w * piece_h
                 total_piece_area += piece_area
-                
+
                 area_ratio = (piece_area / puzzle_area) * 100
                 self._log(f"   Peça {piece_data['id']}: {piece_w}x{piece_h}px "
-                         f"(área: {piece_area:,}px, {area_ratio:.1f}% do puzzle)")
+                         f"(área: {piece_area:,}px, {area_ratio:.1f}% do puzzle), cor dominante RGB{color}")
             
             coverage = (total_piece_area / puzzle_area) * 100
             self._log(f"   Cobertura total: {coverage:.1f}% do puzzle")
@@ -613,16 +752,16 @@ class PuzzleGUI(tk.Tk):
                 result = self._perform_optimized_matching(piece_img, piece_id)
                 
                 elapsed_time = time.time() - start_time
-                self.after(0, lambda: self._log(f"⏱️ Matching completado em {elapsed_time:.1f}s"))
+                result.setdefault("elapsed_s", elapsed_time)
+                self._log(f"⏱️ Matching completado em {elapsed_time:.1f}s")
                 
-                # Usar after para executar no thread principal
-                self.after(0, lambda: self._handle_single_match_result(result, piece_id))
+                # Resultado entregue à thread da UI pela bomba de eventos
+                self._post(lambda: self._handle_single_match_result(result, piece_id))
             except Exception as e:
                 error_msg = str(e)  # Capturar a mensagem de erro
-                self.after(0, lambda: self._handle_match_error(error_msg, piece_id))
-        
-        thread = threading.Thread(target=matching_thread, daemon=True)
-        thread.start()
+                self._post(lambda: self._handle_match_error(error_msg, piece_id))
+
+        self._worker.submit(matching_thread)
 
     def _perform_optimized_matching(self, piece_img, piece_id, num_pieces=None):
         """Executar matching otimizado com configurações de performance."""
@@ -638,47 +777,40 @@ class PuzzleGUI(tk.Tk):
         
         # Log dos parâmetros
         if use_gpu:
-            self.after(0, lambda: self._log("🚀 Tentando usar GPU para matching..."))
+            self._log("🚀 Tentando usar GPU para matching...")
         
         # Log de debug dos tamanhos
         puzzle_w, puzzle_h = self.puzzle_img.size
         piece_w, piece_h = piece_img.size
-        self.after(0, lambda: self._log(f"🔍 Debug: Puzzle {puzzle_w}x{puzzle_h}, Peça {piece_w}x{piece_h}, num_pieces={num_pieces}"))
-        
-        # Importar módulos
-        from .matching import multi_scale_template_match
+        self._log(f"🔍 Debug: Puzzle {puzzle_w}x{puzzle_h}, Peça {piece_w}x{piece_h}, num_pieces={num_pieces}")
         
+        # Puzzle de trabalho reduzido uma só vez por puzzle/definição de downscale
+        session = self._matching_session(use_downscale)
+
+        # Índice de patches (ANN): localização aproximada, sem correlação
+        if self.patch_var.get():
+            result = session.locate(piece_img, num_pieces=num_pieces)
+            if "error" not in result:
+                self._log(f"   ⚡ Índice de patches: {len(session.patch_index(num_pieces))} patches, "
+                          f"{result['elapsed_s'] * 1000:.0f} ms")
+            return result
+
         # Configurações otimizadas
         optimized_params = {
-            'puzzle_img': self.puzzle_img,
-            'piece_img': piece_img,
             'num_pieces': num_pieces,
-            'use_downscale': True,  # Sempre usar downscale para velocidade
             'use_gpu': use_gpu,  # Usar a opção escolhida pelo usuário
-            'method': 'SQDIFF_NORMED'  # Método mais rápido
+            'method': 'SQDIFF_NORMED',  # Método mais rápido
+            # Prefiltro de cor: restringir a correlação às regiões com cores da peça
+            'use_prefilter': self.prefilter_var.get(),
         }
-        
-        # Se a imagem for grande, fazer downscale mais agressivo para evitar travamentos
-        puzzle_w, puzzle_h = self.puzzle_img.size
-        scale_factor_applied = None
-        if puzzle_w * puzzle_h > 1500 * 1500:  # Limite menor para evitar travamentos
-            # Para puzzles grandes, reduzir significativamente
-            scale_factor = min(1200 / puzzle_w, 1200 / puzzle_h, 1.0)
-            if scale_factor < 1.0:
-                new_w = int(puzzle_w * scale_factor)
-                new_h = int(puzzle_h * scale_factor)
-                puzzle_resized = self.puzzle_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                optimized_params['puzzle_img'] = puzzle_resized
-                scale_factor_applied = scale_factor  # Guardar separadamente
-        
+
         # Adicionar controle de erro para GPU
         try:
-            # Executar matching (sem passar _scale_factor)
-            result = multi_scale_template_match(**optimized_params)
+            result = session.match(piece_img, **optimized_params)
             
             # Log de sucesso
             if use_gpu:
-                self.after(0, lambda: self._log("✅ Matching com GPU concluído com sucesso"))
+                self._log("✅ Matching com GPU concluído com sucesso")
             
         except Exception as e:
             error_msg = str(e).lower()
@@ -687,27 +819,51 @@ class PuzzleGUI(tk.Tk):
             is_gpu_error = use_gpu and any(keyword in error_msg for keyword in gpu_error_keywords)
             
             if is_gpu_error:
-                self.after(0, lambda: self._log("⚠️ GPU não disponível, usando CPU..."))
+                self._log("⚠️ GPU não disponível, usando CPU...")
                 optimized_params['use_gpu'] = False
                 try:
-                    result = multi_scale_template_match(**optimized_params)
-                    self.after(0, lambda: self._log("✅ Matching com CPU concluído"))
+                    result = session.match(piece_img, **optimized_params)
+                    self._log("✅ Matching com CPU concluído")
                 except Exception as cpu_error:
                     raise cpu_error
             else:
                 raise e
         
-        # Ajustar posições se houve downscale
-        if scale_factor_applied is not None:
-            if 'best_position' in result:
-                pos_x, pos_y = result['best_position']
-                result['best_position'] = (int(pos_x / scale_factor_applied), int(pos_y / scale_factor_applied))
-            if 'piece_size_final' in result:
-                size_w, size_h = result['piece_size_final']
-                result['piece_size_final'] = (int(size_w / scale_factor_applied), int(size_h / scale_factor_applied))
-        
+        if optimized_params['use_prefilter'] and 'search_area_ratio' in result:
+            reduction = 1.0 - result['search_area_ratio']
+            self._log(f"   🎯 Peça {piece_id}: prefiltro de cor reduziu a área de busca em {reduction:.0%}")
+
         return result
 
+    def _matching_session(self, use_downscale=True):
+        """Sessão de matching do puzzle atual; recriada só quando o puzzle ou o
+        downscale mudam (chamado apenas a partir da thread de trabalho)."""
+        from .matching import MatchSession
+        session = self._match_session
+        if session is None or not session.matches(self.puzzle_img, use_downscale):
+            session = MatchSession(self.puzzle_img, use_downscale=use_downscale,
+                                   cache=self._match_cache(), puzzle_key=self._puzzle_cache_key())
+            self._match_session = session
+            if session.scale_factor is not None:
+                w, h = session.image.size
+                self._log(f"   Puzzle de trabalho: {w}x{h} (fator {session.scale_factor:.3f}), em cache")
+        return session
+
+    def _match_cache(self):
+        """Cache SQLite de resultados (aberto na primeira utilização)."""
+        if self._result_cache is None:
+            from .result_cache import MatchCache
+            self._result_cache = MatchCache()
+        return self._result_cache
+
+    def _puzzle_cache_key(self):
+        """Hash do ficheiro do puzzle; None se não houver ficheiro (hash dos pixels)."""
+        path = getattr(self, 'puzzle_path', None)
+        if not path or not os.path.isfile(path):
+            return None
+        from .indexing import file_hash
+        return "file:" + file_hash(path)
+
     def _handle_single_match_result(self, result, piece_id):
         """Processar resultado de matching de peça única."""
         self._hide_progress()
@@ -724,13 +880,19 @@ class PuzzleGUI(tk.Tk):
         piece_size = result.get("piece_size_final", self.pieces_imgs[self.current_piece_idx]['img'].size)
         
         # Limpar overlays anteriores e desenhar novo
-        self.puzzle_canvas.delete("overlay")
+        self._clear_overlays()
         
         result_data = [{
             'piece_id': piece_id,
             'position': best_pos,
             'size': piece_size,
             'similarity': similarity,
+            'scale': scale,
+            'angle': result.get("angle", 0.0),
+            'elapsed_s': result.get("elapsed_s", 0.0),
+            'path': self.pieces_imgs[self.current_piece_idx]['path'],
+            'ambiguity': result.get("ambiguity"),
+            'alternatives': result.get("candidates", [])[1:],
             'color': "#0066FF"
         }]
         
@@ -738,6 +900,7 @@ class PuzzleGUI(tk.Tk):
         
         self._log(f"✅ Peça {piece_id}: pos=({best_pos[0]}, {best_pos[1]}), "
                  f"similaridade={similarity:.1%}, escala={scale:.2f}")
+        self._log_ambiguity(result_data[0])
 
     def _handle_match_error(self, error, piece_id):
         """Processar erro de matching."""
@@ -772,7 +935,7 @@ class PuzzleGUI(tk.Tk):
             return
             
         # Limpar overlays anteriores
-        self.puzzle_canvas.delete("overlay")
+        self._clear_overlays()
         
         # Usar uma única cor para todos os traçados
         overlay_color = "#0066FF"  # Azul
@@ -829,82 +992,141 @@ class PuzzleGUI(tk.Tk):
         else:
             self._log("❌ Nenhuma peça foi processada com sucesso.")
 
-    def _draw_piece_overlays(self, results):
-        """Desenhar retângulos e identificadores para cada peça no puzzle canvas."""
-        # Obter dimensões do canvas e da imagem
-        self.puzzle_canvas.update_idletasks()
-        canvas_w = self.puzzle_canvas.winfo_width()
-        canvas_h = self.puzzle_canvas.winfo_height()
-        
-        if not hasattr(self, 'puzzle_img'):
+    def _clear_overlays(self):
+        """Remover todos os overlays."""
+        self._overlay_results = []
+        self._session_records = ()
+        self.overlay_layer.clear()
+        self.viewer.request_redraw()
+
+    def _draw_piece_overlays(self, results, record=True):
+        """Adicionar resultados ao overlay. Ficam em coordenadas da imagem e são
+        rasterizados numa única camada (não há itens de canvas por peça)."""
+        self._overlay_results.extend(results)
+        self.overlay_layer.add(results)
+        self.viewer.request_redraw()
+        # Exportação em streaming: cada resultado é gravado assim que chega
+        if record and self._export_writer is not None:
+            try:
+                for entry in results:
+                    self._export_writer.write(entry)
+            except Exception as e:
+                self._log(f"❌ Erro ao gravar sessão: {e}")
+                self._stop_export()
+
+    def _log_ambiguity(self, entry, indent=""):
+        """Avisar quando a segunda melhor posição está quase tão boa quanto a melhor."""
+        ambiguity = entry.get('ambiguity')
+        if ambiguity is not None and ambiguity >= self.AMBIGUITY_WARN:
+            self._log(f"{indent}⚠️ Correspondência ambígua (razão {ambiguity:.2f}); "
+                      f"{len(entry['alternatives'])} alternativa(s) guardada(s) — clique na peça para ver")
+
+    def _overlay_entry(self, idx):
+        """Resultado com o índice ``idx`` do overlay (sessão carregada primeiro, depois os novos)."""
+        loaded = len(self._session_records)
+        return self._session_records[idx] if idx < loaded else self._overlay_results[idx - loaded]
+
+    def _on_puzzle_click(self, x, y):
+        """Identificar a peça na posição clicada (índice espacial, sem varrer itens)."""
+        idx = self.overlay_layer.hit_test(x, y)
+        if idx is None:
             return
-            
-        img_w, img_h = self.puzzle_img.size
-        
-        # Calcular escala de exibição (mesmo cálculo usado em _display_image)
-        max_w, max_h = canvas_w, canvas_h
-        if max_w < 50 or max_h < 50:
-            max_w, max_h = 600, 400
-            
-        scale = min(max_w / img_w, max_h / img_h, 1.0)
-        display_w = int(img_w * scale)
-        display_h = int(img_h * scale)
-        
-        # Posição da imagem no canvas (centralizada)
-        offset_x = (canvas_w - display_w) // 2
-        offset_y = (canvas_h - display_h) // 2
-        
-        # Desenhar overlay para cada peça
-        for result in results:
-            piece_id = result['piece_id']
-            pos_x, pos_y = result['position']
-            piece_w, piece_h = result['size']
-            color = result['color']
-            similarity = result['similarity']
-            
-            # Converter coordenadas da imagem para coordenadas do canvas
-            canvas_x1 = offset_x + int(pos_x * scale)
-            canvas_y1 = offset_y + int(pos_y * scale)
-            canvas_x2 = canvas_x1 + int(piece_w * scale)
-            canvas_y2 = canvas_y1 + int(piece_h * scale)
-            
-            # Desenhar retângulo da peça
-            self.puzzle_canvas.create_rectangle(
-                canvas_x1, canvas_y1, canvas_x2, canvas_y2,
-                outline=color, width=3, tags="overlay"
-            )
-            
-            # Desenhar identificador da peça (número menor e mais legível)
-            text = str(piece_id)
-            text_x = canvas_x1 + 5
-            text_y = canvas_y1 + 5
-            
-            # Fundo branco menor para o número
-            text_width = len(text) * 8
-            text_height = 16
-            self.puzzle_canvas.create_rectangle(
-                text_x - 4, text_y - 4, 
-                text_x + text_width, text_y + text_height,
-                fill="white", outline=color, width=2, tags="overlay"
-            )
-            
-            # Número do identificador (fonte menor e mais legível)
-            self.puzzle_canvas.create_text(
-                text_x, text_y, anchor="nw",
-                text=text, fill=color, font=("Arial", 12, "bold"),
-                tags="overlay"
-            )
-            
-            # Similaridade em texto menor abaixo
-            sim_text = f"({similarity:.0%})"
-            self.puzzle_canvas.create_text(
-                text_x, text_y + 26, anchor="nw",
-                text=sim_text, fill=color, font=("Arial", 10),
-                tags="overlay"
-            )
+        result = self._overlay_entry(idx)
+        pos = result['position']
+        self._log(f"🔎 Peça {result['piece_id']}: pos=({pos[0]}, {pos[1]}), "
+                  f"similaridade={result['similarity']:.1%}")
+        for alt in result.get('alternatives', ()):
+            self._log(f"   ↪ alternativa: pos=({alt['position'][0]}, {alt['position'][1]}), "
+                      f"escala={alt['scale']:.2f}")
+        # Mostrar a peça correspondente no painel lateral
+        for i, piece_data in enumerate(self.pieces_imgs):
+            if piece_data['id'] == result['piece_id']:
+                self.current_piece_idx = i
+                self._display_piece_by_idx(i)
+                break
 
     def export_results(self):
-        self._log("Export results: not implemented in this minimal version.")
+        """Iniciar (ou terminar) a gravação da sessão de matching.
+
+        Os resultados já desenhados são gravados de imediato e os seguintes
+        são acrescentados à medida que chegam; nada é duplicado em memória.
+        """
+        if self._export_writer is not None:
+            self._stop_export()
+            return
+        if not hasattr(self, 'puzzle_img'):
+            self._log("❌ Carregue primeiro uma imagem do puzzle!")
+            return
+        filename = filedialog.asksaveasfilename(
+            title="Gravar sessão",
+            defaultextension=".jsonl",
+            filetypes=[("JSON Lines", "*.jsonl"), ("NumPy archive", "*.npz"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            from .results_io import ResultWriter
+            writer = ResultWriter(filename, puzzle_path=getattr(self, 'puzzle_path', None),
+                                  puzzle_size=self.puzzle_img.size)
+            for entries in (self._session_records, self._overlay_results):
+                for entry in entries:
+                    writer.write(entry)
+        except Exception as e:
+            self._log(f"❌ Erro ao exportar: {str(e)}")
+            return
+        self._export_writer = writer
+        self._log(f"💾 A gravar sessão em {filename} ({writer.count} resultados até agora); "
+                  "clique em Export Results de novo para terminar.")
+
+    def _stop_export(self):
+        """Fechar a sessão em gravação (o .npz só fica completo aqui)."""
+        writer, self._export_writer = self._export_writer, None
+        if writer is None:
+            return
+        try:
+            writer.close()
+            self._log(f"✅ Sessão exportada: {writer.path} ({writer.count} resultados)")
+        except Exception as e:
+            self._log(f"❌ Erro ao fechar sessão: {e}")
+
+    def load_session(self):
+        """Redesenhar uma sessão exportada sem refazer o matching."""
+        filename = filedialog.askopenfilename(
+            title="Abrir sessão",
+            filetypes=[("Sessões", "*.jsonl;*.npz"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            import numpy as np
+            from .results_io import SessionRecords, read_session
+            header, cols = read_session(filename)
+            puzzle_path = header.get('puzzle_path')
+            if puzzle_path and puzzle_path != getattr(self, 'puzzle_path', None) and os.path.exists(puzzle_path):
+                from .acquisition import open_image
+                self.puzzle_img = open_image(puzzle_path)
+                self.puzzle_path = puzzle_path
+                self._stop_export()
+                self._match_session = None
+                self._display_image(self.puzzle_img, self.puzzle_canvas, 'puzzle')
+            if not hasattr(self, 'puzzle_img'):
+                self._log("❌ Puzzle da sessão não encontrado; carregue-o primeiro.")
+                return
+            # O overlay partilha as colunas com SessionRecords (sem cópias); as
+            # entradas (clique, exportação) só são construídas quando pedidas
+            self._clear_overlays()
+            self._session_records = SessionRecords(cols)
+            self.overlay_layer.add_columns(
+                cols['x'], cols['y'], cols['width'], cols['height'], cols['piece_id'], cols['similarity'],
+                np.where(cols['duplicate_of'] != 0, self.DUPLICATE_COLOR, "#0066FF"))
+            self.viewer.request_redraw()
+            self._log(f"📂 Sessão carregada: {filename} ({len(self._session_records)} peças)")
+        except Exception as e:
+            self._log(f"❌ Erro ao carregar sessão: {e}")
+
+    def _on_close(self):
+        self._stop_export()
+        self.destroy()
 
 def main():
     app = PuzzleGUI()
@@ -0,0 +1,206 @@
+"""Decode-once image arrays shared by the feature and matching functions.
+
+``ImageArray`` wraps a PIL image (or ``LazyImage``, or a uint8 array) and
+converts it to a contiguous uint8 RGB array the first time the pixels are
+needed. Derived views (alpha, gray, Lab, reduced levels, backend-specific
+arrays) are computed on first access and cached on the instance. All cached
+arrays are read-only, so every consumer can share them without copying.
+Functions that take images accept either form; pass the same ``ImageArray``
+to several of them to convert only once::
+
+	puzzle = ImageArray(puzzle_img)
+	piece = ImageArray(piece_img)
+	basic_metrics(puzzle, piece)
+	multi_scale_template_match(puzzle, piece)
+"""
+
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+from PIL import Image
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+	# Flag a view, never the caller's own array
+	view = arr.view()
+	view.flags.writeable = False
+	return view
+
+
+def _as_pil(source) -> Image.Image:
+	"""The PIL image behind ``source``; ``LazyImage`` handles are decoded here.
+
+	A LazyImage forwards PIL attributes but not NumPy's array interface, so
+	it must never reach ``np.asarray`` itself.
+	"""
+	return source if isinstance(source, Image.Image) else source.image
+
+
+def _normalized_mode(img: Image.Image) -> Image.Image:
+	"""``img`` as RGB or RGBA (RGBA when it carries any transparency)."""
+	if img.mode in ("RGB", "RGBA"):
+		return img
+	has_alpha = img.mode in ("LA", "PA") or "transparency" in img.info
+	return img.convert("RGBA" if has_alpha else "RGB")
+
+
+class ImageArray:
+	"""An image decoded once into a contiguous uint8 array, with cached derived views.
+
+	``size`` is (width, height) like PIL. ``rgb`` is (H, W, 3) uint8,
+	``alpha`` (H, W) uint8 or None, ``gray`` (H, W) uint8 (ITU-R 601) and
+	``lab`` (H, W, 3) float32. ``resized`` returns another (cached)
+	ImageArray, so reduced levels cache their own views too.
+	"""
+
+	def __init__(self, source):
+		if isinstance(source, ImageArray):
+			source = source.source
+		self.source = source
+		self._cache: dict = {}
+		self._lock = threading.RLock()
+		if isinstance(source, np.ndarray):
+			arr = np.asarray(source, dtype=np.uint8)
+			if arr.ndim == 2:
+				arr = np.repeat(arr[..., None], 3, axis=2)
+			self._store_pixels(arr)
+			self.size = (arr.shape[1], arr.shape[0])
+		else:
+			self.size = tuple(source.size)
+
+	def _store_pixels(self, arr: np.ndarray) -> None:
+		if arr.shape[-1] == 4:
+			self._cache["rgb"] = _readonly(np.ascontiguousarray(arr[..., :3]))
+			self._cache["alpha"] = _readonly(np.ascontiguousarray(arr[..., 3]))
+		else:
+			self._cache["rgb"] = _readonly(np.ascontiguousarray(arr))
+			self._cache["alpha"] = None
+
+	def cached(self, key, compute):
+		"""``compute()`` on first request for ``key``, the stored value afterwards.
+
+		Thread-safe: concurrent callers wait for the first computation instead
+		of repeating it.
+		"""
+		try:
+			return self._cache[key]
+		except KeyError:
+			pass
+		with self._lock:
+			if key not in self._cache:
+				value = compute()
+				self._cache[key] = _readonly(value) if isinstance(value, np.ndarray) else value
+			return self._cache[key]
+
+	def _decode(self) -> None:
+		with self._lock:
+			if "rgb" not in self._cache:
+				self._store_pixels(np.asarray(_normalized_mode(_as_pil(self.source))))
+				# A reduced-decode LazyImage only estimates its size from the header
+				rgb = self._cache["rgb"]
+				self.size = (rgb.shape[1], rgb.shape[0])
+
+	@property
+	def width(self) -> int:
+		return self.size[0]
+
+	@property
+	def height(self) -> int:
+		return self.size[1]
+
+	@property
+	def rgb(self) -> np.ndarray:
+		if "rgb" not in self._cache:
+			self._decode()
+		return self._cache["rgb"]
+
+	@property
+	def alpha(self) -> np.ndarray | None:
+		if "rgb" not in self._cache:
+			self._decode()
+		return self._cache["alpha"]
+
+	@property
+	def gray(self) -> np.ndarray:
+		return self.cached("gray", lambda: np.asarray(Image.fromarray(self.rgb).convert("L")))
+
+	@property
+	def lab(self) -> np.ndarray:
+		from .features import rgb_to_lab  # local import (features imports this module)
+		return self.cached("lab", lambda: rgb_to_lab(self.rgb))
+
+	@property
+	def image(self) -> Image.Image:
+		"""A PIL image of the pixels (the source itself when it is one)."""
+		if not isinstance(self.source, np.ndarray):
+			return _as_pil(self.source)
+		return self.cached("image", lambda: Image.fromarray(self.rgb))
+
+	def resized(self, size: tuple[int, int], cache: bool = True) -> "ImageArray":
+		"""This image at ``size`` (w, h); box filter when shrinking, Lanczos when growing.
+
+		Before the full-resolution array exists the source is reduced first,
+		so small views of large photos never need a full-size RGB copy.
+		``cache=False`` returns the level without keeping it on this instance.
+		"""
+		size = (max(1, int(size[0])), max(1, int(size[1])))
+		if size == self.size:
+			return self
+
+		def compute():
+			shrinking = size[0] * size[1] < self.size[0] * self.size[1]
+			resample = Image.Resampling.BOX if shrinking else Image.Resampling.LANCZOS
+			if "rgb" in self._cache:
+				alpha = self._cache["alpha"]
+				arr = self._cache["rgb"] if alpha is None else np.dstack([self._cache["rgb"], alpha])
+				src = Image.fromarray(np.ascontiguousarray(arr))
+			else:
+				src = _normalized_mode(_as_pil(self.source))
+			return ImageArray(np.asarray(src.resize(size, resample, reducing_gap=2.0 if shrinking else None)))
+
+		if not cache:
+			return self._cache.get(("resized", size)) or compute()
+		return self.cached(("resized", size), compute)
+
+	def region(self, box: tuple[int, int, int, int], size: tuple[int, int] | None = None) -> np.ndarray:
+		"""(H, W, 3) uint8 pixels of ``box`` (left, top, right, bottom).
+
+		A view of ``rgb`` once decoded; otherwise only the box is converted.
+		With ``size`` (w, h) the box is reduced to it (box filter) and only the
+		reduced pixels are allocated.
+		"""
+		left, top, right, bottom = box
+		if "rgb" in self._cache or isinstance(self.source, np.ndarray):
+			pixels = self.rgb[top:bottom, left:right]
+			if size is None:
+				return pixels
+			src = Image.fromarray(np.ascontiguousarray(pixels))
+			return np.asarray(src.resize(size, Image.Resampling.BOX))
+		src = _normalized_mode(_as_pil(self.source))
+		if size is None:
+			crop = src.crop((left, top, right, bottom))
+		else:
+			crop = src.resize(size, Image.Resampling.BOX, box=(left, top, right, bottom))
+		return np.ascontiguousarray(np.asarray(crop)[..., :3])
+
+	def level(self, max_side: int) -> "ImageArray":
+		"""Reduced copy whose longer side is at most ``max_side`` (self if already smaller)."""
+		longest = max(self.size)
+		if longest <= max_side:
+			return self
+		ratio = max_side / longest
+		return self.resized((round(self.size[0] * ratio), round(self.size[1] * ratio)))
+
+	def __repr__(self) -> str:
+		state = "decoded" if "rgb" in self._cache else "pending"
+		return f"<ImageArray {self.size[0]}x{self.size[1]} {state}>"
+
+
+def as_image_array(img) -> ImageArray:
+	"""``img`` itself if it already is an ImageArray, else a new wrapper."""
+	return img if isinstance(img, ImageArray) else ImageArray(img)
+
+
+__all__ = ["ImageArray", "as_image_array"]
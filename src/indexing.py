@@ -0,0 +1,217 @@
+"""Persistent index of piece image directories.
+
+Keeps one row per image file (path, mtime, byte size, pixel dimensions and a
+content hash) in a small SQLite database next to the images. Dimensions are
+read from the image header only; nothing is decoded. Rescans only touch files
+whose mtime or byte size changed, so listing and filtering tens of thousands
+of piece scans by size or aspect ratio is a single indexed query.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+INDEX_FILENAME = ".piece_index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+	path TEXT PRIMARY KEY,
+	name TEXT NOT NULL,
+	mtime_ns INTEGER NOT NULL,
+	bytes INTEGER NOT NULL,
+	width INTEGER,
+	height INTEGER,
+	aspect REAL,
+	format TEXT,
+	hash TEXT
+);
+CREATE INDEX IF NOT EXISTS images_width ON images (width);
+CREATE INDEX IF NOT EXISTS images_height ON images (height);
+CREATE INDEX IF NOT EXISTS images_aspect ON images (aspect);
+CREATE INDEX IF NOT EXISTS images_hash ON images (hash);
+"""
+
+_COLUMNS = ("path", "name", "mtime_ns", "bytes", "width", "height", "aspect", "format", "hash")
+
+
+def _image_extensions() -> set[str]:
+	return {ext.lower() for ext in Image.registered_extensions()}
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+	"""Content hash of a file (BLAKE2b, 128-bit hex)."""
+	h = hashlib.blake2b(digest_size=16)
+	with open(path, "rb") as f:
+		for chunk in iter(lambda: f.read(chunk_size), b""):
+			h.update(chunk)
+	return h.hexdigest()
+
+
+def _read_entry(path: str, mtime_ns: int, size: int) -> tuple:
+	"""Build an index row from the file header and content hash (no decoding)."""
+	width = height = fmt = None
+	try:
+		with Image.open(path) as img:
+			width, height = img.size
+			fmt = img.format
+	except Exception:
+		pass  # Unreadable image: keep the row so it is not re-read every scan
+	aspect = (width / height) if width and height else None
+	return (path, os.path.basename(path), mtime_ns, size, width, height, aspect, fmt, file_hash(path))
+
+
+class PieceIndex:
+	"""SQLite-backed index of the image files in one directory.
+
+	Usage::
+
+		with PieceIndex("images/pieces") as index:
+			index.scan()
+			wide = index.query(min_aspect=1.2)
+	"""
+
+	def __init__(self, directory: str, db_path: str | None = None, recursive: bool = False):
+		self.directory = os.path.abspath(directory)
+		self.recursive = recursive
+		self.db_path = db_path or os.path.join(self.directory, INDEX_FILENAME)
+		try:
+			self._conn = sqlite3.connect(self.db_path)
+		except sqlite3.OperationalError:
+			# Read-only directory: the index still works, just not persisted
+			self.db_path = ":memory:"
+			self._conn = sqlite3.connect(self.db_path)
+		self._conn.executescript(_SCHEMA)
+
+	def close(self) -> None:
+		self._conn.close()
+
+	def __enter__(self) -> "PieceIndex":
+		return self
+
+	def __exit__(self, *exc) -> None:
+		self.close()
+
+	def _iter_files(self):
+		extensions = _image_extensions()
+		stack = [self.directory]
+		while stack:
+			current = stack.pop()
+			try:
+				entries = list(os.scandir(current))
+			except OSError:
+				continue
+			for entry in entries:
+				if entry.is_dir(follow_symlinks=False):
+					if self.recursive:
+						stack.append(entry.path)
+				elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions:
+					yield entry
+
+	def scan(self, max_workers: int | None = None) -> dict:
+		"""Bring the index up to date with the directory.
+
+		Only new files and files whose mtime or byte size changed are read.
+		Returns counts of added, updated, removed and unchanged files.
+		"""
+		known = {
+			path: (mtime_ns, size)
+			for path, mtime_ns, size in self._conn.execute("SELECT path, mtime_ns, bytes FROM images")
+		}
+		todo = []
+		seen = set()
+		added = updated = 0
+		for entry in self._iter_files():
+			st = entry.stat()
+			path = os.path.abspath(entry.path)
+			seen.add(path)
+			previous = known.get(path)
+			if previous == (st.st_mtime_ns, st.st_size):
+				continue
+			if previous is None:
+				added += 1
+			else:
+				updated += 1
+			todo.append((path, st.st_mtime_ns, st.st_size))
+
+		rows = []
+		if todo:
+			workers = max_workers or min(16, (os.cpu_count() or 1) + 4)
+			with ThreadPoolExecutor(max_workers=workers) as pool:
+				rows = list(pool.map(lambda item: _read_entry(*item), todo))
+
+		removed = [(path,) for path in known if path not in seen]
+		with self._conn:
+			if rows:
+				self._conn.executemany(
+					f"INSERT OR REPLACE INTO images ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+					rows,
+				)
+			if removed:
+				self._conn.executemany("DELETE FROM images WHERE path = ?", removed)
+		return {
+			"added": added,
+			"updated": updated,
+			"removed": len(removed),
+			"unchanged": len(seen) - added - updated,
+		}
+
+	def query(
+		self,
+		min_width: int | None = None,
+		max_width: int | None = None,
+		min_height: int | None = None,
+		max_height: int | None = None,
+		min_aspect: float | None = None,
+		max_aspect: float | None = None,
+		order_by: str = "name",
+	) -> list[dict]:
+		"""List indexed images, optionally filtered by dimensions / aspect (w/h)."""
+		if order_by not in _COLUMNS:
+			raise ValueError(f"order_by must be one of {_COLUMNS}")
+		clauses = []
+		params: list = []
+		for column, op, value in (
+			("width", ">=", min_width),
+			("width", "<=", max_width),
+			("height", ">=", min_height),
+			("height", "<=", max_height),
+			("aspect", ">=", min_aspect),
+			("aspect", "<=", max_aspect),
+		):
+			if value is not None:
+				clauses.append(f"{column} {op} ?")
+				params.append(value)
+		where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+		cursor = self._conn.execute(
+			f"SELECT {', '.join(_COLUMNS)} FROM images{where} ORDER BY {order_by}, path",
+			params,
+		)
+		return [dict(zip(_COLUMNS, row)) for row in cursor]
+
+	def get(self, path: str) -> dict | None:
+		"""Index row for one file, or None if it is not indexed."""
+		row = self._conn.execute(
+			f"SELECT {', '.join(_COLUMNS)} FROM images WHERE path = ?", (os.path.abspath(path),)
+		).fetchone()
+		return dict(zip(_COLUMNS, row)) if row else None
+
+	def duplicates(self) -> list[list[str]]:
+		"""Groups of paths whose file contents are byte-identical."""
+		groups: dict[str, list[str]] = {}
+		cursor = self._conn.execute(
+			"SELECT hash, path FROM images WHERE hash IN "
+			"(SELECT hash FROM images GROUP BY hash HAVING COUNT(*) > 1) ORDER BY hash, path"
+		)
+		for digest, path in cursor:
+			groups.setdefault(digest, []).append(path)
+		return list(groups.values())
+
+	def __len__(self) -> int:
+		return self._conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+
+__all__ = ["PieceIndex", "file_hash", "INDEX_FILENAME"]
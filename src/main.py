@@ -1,11 +1,14 @@
 from .acquisition import load_puzzle, load_piece
-from .matching import compare_images
 
 
 # Puzzle Solver - Entry Point
     
 
 def main():
+    # NumPy, Pillow and the matcher load (and run one tiny match) in the background while paths are typed
+    from .startup import start_prewarm
+    start_prewarm(match=True)
+
     print("=" * 60)
     print("\n🧩 Welcome to the Puzzle Solver! 🧩")
     print("\nThis program will help you find where puzzle pieces fit!")
@@ -14,6 +17,7 @@ def main():
     puzzle_image = load_puzzle()
     piece_image = load_piece()
 
+    from .matching import compare_images
     compare_images(puzzle_image, piece_image)
 
 if __name__ == "__main__":
@@ -5,29 +5,40 @@ from PIL import Image
 from .features import (
 	get_image_size,
 	compute_area,
-	dominant_color,
+	dominant_colors_batch,
 	color_distance,
 	estimate_scale,
+	color_histogram,
+	block_color_histograms,
+	backproject_blocks,
+	cluster_by_color,
 )
+from .backends import MatchBackend, get_backend
+from .imagearray import ImageArray, as_image_array
+
+# Bump whenever a change to matching can change results: it is part of every
+# ``result_cache`` key, so stale cached results are never returned
+MATCH_ENGINE_VERSION = "1"
 
 
 def compute_mean_abs_diff(img_a: Image.Image, img_b: Image.Image) -> float:
 	"""Return mean absolute pixel difference (0 identical .. 255 max).
 
-	Images are converted to RGB, resized must already match.
+	Accepts PIL images or ``ImageArray``s; sizes must already match.
 	Use int16 arrays to avoid uint8 wrap-around when subtracting.
 	"""
-	a = img_a.convert("RGB")
-	b = img_b.convert("RGB")
+	a = as_image_array(img_a)
+	b = as_image_array(img_b)
 	if a.size != b.size:
 		raise ValueError("Images must have same size for diff")
-	arr_a = np.asarray(a, dtype=np.int16)
-	arr_b = np.asarray(b, dtype=np.int16)
-	diff = np.abs(arr_a - arr_b)
+	diff = np.abs(a.rgb.astype(np.int16) - b.rgb)
 	return float(diff.mean())
 
 
 def compare_images(puzzle_img: Image.Image, piece_img: Image.Image):
+	# Decode each image once; every step below shares the arrays
+	puzzle_img = as_image_array(puzzle_img)
+	piece_img = as_image_array(piece_img)
 	print("=" * 50)
 	print("\n📊 IMAGE PROPERTIES COMPARISON:")
 	print("-" * 30)
@@ -44,8 +55,7 @@ def compare_images(puzzle_img: Image.Image, piece_img: Image.Image):
 	print(f"Piece / Puzzle area ratio: {area_ratio:.4f}")
 
 	# Dominant colors
-	dom_puzzle = dominant_color(puzzle_img)
-	dom_piece = dominant_color(piece_img)
+	dom_puzzle, dom_piece = dominant_colors_batch([puzzle_img, piece_img])
 	dist = color_distance(dom_puzzle, dom_piece)
 	print(f"Dominant color puzzle: {dom_puzzle}")
 	print(f"Dominant color piece : {dom_piece}")
@@ -68,10 +78,12 @@ def compare_images(puzzle_img: Image.Image, piece_img: Image.Image):
 		print("Scale skipped.")
 
 	# --- Naive global pixel diff baseline ---
-	print("\n🔍 Naive pixel diff (piece resized to puzzle size)")
+	# Compared at piece resolution: reducing the puzzle is far cheaper than
+	# blowing the piece up to full puzzle size
+	print("\n🔍 Naive pixel diff (puzzle reduced to piece size)")
 	try:
-		piece_resized = piece_img.resize(puzzle_img.size, Image.Resampling.LANCZOS)
-		mean_diff = compute_mean_abs_diff(puzzle_img, piece_resized)
+		puzzle_reduced = puzzle_img.resized(piece_img.size)
+		mean_diff = compute_mean_abs_diff(puzzle_reduced, piece_img)
 		similarity = 1.0 - (mean_diff / 255.0)  # 1 = identical, 0 = maximally different
 		print(f"Mean absolute diff: {mean_diff:.2f} (0=identical, 255=max)")
 		print(f"Similarity (approx): {similarity*100:.2f}%")
@@ -98,12 +110,13 @@ def basic_metrics(
 	If real dimensions are supplied (>0), compute pixel-per-cm scale for each axis
 	and estimate real piece size using both scales.
 	"""
+	puzzle_img = as_image_array(puzzle_img)
+	piece_img = as_image_array(piece_img)
 	puzzle_size = get_image_size(puzzle_img)
 	piece_size = get_image_size(piece_img)
 	puzzle_area = compute_area(puzzle_size)
 	piece_area = compute_area(piece_size)
-	dom_puzzle = dominant_color(puzzle_img)
-	dom_piece = dominant_color(piece_img)
+	dom_puzzle, dom_piece = dominant_colors_batch([puzzle_img, piece_img])
 	dist = color_distance(dom_puzzle, dom_piece)
 	result: dict = {
 		"puzzle_size": puzzle_size,
@@ -148,6 +161,39 @@ def basic_metrics(
 	return result
 
 
+def cluster_pieces(
+	piece_imgs,
+	n_clusters: int = 8,
+	names: list[str] | None = None,
+	export_path: str | None = None,
+) -> dict:
+	"""Sort loose pieces into colour bins (dominant colour + k-means in Lab).
+
+	Returns dict with per-piece ``labels`` and ``dominant_colors`` plus cluster
+	``sizes`` and ``centers_lab``. If ``export_path`` is given the assignments
+	are written as CSV (name, cluster, r, g, b).
+	"""
+	colors = dominant_colors_batch(piece_imgs)
+	if names is None:
+		names = [str(i) for i in range(len(colors))]
+	labels, centers = cluster_by_color(colors, n_clusters=n_clusters)
+	result = {
+		"labels": labels.tolist(),
+		"dominant_colors": colors,
+		"sizes": np.bincount(labels, minlength=len(centers)).tolist(),
+		"centers_lab": centers.tolist(),
+	}
+	if export_path:
+		import csv
+		with open(export_path, "w", newline="", encoding="utf-8") as f:
+			writer = csv.writer(f)
+			writer.writerow(["name", "cluster", "r", "g", "b"])
+			for name, label, (r, g, b) in zip(names, result["labels"], colors):
+				writer.writerow([name, label, r, g, b])
+		result["export_path"] = export_path
+	return result
+
+
 def sliding_window_search(puzzle_img: Image.Image, piece_img: Image.Image, stride: int = 4, progress_callback=None) -> dict:
 	"""Programmatic sliding window search.
 
@@ -161,8 +207,10 @@ def sliding_window_search(puzzle_img: Image.Image, piece_img: Image.Image, strid
 	if stride < 1:
 		stride = 1
 
-	puzzle_arr = np.asarray(puzzle_img.convert("RGB"), dtype=np.int16)
-	piece_arr = np.asarray(piece_img.convert("RGB"), dtype=np.int16)
+	# The puzzle stays uint8 (shared, no int16 copy of the whole image); only
+	# the small piece is widened and each patch difference promotes to int16
+	puzzle_arr = as_image_array(puzzle_img).rgb
+	piece_arr = as_image_array(piece_img).rgb.astype(np.int16)
 
 	best_diff = None
 	best_pos = (0, 0)
@@ -220,8 +268,10 @@ def _run_sliding_window(puzzle_img: Image.Image, piece_img: Image.Image):
 	except ValueError:
 		stride = 4
 
-	puzzle_arr = np.asarray(puzzle_img.convert("RGB"), dtype=np.int16)
-	piece_arr = np.asarray(piece_img.convert("RGB"), dtype=np.int16)
+	# The puzzle stays uint8 (shared, no int16 copy of the whole image); only
+	# the small piece is widened and each patch difference promotes to int16
+	puzzle_arr = as_image_array(puzzle_img).rgb
+	piece_arr = as_image_array(piece_img).rgb.astype(np.int16)
 
 	best_diff = None
 	best_pos = (0, 0)
@@ -262,6 +312,7 @@ __all__ = [
 	"compare_images",
 	"compute_mean_abs_diff",
 	"basic_metrics",
+	"cluster_pieces",
 	"sliding_window_search",
 ]
 
@@ -305,110 +356,471 @@ def estimate_piece_scale_factors(puzzle_img: Image.Image, piece_img: Image.Image
 	return valid or [1.0]
 
 
-def multi_scale_template_match(
-	puzzle_img: Image.Image,
-	piece_img: Image.Image,
-	num_pieces: int | None = None,
-	use_downscale: bool = True,
-	method: str = "SQDIFF_NORMED",
-	use_gpu: bool = False,
-) -> dict:
-	"""Fast multi-scale template matching using OpenCV.
+# ===== Colour prefilter (restrict where template correlation runs) =====
+def build_color_prefilter(puzzle_img: Image.Image, grid: int = 64, bits: int = 3) -> dict:
+	"""Precompute per-block colour histograms of the puzzle (once per puzzle).
 
-	Returns dict with best position, scale, score, similarity estimate and method.
-	Automatically downsamples large images for speed and refines coordinates.
+	The result is reused by ``candidate_region_mask`` for every piece.
+	"""
+	block_hists = block_color_histograms(puzzle_img, grid=grid, bits=bits)
+	return {
+		"block_hists": block_hists,
+		"grid_shape": block_hists.shape[:2],
+		"bits": bits,
+		"puzzle_size": puzzle_img.size,
+	}
+
+
+def candidate_region_mask(prefilter: dict, piece_img: Image.Image, keep_fraction: float = 0.25) -> dict:
+	"""Backproject the piece colour histogram onto the puzzle block grid.
+
+	Returns dict with ``mask`` (bool, block grid; True where the piece centre
+	may lie), ``scores`` and ``area_fraction`` (share of the puzzle kept).
+	Pass ``mask`` as ``search_mask`` to ``multi_scale_template_match``.
+	"""
+	piece_hist = color_histogram(piece_img, bits=prefilter["bits"])
+	scores = backproject_blocks(prefilter["block_hists"], piece_hist)
+	# 3x3 box smoothing: a piece spans several blocks, isolated hits are noise
+	padded = np.pad(scores, 1, mode="edge")
+	rows, cols = scores.shape
+	smooth = sum(
+		padded[dy:dy + rows, dx:dx + cols] for dy in range(3) for dx in range(3)
+	) / 9.0
+	keep_fraction = min(max(keep_fraction, 0.0), 1.0)
+	threshold = np.quantile(smooth, 1.0 - keep_fraction)
+	mask = (smooth >= threshold) & (smooth > 0)
+	return {
+		"mask": mask,
+		"scores": smooth,
+		"area_fraction": float(mask.mean()),
+	}
+
+
+def _regions_from_mask(search_mask: np.ndarray, shape: tuple[int, int]) -> list[tuple[int, int, int, int]] | None:
+	"""Bounding boxes (x0, y0, x1, y1) of mask components in an image of ``shape``.
+
+	The mask may have any resolution; it is assumed to cover the whole image.
+	Returns None when the mask is empty (caller searches everywhere).
 	"""
+	mask = np.asarray(search_mask, dtype=bool)
+	if mask.ndim != 2 or not mask.any():
+		return None
+	height, width = shape
+	rows, cols = mask.shape
+	regions = []
+	for bx, by, bw, bh in _mask_component_boxes(mask):
+		regions.append((
+			int(bx * width / cols),
+			int(by * height / rows),
+			int(np.ceil((bx + bw) * width / cols)),
+			int(np.ceil((by + bh) * height / rows)),
+		))
+	return regions
+
+
+def _mask_component_boxes(mask: np.ndarray) -> list[tuple[int, int, int, int]]:
+	"""(x, y, w, h) of the 8-connected components of a small bool mask."""
 	try:
 		import cv2  # local import
 	except ImportError:
-		return {"error": "opencv_not_available"}
+		cv2 = None
+	if cv2 is not None:
+		count, _labels, stats, _centroids = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+		return [tuple(int(v) for v in stats[i, :4]) for i in range(1, count)]
+
+	# Flood fill; prefilter masks are block grids (~64x64), so this is cheap
+	rows, cols = mask.shape
+	seen = np.zeros_like(mask)
+	boxes = []
+	for y, x in zip(*np.nonzero(mask)):
+		if seen[y, x]:
+			continue
+		seen[y, x] = True
+		stack = [(y, x)]
+		y0, x0, y1, x1 = y, x, y, x
+		while stack:
+			cy, cx = stack.pop()
+			y0, x0, y1, x1 = min(y0, cy), min(x0, cx), max(y1, cy), max(x1, cx)
+			for ny in range(max(cy - 1, 0), min(cy + 2, rows)):
+				for nx in range(max(cx - 1, 0), min(cx + 2, cols)):
+					if mask[ny, nx] and not seen[ny, nx]:
+						seen[ny, nx] = True
+						stack.append((ny, nx))
+		boxes.append((int(x0), int(y0), int(x1 - x0 + 1), int(y1 - y0 + 1)))
+	return boxes
+
+
+def _box_area(box) -> int:
+	return max(0, box[2] - box[0]) * max(0, box[3] - box[1])
+
+
+def _match_in_regions(
+	image: np.ndarray,
+	templ: np.ndarray,
+	centre_regions,
+	backend: MatchBackend,
+	method: str,
+	score_map: np.ndarray | None = None,
+	peak_k: int = 0,
+	band_rows: int | None = None,
+) -> tuple:
+	"""Run ``backend.match`` only where the template centre may lie.
+
+	Returns (min_val, max_val, min_loc, max_loc, searched_area_fraction,
+	peaks) in full-image coordinates, like ``cv2.minMaxLoc`` on a full
+	result map. If given, ``score_map`` (full result-map shape) receives the
+	scores of the searched positions. ``peaks`` holds the ``peak_k`` best
+	non-overlapping (x, y, value) positions (see ``find_peaks``), collected
+	per correlation call so no full result map is needed. ``band_rows``
+	caps the result rows of one call: larger areas are correlated in
+	horizontal bands, bounding the float32 result memory.
+	"""
+	height, width = image.shape[:2]
+	th, tw = templ.shape[:2]
+	lower_is_better = method.startswith("SQDIFF")
+	min_distance = max(2, min(tw, th) // 2)
+	if not centre_regions:
+		if band_rows is None or height - th + 1 <= band_rows:
+			res = backend.match(image, templ, method)
+			if score_map is not None:
+				score_map[...] = res
+			min_val, max_val, min_loc, max_loc = backend.min_max_loc(res)
+			peaks = find_peaks(res, peak_k, min_distance, lower_is_better) if peak_k else []
+			return min_val, max_val, min_loc, max_loc, 1.0, peaks
+		centre_regions = [(0, 0, width, height)]
+
+	# Expand centre boxes to the image area the template touches; merge two
+	# boxes only when their union costs no more than searching both separately
+	boxes = []
+	for x0, y0, x1, y1 in centre_regions:
+		boxes.append([
+			max(0, x0 - tw // 2), max(0, y0 - th // 2),
+			min(width, x1 + tw - tw // 2), min(height, y1 + th - th // 2),
+		])
+	merged = True
+	while merged and len(boxes) > 1:
+		merged = False
+		for i in range(len(boxes)):
+			for j in range(i + 1, len(boxes)):
+				a, b = boxes[i], boxes[j]
+				union = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+				if _box_area(union) <= _box_area(a) + _box_area(b):
+					boxes[i] = union
+					del boxes[j]
+					merged = True
+					break
+			if merged:
+				break
+
+	best_min = best_max = None
+	area = 0
+	peaks = []
+	for x0, y0, x1, y1 in boxes:
+		if x1 - x0 < tw or y1 - y0 < th:
+			continue
+		area += (x1 - x0) * (y1 - y0)
+		rows = y1 - y0 - th + 1
+		step = band_rows or rows
+		for band in range(0, rows, step):
+			by0 = y0 + band
+			by1 = min(y1, by0 + step + th - 1)
+			res = backend.match(image[by0:by1, x0:x1], templ, method)
+			if score_map is not None:
+				score_map[by0:by0 + res.shape[0], x0:x0 + res.shape[1]] = res
+			min_val, max_val, min_loc, max_loc = backend.min_max_loc(res)
+			if best_min is None or min_val < best_min[0]:
+				best_min = (min_val, (min_loc[0] + x0, min_loc[1] + by0))
+			if best_max is None or max_val > best_max[0]:
+				best_max = (max_val, (max_loc[0] + x0, max_loc[1] + by0))
+			if peak_k:
+				peaks.extend((x + x0, y + by0, v) for x, y, v in find_peaks(res, peak_k, min_distance, lower_is_better))
+	if best_min is None:
+		# Regions too small for this template size: fall back to a full search
+		return _match_in_regions(image, templ, None, backend, method, score_map, peak_k, band_rows)
+	if len(boxes) > 1 or band_rows:
+		peaks = _suppress_peaks(peaks, peak_k, min_distance, lower_is_better)
+	return best_min[0], best_max[0], best_min[1], best_max[1], area / float(width * height), peaks
+
+
+def _suppress_peaks(peaks, k: int, min_distance: int, lower_is_better: bool) -> list[tuple[int, int, float]]:
+	"""Greedy non-maximum suppression of (x, y, value) peaks, best first."""
+	peaks = sorted(peaks, key=lambda p: p[2], reverse=not lower_is_better)
+	kept = []
+	for x, y, v in peaks:
+		if any(max(abs(x - kx), abs(y - ky)) < min_distance for kx, ky, _ in kept):
+			continue
+		kept.append((x, y, v))
+		if len(kept) == k:
+			break
+	return kept
+
+
+def find_peaks(
+	score_map: np.ndarray,
+	k: int = 5,
+	min_distance: int = 8,
+	lower_is_better: bool = True,
+) -> list[tuple[int, int, float]]:
+	"""Top ``k`` non-overlapping peaks of a score map as (x, y, score), best first.
+
+	The map is cut into blocks of ``min_distance // 2`` pixels and each block
+	is reduced to its best cell in one vectorised pass; only those block
+	winners go through greedy non-maximum suppression, so peaks are at least
+	``min_distance`` apart (Chebyshev). NaN cells (not searched) are ignored.
+	"""
+	scores = np.asarray(score_map, dtype=np.float32)
+	height, width = scores.shape
+	block = max(1, min_distance // 2)
+	cost = scores if lower_is_better else -scores
+	rows, cols = -(-height // block), -(-width // block)
+	padded = np.full((rows * block, cols * block), np.inf, dtype=np.float32)
+	padded[:height, :width] = np.where(np.isnan(cost), np.inf, cost)
+	blocks = padded.reshape(rows, block, cols, block).transpose(0, 2, 1, 3).reshape(rows, cols, block * block)
+	inner = blocks.argmin(axis=2)
+	best = np.take_along_axis(blocks, inner[..., None], axis=2)[..., 0].ravel()
+
+	# A handful of block winners per wanted peak is plenty for the suppression
+	pool = min(best.size, max(k, 1) * 16)
+	order = np.argpartition(best, pool - 1)[:pool] if pool < best.size else np.arange(best.size)
+	order = order[np.isfinite(best[order])]
+	order = order[np.argsort(best[order], kind="stable")]
+	ys = (order // cols) * block + inner.ravel()[order] // block
+	xs = (order % cols) * block + inner.ravel()[order] % block
+
+	kept: list[int] = []
+	for i in range(len(order)):
+		if kept and (np.maximum(np.abs(xs[kept] - xs[i]), np.abs(ys[kept] - ys[i])) < min_distance).any():
+			continue
+		kept.append(i)
+		if len(kept) == k:
+			break
+	return [(int(xs[i]), int(ys[i]), float(scores[ys[i], xs[i]])) for i in kept]
 
-	method_map = {
-		"SQDIFF": getattr(cv2, "TM_SQDIFF", None),
-		"SQDIFF_NORMED": getattr(cv2, "TM_SQDIFF_NORMED", None),
-		"CCORR_NORMED": getattr(cv2, "TM_CCOEFF_NORMED", None),  # alternative
-	}
-	cv2_method = method_map.get(method.upper(), cv2.TM_SQDIFF_NORMED)
 
-	puzzle_rgb = puzzle_img.convert("RGB")
-	piece_rgb = piece_img.convert("RGB")
+def _ambiguity_ratio(best: float, second: float, lower_is_better: bool) -> float | None:
+	"""How close the runner-up is to the best match: 0 = clear winner, 1 = tie."""
+	if lower_is_better:
+		return float(np.clip(best / second, 0.0, 1.0)) if second > 0 else 1.0
+	return float(np.clip(second / best, 0.0, 1.0)) if best > 0 else 1.0
+
+
+def _map_candidates(fn, candidates: list, backend: MatchBackend, max_workers: int | None = None) -> list:
+	"""``[fn(c) for c in candidates]`` on a bounded thread pool, in input order.
+
+	The correlation kernels release the GIL, so candidates (scales, later
+	rotations) run truly in parallel. The backend's internal thread pool is
+	shrunk so that workers x backend threads stays within the core count.
+	"""
+	import os
+	from concurrent.futures import ThreadPoolExecutor
+
+	cores = os.cpu_count() or 1
+	workers = min(max_workers or cores, len(candidates), cores)
+	if workers <= 1 or not backend.thread_safe:
+		return [fn(c) for c in candidates]
+	with backend.limit_threads(max(1, cores // workers)):
+		with ThreadPoolExecutor(max_workers=workers) as pool:
+			return list(pool.map(fn, candidates))
 
-	import numpy as np
-	puzzle_arr = np.asarray(puzzle_rgb)
-	piece_arr_orig = np.asarray(piece_rgb)
 
-	# Optional coarse downscale if large
+# Public method names -> backend method names
+_MATCH_METHODS = ("SQDIFF", "SQDIFF_NORMED", "CCOEFF_NORMED")
+_METHOD_ALIASES = {"CCORR_NORMED": "CCOEFF_NORMED"}
+# Methods whose scores lie in [-1, 1], so their score maps fit in float16
+_BOUNDED_METHODS = ("SQDIFF_NORMED", "CCOEFF_NORMED")
+
+
+def prepare_puzzle(
+	puzzle_img: Image.Image,
+	use_downscale: bool = True,
+	backend: str | MatchBackend = "auto",
+	memory_budget: int | None = None,
+	piece_size: tuple[int, int] | None = None,
+	scale_candidates: list[float] | None = None,
+) -> dict:
+	"""Puzzle arrays reused by every ``multi_scale_template_match`` call.
+
+	Holds the RGB array, the full-resolution grayscale and the coarse
+	(<= 1600 px, if ``use_downscale``) grayscale with its scale factor.
+	With an ``ImageArray`` the arrays are views cached on it, shared with
+	every other function given the same wrapper. With ``memory_budget``
+	(bytes, see ``memory.plan_matching_memory``) the coarse level is sized
+	to the budget and, when they do not fit, the full-resolution arrays are
+	never built (``rgb`` / ``gray`` are None). ``piece_size`` and
+	``scale_candidates`` let the plan budget the piece as well.
+	"""
+	backend = get_backend(backend)
+	image = as_image_array(puzzle_img)
+	max_dim = max(image.size)
+	coarse_side = 1600 if use_downscale else max_dim
+	full_res = True
+	if memory_budget is not None:
+		from .memory import plan_matching_memory
+		plan = plan_matching_memory(
+			image.size, memory_budget, piece_size=piece_size, scale_candidates=scale_candidates
+		)
+		coarse_side = plan["coarse_side"]
+		full_res = plan["full_res_arrays"]
+
 	coarse_scale = 1.0
-	max_dim = max(puzzle_arr.shape[0], puzzle_arr.shape[1])
-	if use_downscale and max_dim > 1600:
-		coarse_scale = 1600 / max_dim
-		puzzle_arr_coarse = cv2.resize(puzzle_arr, (int(puzzle_arr.shape[1]*coarse_scale), int(puzzle_arr.shape[0]*coarse_scale)), interpolation=cv2.INTER_AREA)
+	coarse_size = image.size
+	if max_dim > coarse_side:
+		coarse_scale = coarse_side / max_dim
+		coarse_size = (int(image.size[0]*coarse_scale), int(image.size[1]*coarse_scale))
+	if full_res:
+		puzzle_arr = image.rgb
+		puzzle_gray = image.cached(("gray", backend.name), lambda: backend.to_gray(puzzle_arr))
+		if coarse_scale < 1.0:
+			coarse_gray = image.cached(("coarse_gray", backend.name, coarse_size), lambda: backend.resize(puzzle_gray, coarse_size))
+		else:
+			coarse_gray = puzzle_gray
 	else:
-		puzzle_arr_coarse = puzzle_arr
+		# Reduce straight from the source; the reduced RGB level is not kept
+		puzzle_arr = puzzle_gray = None
+		coarse_gray = image.cached(
+			("coarse_gray", backend.name, coarse_size),
+			lambda: backend.to_gray(image.resized(coarse_size, cache=False).rgb),
+		)
+	return {
+		"image": image,
+		"rgb": puzzle_arr,
+		"gray": puzzle_gray,
+		"coarse_scale": coarse_scale,
+		"coarse_gray": coarse_gray,
+		"use_downscale": use_downscale,
+		"memory_budget": memory_budget,
+	}
 
-	# Gray for speed
-	puzzle_gray_coarse = cv2.cvtColor(puzzle_arr_coarse, cv2.COLOR_RGB2GRAY)
 
-	# Optional GPU path (grayscale) for coarse matching if requested
-	gpu_available = False
-	if use_gpu:
-		try:
-			if hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0:
-				gpu_available = True
-		except Exception:
-			gpu_available = False
+def multi_scale_template_match(
+	puzzle_img: Image.Image,
+	piece_img: Image.Image,
+	num_pieces: int | None = None,
+	use_downscale: bool = True,
+	method: str = "SQDIFF_NORMED",
+	use_gpu: bool = False,
+	search_mask: np.ndarray | None = None,
+	prepared: dict | None = None,
+	backend: str | MatchBackend = "auto",
+	scale_workers: int | None = None,
+	keep_score_map: bool = False,
+	top_k: int = 5,
+	memory_budget: int | None = None,
+) -> dict:
+	"""Fast multi-scale template matching.
 
-	scale_candidates = estimate_piece_scale_factors(puzzle_img, piece_img, num_pieces)
+	Returns dict with best position, scale, score, similarity estimate and method.
+	Automatically downsamples large images for speed and refines coordinates.
+	``search_mask`` (bool array covering the whole puzzle, any resolution, e.g.
+	from ``candidate_region_mask``) restricts correlation to the regions where
+	the piece centre may lie; ``search_area_ratio`` reports the share searched.
+	``prepared`` (from ``prepare_puzzle`` on the same puzzle) skips the puzzle
+	conversion, coarse resize and grayscale work when matching many pieces.
+	``backend`` selects the compute backend ("auto", "opencv", "numpy",
+	"cuda", see ``backends``); ``use_gpu`` asks for "cuda" and falls back to
+	"auto" when no CUDA device is present. Scale candidates are evaluated
+	concurrently on up to ``scale_workers`` threads (default: one per core);
+	the backend's own threading is capped meanwhile to avoid oversubscription.
+	``keep_score_map`` adds the best scale's coarse score map (NaN where not
+	searched) as ``score_map``, e.g. for ``visualization``: float16 for the
+	normalised methods, float32 for raw ``SQDIFF`` (its sums overflow float16).
+	``candidates`` lists up to ``top_k`` non-overlapping placements across all
+	scales (``position``, ``size``, ``scale``, ``score``; the first is the
+	refined best) and ``ambiguity`` is the best-to-second-best ratio (0 =
+	clear winner, 1 = coin flip; None with a single candidate).
+	``memory_budget`` (bytes) bounds what matching allocates: the coarse
+	level, band height and scale concurrency come from
+	``memory.plan_matching_memory`` (reported as ``memory_plan``), and
+	refinement reads a small window of the source instead of full-resolution
+	arrays when those do not fit. It is taken from ``prepared`` if set there.
+	"""
+	if use_gpu and backend == "auto":
+		from .backends import CudaBackend
+		if CudaBackend.available():
+			backend = "cuda"
+	try:
+		backend = get_backend(backend)
+	except (RuntimeError, ValueError) as e:
+		return {"error": str(e)}
+
+	method = method.upper()
+	match_method = _METHOD_ALIASES.get(method, method)
+	if match_method not in _MATCH_METHODS:
+		match_method = "SQDIFF_NORMED"
+
+	piece = as_image_array(piece_img)
+	scale_candidates = estimate_piece_scale_factors(puzzle_img, piece, num_pieces)
+	if prepared is None:
+		prepared = prepare_puzzle(
+			puzzle_img, use_downscale, backend, memory_budget,
+			piece_size=piece.size, scale_candidates=scale_candidates,
+		)
+	memory_budget = prepared.get("memory_budget", memory_budget)
+	puzzle_image = prepared["image"]
+	coarse_scale = prepared["coarse_scale"]
+	puzzle_gray_coarse = prepared["coarse_gray"]
+
+	band_rows = None
+	memory_plan = None
+	refine_factor = 1.0
+	if memory_budget is not None:
+		from .memory import plan_matching_memory
+		memory_plan = plan_matching_memory(
+			puzzle_image.size, memory_budget, len(scale_candidates), scale_workers,
+			piece_size=piece.size, scale_candidates=scale_candidates,
+		)
+		band_rows = memory_plan["band_rows"]
+		scale_workers = memory_plan["scale_workers"]
+		refine_factor = memory_plan["refine_scale"]
+	piece_w_orig, piece_h_orig = piece.size
+	if memory_plan is None or memory_plan["piece_full_res"]:
+		piece_arr_orig = piece.rgb
+		piece_h_orig, piece_w_orig = piece_arr_orig.shape[:2]
+
+		def scaled_piece(size):
+			return backend.resize(piece_arr_orig, size)
+	else:
+		# No full-size decode: every scaled copy is reduced from the source
+		def scaled_piece(size):
+			return piece.resized(size, cache=False).rgb
 	results = []
-
-	if gpu_available:
-		try:
-			gpu_puzzle = cv2.cuda_GpuMat()
-			gpu_puzzle.upload(puzzle_gray_coarse)
-			for s in scale_candidates:
-				resized_piece = cv2.resize(piece_arr_orig, (max(1, int(piece_arr_orig.shape[1]*s*coarse_scale)), max(1, int(piece_arr_orig.shape[0]*s*coarse_scale))), interpolation=cv2.INTER_AREA if s*coarse_scale<1 else cv2.INTER_LANCZOS4)
-				ph, pw = resized_piece.shape[:2]
-				if ph > puzzle_gray_coarse.shape[0] or pw > puzzle_gray_coarse.shape[1]:
-					continue
-				piece_gray = cv2.cvtColor(resized_piece, cv2.COLOR_RGB2GRAY)
-				gpu_piece = cv2.cuda_GpuMat()
-				gpu_piece.upload(piece_gray)
-				matcher = cv2.cuda.createTemplateMatching(gpu_puzzle.type(), cv2_method)
-				gpu_res = matcher.match(gpu_puzzle, gpu_piece)
-				res_mat = gpu_res.download()
-				min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res_mat)
-				if cv2_method in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED):
-					score = min_val; loc = min_loc
-				else:
-					score = -max_val; loc = max_loc
-				results.append({
-					"scale": s,
-					"coarse_location": loc,
-					"score": score,
-					"piece_size_scaled": (pw, ph),
-				})
-		except Exception:
-			gpu_available = False  # fallback to CPU
-
-	if not gpu_available:
-		for s in scale_candidates:
-			resized_piece = cv2.resize(piece_arr_orig, (max(1, int(piece_arr_orig.shape[1]*s*coarse_scale)), max(1, int(piece_arr_orig.shape[0]*s*coarse_scale))), interpolation=cv2.INTER_AREA if s*coarse_scale<1 else cv2.INTER_LANCZOS4)
-			ph, pw = resized_piece.shape[:2]
-			if ph > puzzle_gray_coarse.shape[0] or pw > puzzle_gray_coarse.shape[1]:
-				continue
-			piece_gray = cv2.cvtColor(resized_piece, cv2.COLOR_RGB2GRAY)
-			match = cv2.matchTemplate(puzzle_gray_coarse, piece_gray, cv2_method)
-			min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(match)
-			if cv2_method in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED):
-				score = min_val; loc = min_loc
-			else:
-				score = -max_val; loc = max_loc
-			results.append({
-				"scale": s,
-				"coarse_location": loc,
-				"score": score,
-				"piece_size_scaled": (pw, ph),
-			})
+	centre_regions = None
+	lower_is_better = match_method.startswith("SQDIFF")
+	if search_mask is not None:
+		centre_regions = _regions_from_mask(search_mask, puzzle_gray_coarse.shape[:2])
+
+	def evaluate_scale(s):
+		resized_piece = scaled_piece((max(1, int(piece_w_orig*s*coarse_scale)), max(1, int(piece_h_orig*s*coarse_scale))))
+		ph, pw = resized_piece.shape[:2]
+		if ph > puzzle_gray_coarse.shape[0] or pw > puzzle_gray_coarse.shape[1]:
+			return None
+		piece_gray = backend.to_gray(resized_piece)
+		score_map = None
+		if keep_score_map:
+			score_map = np.full(
+				(puzzle_gray_coarse.shape[0] - ph + 1, puzzle_gray_coarse.shape[1] - pw + 1), np.nan,
+				dtype=np.float16 if match_method in _BOUNDED_METHODS else np.float32,
+			)
+		# Alternatives (top_k > 1) must not overlap each other by more than half a piece
+		min_val, max_val, min_loc, max_loc, area, peaks = _match_in_regions(
+			puzzle_gray_coarse, piece_gray, centre_regions, backend, match_method, score_map,
+			peak_k=top_k if top_k > 1 else 0, band_rows=band_rows,
+		)
+		if lower_is_better:
+			score = min_val; loc = min_loc
+		else:
+			score = -max_val; loc = max_loc
+		return {
+			"scale": s,
+			"coarse_location": loc,
+			"score": score,
+			"piece_size_scaled": (pw, ph),
+			"search_area": area,
+			"peaks": peaks,
+			"score_map": score_map,
+		}
+
+	results = [r for r in _map_candidates(evaluate_scale, scale_candidates, backend, scale_workers) if r is not None]
 
 	if not results:
 		return {"error": "no_valid_scale"}
@@ -422,39 +834,97 @@ def multi_scale_template_match(
 	full_x_est = int(coarse_x / coarse_scale)
 	full_y_est = int(coarse_y / coarse_scale)
 
-	# Prepare full-res piece at best scale
+	# Full-res piece size at best scale
 	best_scale = best["scale"]
-	full_piece = cv2.resize(piece_arr_orig, (int(piece_arr_orig.shape[1]*best_scale), int(piece_arr_orig.shape[0]*best_scale)), interpolation=cv2.INTER_LANCZOS4 if best_scale>1 else cv2.INTER_AREA)
-	piece_h, piece_w = full_piece.shape[:2]
+	piece_w = max(1, int(piece_w_orig*best_scale))
+	piece_h = max(1, int(piece_h_orig*best_scale))
 
 	# Define search window in full-res
+	puzzle_w, puzzle_h = puzzle_image.size
 	x0 = max(0, full_x_est - refine_radius)
 	y0 = max(0, full_y_est - refine_radius)
-	x1 = min(puzzle_arr.shape[1]-piece_w, full_x_est + refine_radius)
-	y1 = min(puzzle_arr.shape[0]-piece_h, full_y_est + refine_radius)
+	x1 = min(puzzle_w-piece_w, full_x_est + refine_radius)
+	y1 = min(puzzle_h-piece_h, full_y_est + refine_radius)
 
 	best_ref_score = None
 	best_ref_pos = (full_x_est, full_y_est)
 
-	# Use same method for refinement (convert to gray once)
-	puzzle_gray_full = cv2.cvtColor(puzzle_arr, cv2.COLOR_RGB2GRAY)
-	piece_gray_full = cv2.cvtColor(full_piece, cv2.COLOR_RGB2GRAY)
+	# Use same method for refinement (convert to gray once). Only the window
+	# is needed: without full-res arrays it is cropped from the source, and
+	# under a tight budget both window and piece are reduced by refine_factor
+	win_x1 = min(puzzle_w, max(x0 + 1, x1 + 1) + piece_w)
+	win_y1 = min(puzzle_h, max(y0 + 1, y1 + 1) + piece_h)
+	if refine_factor < 1.0:
+		ref_w = max(1, round(piece_w * refine_factor))
+		ref_h = max(1, round(piece_h * refine_factor))
+		win_size = (max(ref_w, round((win_x1 - x0) * refine_factor)), max(ref_h, round((win_y1 - y0) * refine_factor)))
+		window = backend.to_gray(puzzle_image.region((x0, y0, win_x1, win_y1), size=win_size))
+		positions = (
+			(min(x0 + round(rx / refine_factor), max(x0, x1)), min(y0 + round(ry / refine_factor), max(y0, y1)), rx, ry)
+			for ry in range(win_size[1] - ref_h + 1) for rx in range(win_size[0] - ref_w + 1)
+		)
+	else:
+		ref_w, ref_h = piece_w, piece_h
+		if prepared["gray"] is not None:
+			window = prepared["gray"][y0:win_y1, x0:win_x1]
+		else:
+			window = backend.to_gray(puzzle_image.region((x0, y0, win_x1, win_y1)))
+		positions = (
+			(xx, yy, xx - x0, yy - y0)
+			for yy in range(y0, max(y0+1, y1+1)) for xx in range(x0, max(x0+1, x1+1))
+		)
+	piece_gray_full = backend.to_gray(scaled_piece((ref_w, ref_h))).astype(np.int16)
 
-	for yy in range(y0, max(y0+1, y1+1)):
-		for xx in range(x0, max(x0+1, x1+1)):
-			patch = puzzle_gray_full[yy:yy+piece_h, xx:xx+piece_w]
-			if patch.shape[0] != piece_h or patch.shape[1] != piece_w:
-				continue
-			# Fast SAD approximation using mean abs diff
-			diff = np.abs(patch.astype(np.int16) - piece_gray_full.astype(np.int16))
-			mad = float(diff.mean()) / 255.0  # normalize 0..1
-			if best_ref_score is None or mad < best_ref_score:
-				best_ref_score = mad
-				best_ref_pos = (xx, yy)
+	for xx, yy, wx, wy in positions:
+		patch = window[wy:wy+ref_h, wx:wx+ref_w]
+		if patch.shape[0] != ref_h or patch.shape[1] != ref_w:
+			continue
+		# Fast SAD approximation using mean abs diff
+		diff = np.abs(patch - piece_gray_full)
+		mad = float(diff.mean()) / 255.0  # normalize 0..1
+		if best_ref_score is None or mad < best_ref_score:
+			best_ref_score = mad
+			best_ref_pos = (xx, yy)
 
 	# Similarity heuristic
 	similarity = 1.0 - (best_ref_score if best_ref_score is not None else 1.0)
 
+	# Alternatives: peaks of every scale, best first, suppressing placements
+	# whose centres lie within half a piece of a better one
+	peaks = sorted(
+		((score if lower_is_better else -score, r, x, y) for r in results for x, y, score in r["peaks"]),
+		key=lambda p: p[0],
+	)
+	candidates = [{
+		"position": best_ref_pos,
+		"size": (piece_w, piece_h),
+		"scale": best_scale,
+		"score": best["score"],
+		"centre": (coarse_x + best["piece_size_scaled"][0] / 2, coarse_y + best["piece_size_scaled"][1] / 2),
+		"radius": min(best["piece_size_scaled"]) / 2,
+	}]
+	for score, r, x, y in peaks:
+		if len(candidates) >= top_k:
+			break
+		pw, ph = r["piece_size_scaled"]
+		cx, cy = x + pw / 2, y + ph / 2
+		if any(abs(cx - c["centre"][0]) < c["radius"] and abs(cy - c["centre"][1]) < c["radius"] for c in candidates):
+			continue
+		candidates.append({
+			"position": (int(x / coarse_scale), int(y / coarse_scale)),
+			"size": (int(pw / coarse_scale), int(ph / coarse_scale)),
+			"scale": r["scale"],
+			"score": score,
+			"centre": (cx, cy),
+			"radius": min(pw, ph) / 2,
+		})
+	for c in candidates:
+		del c["centre"], c["radius"]
+	ambiguity = None
+	if len(candidates) > 1:
+		raw = [c["score"] if lower_is_better else -c["score"] for c in candidates[:2]]
+		ambiguity = _ambiguity_ratio(raw[0], raw[1], lower_is_better)
+
 	return {
 		"best_position": best_ref_pos,
 		"scale": best_scale,
@@ -465,12 +935,393 @@ def multi_scale_template_match(
 		"coarse_scale_factor": coarse_scale,
 		"candidates_considered": len(results),
 		"scale_candidates": [r["scale"] for r in results],
-		"gpu_used": gpu_available,
+		"gpu_used": backend.name == "cuda",
+		"backend": backend.name,
+		"search_area_ratio": float(np.mean([r["search_area"] for r in results])),
+		"candidates": candidates,
+		"ambiguity": ambiguity,
+		**({"memory_plan": memory_plan} if memory_plan else {}),
+		**({"score_map": best["score_map"]} if keep_score_map else {}),
 	}
 
 
+# ===== Parallel batch matching (process pool) =====
+_worker_state: dict = {}
+
+
+def _init_batch_worker(puzzle_arr: np.ndarray, prefilter: dict | None, match_kwargs: dict) -> None:
+	"""Pool initializer: receive the puzzle once per worker process."""
+	_worker_state.clear()
+	_worker_state["puzzle"] = ImageArray(puzzle_arr)
+	_worker_state["prefilter"] = prefilter
+	# The pool already runs one process per core: no nested threading
+	_worker_state["kwargs"] = {"scale_workers": 1, **match_kwargs}
+	try:
+		get_backend(match_kwargs.get("backend", "auto")).set_num_threads(1)
+	except (RuntimeError, ValueError):
+		pass  # Reported per piece by multi_scale_template_match
+
+
+def _batch_worker_match(job: tuple[int, str | np.ndarray]) -> tuple[int, dict]:
+	"""Match one piece (file path or image array) against the worker's puzzle; never raises."""
+	import os
+	import time
+	from .acquisition import open_image
+
+	index, piece_src = job
+	start = time.perf_counter()
+	try:
+		# One wrapper per piece: the prefilter and the matcher share its arrays
+		piece = ImageArray(open_image(piece_src) if isinstance(piece_src, (str, os.PathLike)) else piece_src)
+		kwargs = dict(_worker_state["kwargs"])
+		if "prepared" not in _worker_state:
+			# Once per worker process, shared by all the pieces it matches
+			_worker_state["prepared"] = prepare_puzzle(
+				_worker_state["puzzle"], kwargs.get("use_downscale", True), kwargs.get("backend", "auto"),
+				kwargs.get("memory_budget"),
+			)
+		prefilter = _worker_state["prefilter"]
+		if prefilter is not None:
+			kwargs["search_mask"] = candidate_region_mask(prefilter, piece)["mask"]
+		result = multi_scale_template_match(_worker_state["puzzle"], piece, prepared=_worker_state["prepared"], **kwargs)
+		result.setdefault("piece_size_original", piece.size)
+	except Exception as e:
+		result = {"error": str(e)}
+	result["elapsed_s"] = time.perf_counter() - start
+	return index, result
+
+
+def iter_batch_match(
+	puzzle_img: Image.Image,
+	piece_paths,
+	max_workers: int | None = None,
+	cancel_event=None,
+	prefilter: dict | None = None,
+	**match_kwargs,
+):
+	"""Match many pieces in parallel, yielding (index, result) as each finishes.
+
+	``piece_paths`` holds file paths (read inside the workers) or in-memory
+	images, e.g. crops from ``segmentation.segment_pieces``. The puzzle (and
+	optional colour ``prefilter``) is sent once to each worker process. Results arrive in
+	completion order. Setting ``cancel_event`` (a ``threading.Event``) stops
+	iteration and terminates the workers, dropping any work still running.
+	Remaining keyword arguments go to ``multi_scale_template_match``.
+	"""
+	import multiprocessing
+	import os
+
+	def payload(piece):
+		if isinstance(piece, (str, os.PathLike)):
+			return piece
+		piece = as_image_array(piece)
+		return piece.rgb if piece.alpha is None else np.dstack([piece.rgb, piece.alpha])
+
+	jobs = [(i, payload(piece)) for i, piece in enumerate(piece_paths)]
+	if not jobs:
+		return
+	workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs)))
+	puzzle_arr = as_image_array(puzzle_img).rgb
+	pool = multiprocessing.Pool(
+		processes=workers,
+		initializer=_init_batch_worker,
+		initargs=(puzzle_arr, prefilter, match_kwargs),
+	)
+	try:
+		results = pool.imap_unordered(_batch_worker_match, jobs)
+		remaining = len(jobs)
+		while remaining:
+			if cancel_event is not None and cancel_event.is_set():
+				return
+			try:
+				item = results.next(timeout=0.1)
+			except multiprocessing.TimeoutError:
+				continue
+			remaining -= 1
+			yield item
+	finally:
+		pool.terminate()
+		pool.join()
+
+
+# ===== Matching session (working puzzle cached across matches) =====
+class MatchSession:
+	"""Working-resolution puzzle and its derived arrays, built once per puzzle.
+
+	Puzzles larger than ``max_pixels`` are resized once so their longer side
+	is ``max_side``; ``match`` returns positions and sizes in original puzzle
+	coordinates. The colour prefilter is built lazily on first use. Create a
+	new session when the puzzle or ``use_downscale`` changes (see ``matches``).
+	``array`` wraps the working puzzle as an ``ImageArray``; it is what the
+	matcher and the batch workers receive, so it is decoded only once.
+	``memory_budget`` (bytes) is applied to every match (see ``memory``).
+	With a ``cache`` (``result_cache.MatchCache``) results are looked up
+	before matching and stored afterwards; ``puzzle_key`` identifies the
+	puzzle there (e.g. ``indexing.file_hash`` of its file), by default the
+	working pixels are hashed on first use.
+	"""
+
+	def __init__(
+		self,
+		puzzle_img: Image.Image,
+		use_downscale: bool = True,
+		max_side: int = 1200,
+		max_pixels: int = 1500 * 1500,
+		backend: str = "auto",
+		memory_budget: int | None = None,
+		cache=None,
+		puzzle_key: str | None = None,
+	):
+		self.puzzle_img = puzzle_img
+		self.use_downscale = use_downscale
+		self.backend = backend
+		self.memory_budget = memory_budget
+		self.scale_factor: float | None = None
+		puzzle_w, puzzle_h = puzzle_img.size
+		working = puzzle_img
+		if puzzle_w * puzzle_h > max_pixels:
+			factor = min(max_side / puzzle_w, max_side / puzzle_h, 1.0)
+			if factor < 1.0:
+				working = puzzle_img.resize((int(puzzle_w * factor), int(puzzle_h * factor)), Image.Resampling.LANCZOS)
+				self.scale_factor = factor
+		self.image = working
+		self.array = ImageArray(working)
+		self._prepared: dict | None = None
+		self._prefilter: dict | None = None
+		self.cache = cache
+		self._puzzle_key = puzzle_key
+		self._puzzle_hash: str | None = None
+		self._patch_indexes: dict = {}
+
+	def matches(self, puzzle_img: Image.Image, use_downscale: bool = True) -> bool:
+		"""True if this session is still valid for ``puzzle_img`` and settings."""
+		return puzzle_img is self.puzzle_img and use_downscale == self.use_downscale
+
+	@property
+	def prepared(self) -> dict:
+		if self._prepared is None:
+			self._prepared = prepare_puzzle(self.array, self.use_downscale, self.backend, self.memory_budget)
+		return self._prepared
+
+	@property
+	def prefilter(self) -> dict:
+		if self._prefilter is None:
+			self._prefilter = build_color_prefilter(self.puzzle_img)
+		return self._prefilter
+
+	def to_original(self, result: dict) -> dict:
+		"""Convert position / size from the working puzzle to original coordinates."""
+		factor = self.scale_factor
+		if factor is None:
+			return result
+		if "best_position" in result:
+			pos_x, pos_y = result["best_position"]
+			result["best_position"] = (int(pos_x / factor), int(pos_y / factor))
+		if "piece_size_final" in result:
+			size_w, size_h = result["piece_size_final"]
+			result["piece_size_final"] = (int(size_w / factor), int(size_h / factor))
+		for candidate in result.get("candidates", ()):
+			cand_x, cand_y = candidate["position"]
+			cand_w, cand_h = candidate["size"]
+			candidate["position"] = (int(cand_x / factor), int(cand_y / factor))
+			candidate["size"] = (int(cand_w / factor), int(cand_h / factor))
+		if "coarse_scale_factor" in result:
+			# Coarse (score-map) pixels per original puzzle pixel
+			result["coarse_scale_factor"] *= factor
+		return result
+
+	def patch_index(self, num_pieces: int | None = None):
+		"""``patchindex.PatchIndex`` of the working puzzle, built once per piece count."""
+		if num_pieces not in self._patch_indexes:
+			from .patchindex import PatchIndex
+			self._patch_indexes[num_pieces] = PatchIndex(self.array, num_pieces=num_pieces)
+		return self._patch_indexes[num_pieces]
+
+	def locate(self, piece_img, num_pieces: int | None = None, **kwargs) -> dict:
+		"""Fast approximate localisation through the patch-embedding index
+		(``PatchIndex.locate``), in original puzzle coordinates."""
+		import time
+
+		start = time.perf_counter()
+		try:
+			result = self.patch_index(num_pieces).locate(piece_img, **kwargs)
+		except ValueError as e:
+			return {"error": str(e)}
+		result["elapsed_s"] = time.perf_counter() - start
+		return self.to_original(result)
+
+	@property
+	def puzzle_hash(self) -> str:
+		"""Cache identity of the puzzle as matched (source and working size)."""
+		if self._puzzle_hash is None:
+			from .result_cache import source_hash
+
+			base = self._puzzle_key or source_hash(self.array)
+			self._puzzle_hash = f"{base}@{tuple(self.puzzle_img.size)}->{tuple(self.array.size)}"
+		return self._puzzle_hash
+
+	def _cache_params(self, use_prefilter: bool, kwargs: dict) -> dict | None:
+		"""Parameters that determine a result, or None when it must not be cached."""
+		if self.cache is None or kwargs.get("keep_score_map"):
+			return None
+		params = {
+			"use_prefilter": bool(use_prefilter),
+			"use_downscale": self.use_downscale,
+			"memory_budget": self.memory_budget,
+			**{k: v for k, v in kwargs.items() if k not in ("scale_workers", "max_workers", "cancel_event")},
+		}
+		# Key on the backend that will actually run ("auto" differs per machine)
+		backend = params.get("backend", self.backend)
+		if params.pop("use_gpu", False) and backend == "auto":
+			from .backends import CudaBackend
+			if CudaBackend.available():
+				backend = "cuda"
+		try:
+			params["backend"] = get_backend(backend).name
+		except (RuntimeError, ValueError):
+			return None  # the match reports the error; nothing to cache
+		return params
+
+	def match(self, piece_img: Image.Image, use_prefilter: bool = False, **kwargs) -> dict:
+		"""``multi_scale_template_match`` on the cached working puzzle."""
+		params = self._cache_params(use_prefilter, kwargs)
+		if params is not None:
+			from .result_cache import source_hash
+
+			piece_hash = source_hash(piece_img)
+			key = self.cache.key(self.puzzle_hash, piece_hash, params)
+			cached = self.cache.get(key)
+			if cached is not None:
+				cached["cached"] = True
+				return cached
+		piece_img = as_image_array(piece_img)
+		if use_prefilter:
+			kwargs["search_mask"] = candidate_region_mask(self.prefilter, piece_img)["mask"]
+		kwargs.setdefault("backend", self.backend)
+		result = self.to_original(multi_scale_template_match(
+			self.array, piece_img, use_downscale=self.use_downscale, prepared=self.prepared, **kwargs
+		))
+		if params is not None:
+			self.cache.put(key, result, self.puzzle_hash, piece_hash, params)
+		return result
+
+	def _duplicates(self, pieces: list, keys: dict, hits: dict) -> list:
+		"""``dedup.find_duplicates`` over ``pieces`` without decoding cached pieces.
+
+		Perceptual hashes are kept in the cache next to the results, keyed by
+		the piece hash. Only pieces that are neither cached nor hashed before
+		are decoded; cached pieces without a stored hash take no part.
+		"""
+		from .dedup import find_duplicates, image_hashes
+
+		method = "phash"
+		hashes = np.zeros(len(pieces), dtype=np.uint64)
+		sizes: list = [None] * len(pieces)
+		stored = self.cache.get_image_hashes((piece_hash for _, piece_hash in keys.values()), method) if keys else {}
+		missing = []
+		for index in range(len(pieces)):
+			piece_hash = keys[index][1] if index in keys else None
+			if piece_hash in stored:
+				hashes[index], sizes[index] = stored[piece_hash]
+			elif index not in keys or keys[index][0] not in hits:
+				missing.append(index)
+		if missing:
+			new_hashes, new_sizes = image_hashes([pieces[index] for index in missing], method)
+			hashes[missing] = new_hashes
+			new_entries = []
+			for index, value, size in zip(missing, new_hashes.tolist(), new_sizes):
+				sizes[index] = size
+				if size is not None and index in keys:
+					new_entries.append((keys[index][1], value, size))
+			self.cache.put_image_hashes(new_entries, method)
+		return find_duplicates(pieces, method=method, hashes=hashes, sizes=sizes)
+
+	def iter_batch(self, piece_paths, use_prefilter: bool = False, dedup: bool = False, **kwargs):
+		"""``iter_batch_match`` on the working puzzle, results in original coordinates.
+
+		With a cache, hits are yielded first (marked ``cached``) and only the
+		remaining pieces are sent to the workers; new results are stored as
+		they arrive and the cache is pruned at the end. With ``dedup``,
+		near-duplicate images (``dedup.find_duplicates``) are matched once:
+		each copy gets a copy of the first one's result, with ``duplicate_of``
+		set to that piece's index. The cache is checked first and perceptual
+		hashes are stored in it, so cached or previously hashed pieces are
+		never decoded for deduplication.
+		"""
+		pieces = list(piece_paths)
+		params = self._cache_params(use_prefilter, kwargs)
+		keys: dict[int, tuple[str, str]] = {}
+		hits: dict = {}
+		if params is not None:
+			from .result_cache import source_hash
+
+			for index, piece in enumerate(pieces):
+				try:
+					piece_hash = source_hash(piece)
+				except Exception:
+					continue  # unreadable: let the worker report the error
+				keys[index] = (self.cache.key(self.puzzle_hash, piece_hash, params), piece_hash)
+			hits = self.cache.get_many(key for key, _ in keys.values())
+
+		copies: dict[int, list[int]] = {}
+		duplicate_of = [None] * len(pieces)
+		if dedup:
+			if self.cache is not None:
+				duplicate_of = self._duplicates(pieces, keys, hits)
+			else:
+				from .dedup import find_duplicates
+
+				duplicate_of = find_duplicates(pieces)
+			for index, original in enumerate(duplicate_of):
+				if original is not None:
+					copies.setdefault(original, []).append(index)
+
+		def with_copies(index, result):
+			yield index, result
+			for copy_index in copies.get(index, ()):
+				yield copy_index, {**result, "duplicate_of": index}
+
+		pending = []
+		for index in range(len(pieces)):
+			if duplicate_of[index] is not None:
+				continue  # answered with its original
+			hit = hits.get(keys[index][0]) if index in keys else None
+			if hit is None:
+				pending.append(index)
+			else:
+				hit["cached"] = True
+				yield from with_copies(index, hit)
+		if not pending:
+			return
+		batch = iter_batch_match(
+			self.array,
+			[pieces[index] for index in pending],
+			prefilter=self.prefilter if use_prefilter else None,
+			use_downscale=self.use_downscale,
+			**{"backend": self.backend, "memory_budget": self.memory_budget, **kwargs},
+		)
+		try:
+			for position, result in batch:
+				index = pending[position]
+				result = self.to_original(result)
+				if index in keys:
+					key, piece_hash = keys[index]
+					self.cache.put(key, result, self.puzzle_hash, piece_hash, params)
+				yield from with_copies(index, result)
+		finally:
+			if params is not None:
+				self.cache.prune()
+
+
 __all__.extend([
+	"MATCH_ENGINE_VERSION",
 	"estimate_piece_scale_factors",
+	"prepare_puzzle",
+	"MatchSession",
 	"multi_scale_template_match",
+	"find_peaks",
+	"build_color_prefilter",
+	"candidate_region_mask",
+	"iter_batch_match",
 ])
 
@@ -0,0 +1,235 @@
+"""Memory budgets for matching and tracemalloc-based peak measurements.
+
+``plan_matching_memory`` turns a byte budget into matcher settings:
+
+- whether the full-resolution RGB and gray puzzle arrays may be kept (when
+  they do not fit, refinement crops small windows from the source image),
+- the coarse pyramid level (longer side) correlation runs on,
+- the band height: correlation runs in horizontal bands so each float32
+  result map stays small,
+- how many scale candidates run concurrently (each holds its own band),
+- for a known piece size, whether the piece is decoded at full size and
+  the factor refinement runs at.
+
+The budget covers what matching allocates on top of the already decoded
+source image. ``benchmark_memory`` reports the traced peak per budget.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import tracemalloc
+
+# Decoding to a NumPy RGB array briefly holds Pillow's byte copy as well
+_DECODE_BYTES_PER_PX = 6
+# Decoding a piece (RGBA bytes, then the RGB and alpha arrays split from them)
+_PIECE_DECODE_BYTES_PER_PX = 8
+# Decoded piece kept while matching (RGB + alpha)
+_PIECE_HOLD_BYTES_PER_PX = 4
+# Piece reduced straight from its source: Pillow's RGBA result, its array
+# and the RGB / alpha split
+_PIECE_REDUCED_BYTES_PER_PX = 12
+# Scaled piece during correlation: RGB, gray and the backend's float copy
+_PIECE_SCALED_BYTES_PER_PX = 8
+# Refinement, per piece pixel: RGB, gray, int16 gray and the int16 diff + abs
+_REFINE_PIECE_BYTES_PER_PX = 3 + 1 + 2 + 4
+# Refinement window cropped from the source: RGB + gray
+_REFINE_WINDOW_BYTES_PER_PX = 4
+_REFINE_RADIUS = 30
+_MIN_REFINE_SIDE = 16
+# Result map (float32) plus the backend's scratch buffers, per result pixel
+_RESULT_BYTES_PER_PX = 4 * 3
+_MIN_BAND_ROWS = 16
+# Share kept for the piece when its size is not known
+_PIECE_RESERVE = 0.1
+_MAX_COARSE_SIDE = 1600
+_MIN_COARSE_SIDE = 256
+
+
+def _refine_bytes(piece_w: float, piece_h: float, factor: float, window_from_source: bool) -> int:
+	"""Refinement memory for a (piece_w, piece_h) full-resolution placement at ``factor``."""
+	pw, ph = max(1.0, piece_w * factor), max(1.0, piece_h * factor)
+	total = pw * ph * (_REFINE_PIECE_BYTES_PER_PX + _PIECE_REDUCED_BYTES_PER_PX)
+	if window_from_source:
+		margin = 2 * _REFINE_RADIUS * factor
+		total += (pw + margin) * (ph + margin) * _REFINE_WINDOW_BYTES_PER_PX
+	return int(total)
+
+
+def plan_matching_memory(
+	puzzle_size: tuple[int, int],
+	budget_bytes: int,
+	scales: int = 3,
+	max_workers: int | None = None,
+	max_coarse_side: int = _MAX_COARSE_SIDE,
+	piece_size: tuple[int, int] | None = None,
+	scale_candidates: list[float] | None = None,
+) -> dict:
+	"""Matcher settings for ``puzzle_size`` (w, h) under ``budget_bytes``.
+
+	With ``piece_size`` (w, h) and the ``scale_candidates`` the piece is
+	budgeted too: its decode, the scaled copies being correlated and the
+	refinement arrays. Without them a flat share of the budget is kept for it.
+
+	Returns dict with ``full_res_arrays`` (bool), ``coarse_side``,
+	``band_rows`` (None = whole map at once), ``scale_workers``,
+	``piece_full_res`` (False: scaled pieces are reduced straight from the
+	source instead of from a full-size decode), ``refine_scale`` (1.0 =
+	refine at full resolution, less = on a reduced window),
+	``estimated_bytes`` and ``fits`` (False when even the smallest settings
+	exceed the budget; they are still the best effort).
+	"""
+	width, height = puzzle_size
+	longest = max(width, height, 1)
+	if scale_candidates:
+		scales = len(scale_candidates)
+	max_scale = max(scale_candidates) if scale_candidates else 1.0
+
+	def coarse_dims(side):
+		ratio = min(1.0, side / longest)
+		return max(1, int(width * ratio)), max(1, int(height * ratio))
+
+	# Largest coarse level that can be built (reduced RGB level while it is
+	# converted, plus its gray copy) and still leave room for one thin band
+	coarse_side = min(max_coarse_side, longest)
+	while coarse_side > _MIN_COARSE_SIDE:
+		coarse_w, coarse_h = coarse_dims(coarse_side)
+		build = coarse_w * coarse_h * (_DECODE_BYTES_PER_PX + 1)
+		thin_band = coarse_w * coarse_h + coarse_w * _RESULT_BYTES_PER_PX * _MIN_BAND_ROWS
+		if max(build, thin_band) <= budget_bytes:
+			break
+		coarse_side = max(_MIN_COARSE_SIDE, int(coarse_side * 0.8))
+	coarse_w, coarse_h = coarse_dims(coarse_side)
+	coarse_bytes = coarse_w * coarse_h
+	coarse_ratio = coarse_w / max(1, width)
+
+	# The piece: decoded once at full size when that fits, else every scaled
+	# copy is reduced straight from the source
+	piece_hold = 0
+	piece_full_res = True
+	scaled_piece = 0
+	if piece_size is not None:
+		piece_px = piece_size[0] * piece_size[1]
+		scaled_px = piece_px * (max_scale * coarse_ratio) ** 2
+		piece_full_res = max(
+			coarse_bytes + piece_px * _PIECE_DECODE_BYTES_PER_PX,
+			coarse_bytes + piece_px * _PIECE_HOLD_BYTES_PER_PX + scaled_px * _PIECE_SCALED_BYTES_PER_PX,
+		) <= budget_bytes * 0.5
+		piece_hold = piece_px * _PIECE_HOLD_BYTES_PER_PX if piece_full_res else 0
+		scaled_piece = scaled_px * (_PIECE_SCALED_BYTES_PER_PX + (0 if piece_full_res else _PIECE_REDUCED_BYTES_PER_PX))
+		available = budget_bytes - coarse_bytes - piece_hold
+	else:
+		available = int(budget_bytes * (1.0 - _PIECE_RESERVE)) - coarse_bytes
+
+	# Working memory: one result band and one scaled piece per concurrent scale
+	row_bytes = coarse_w * _RESULT_BYTES_PER_PX
+	per_worker_min = row_bytes * _MIN_BAND_ROWS * 4 + scaled_piece
+	workers = max(1, min(scales, max_workers or os.cpu_count() or 1))
+	workers = int(max(1, min(workers, available // max(1, per_worker_min))))
+	band_rows = int(max(_MIN_BAND_ROWS, (available // workers - scaled_piece) // max(1, row_bytes)))
+	if band_rows >= coarse_h:
+		band_rows = None
+	working = workers * (row_bytes * (band_rows or coarse_h) + scaled_piece)
+
+	# Full-resolution arrays (RGB + gray) only when they fit next to everything else
+	full_px = width * height
+	full_res = max(full_px * _DECODE_BYTES_PER_PX, full_px * 4 + coarse_bytes + piece_hold + working) <= budget_bytes
+
+	# Refinement: full resolution if the piece arrays fit, else a reduced window
+	refine_scale = 1.0
+	if piece_size is not None:
+		piece_w, piece_h = piece_size[0] * max_scale, piece_size[1] * max_scale
+		refine_room = budget_bytes - coarse_bytes - piece_hold - (full_px * 4 if full_res else 0)
+		while (
+			_refine_bytes(piece_w, piece_h, refine_scale, not full_res or refine_scale < 1.0) > refine_room
+			and min(piece_w, piece_h) * refine_scale / 2 >= _MIN_REFINE_SIDE
+		):
+			refine_scale /= 2
+		refine = _refine_bytes(piece_w, piece_h, refine_scale, not full_res or refine_scale < 1.0)
+	else:
+		refine = 0
+
+	if full_res:
+		base = full_px * 4 + coarse_bytes + piece_hold
+		estimated = max(full_px * _DECODE_BYTES_PER_PX, base + working, base + refine)
+	else:
+		base = coarse_bytes + piece_hold
+		estimated = max(coarse_bytes * (_DECODE_BYTES_PER_PX + 1), base + working, base + refine)
+	if piece_size is not None and piece_full_res:
+		estimated = max(estimated, coarse_bytes + piece_size[0] * piece_size[1] * _PIECE_DECODE_BYTES_PER_PX)
+	return {
+		"budget": int(budget_bytes),
+		"full_res_arrays": full_res,
+		"coarse_side": int(coarse_side),
+		"band_rows": None if band_rows is None else int(band_rows),
+		"scale_workers": int(workers),
+		"piece_full_res": piece_full_res,
+		"refine_scale": refine_scale,
+		"estimated_bytes": int(estimated),
+		"fits": estimated <= budget_bytes,
+	}
+
+
+def measure_peak(fn, *args, **kwargs) -> tuple:
+	"""Run ``fn`` under tracemalloc: (result, peak_bytes, seconds).
+
+	Counts Python and NumPy allocations (NumPy reports to tracemalloc);
+	memory held privately by Pillow or OpenCV internals is not traced.
+	"""
+	was_tracing = tracemalloc.is_tracing()
+	if not was_tracing:
+		tracemalloc.start()
+	tracemalloc.reset_peak()
+	base = tracemalloc.get_traced_memory()[0]
+	start = time.perf_counter()
+	try:
+		result = fn(*args, **kwargs)
+		seconds = time.perf_counter() - start
+		peak = tracemalloc.get_traced_memory()[1] - base
+	finally:
+		if not was_tracing:
+			tracemalloc.stop()
+	return result, peak, seconds
+
+
+def benchmark_memory(
+	puzzle_img,
+	piece_img,
+	budgets=(None, 256 << 20, 64 << 20, 16 << 20),
+	**match_kwargs,
+) -> list[dict]:
+	"""Match one piece once per budget and report traced peak memory.
+
+	Each run starts from a fresh ``ImageArray`` of the (already decoded)
+	puzzle, so no cached arrays carry over. Returns one dict per budget with
+	``budget``, ``peak_bytes``, ``seconds``, ``position``, ``plan`` and
+	``within_budget``. Raises AssertionError when a plan that reports it
+	``fits`` peaks above its budget.
+	"""
+	from .imagearray import ImageArray
+	from .matching import multi_scale_template_match
+
+	report = []
+	for budget in budgets:
+		puzzle = ImageArray(puzzle_img)
+		piece = ImageArray(piece_img)
+		result, peak, seconds = measure_peak(
+			multi_scale_template_match, puzzle, piece, memory_budget=budget, **match_kwargs
+		)
+		plan = result.get("memory_plan")
+		within = None if budget is None else peak <= budget
+		if plan and plan["fits"] and not within:
+			raise AssertionError(f"peak {peak} bytes exceeds the {budget} byte budget the plan fits in")
+		report.append({
+			"budget": budget,
+			"peak_bytes": peak,
+			"seconds": seconds,
+			"position": result.get("best_position"),
+			"plan": plan,
+			"within_budget": within,
+		})
+	return report
+
+
+__all__ = ["plan_matching_memory", "measure_peak", "benchmark_memory"]
@@ -0,0 +1,301 @@
+"""Dense patch-embedding index of a puzzle for approximate localisation.
+
+A second lookup engine next to template matching. Built once per puzzle:
+
+- overlapping square patches are sampled at a few sizes around the expected
+  piece size, each from a pyramid level where the patch is ``PATCH_PX``
+  pixels wide, with a stride of a quarter patch,
+- every patch is described on a 4x4 cell grid by the mean Lab colour and the
+  gradient energy in four orientation bins per cell (summed-area tables,
+  so all patches of a level cost a handful of array operations),
+- the descriptors are standardised, reduced by PCA to ``dims`` values and
+  stored in an ``ann.IVFIndex``.
+
+A piece is embedded the same way from the central square of its bounding
+box (transparent pixels are ignored), the nearest patches are looked up and
+a short verification ranks them by ``compute_mean_abs_diff`` at thumbnail
+resolution. Patch sizes follow the piece count, not the pixel count, so the
+index size and the lookup cost do not depend on the puzzle resolution.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+from PIL import Image
+
+from .ann import IVFIndex
+from .imagearray import ImageArray, as_image_array
+
+PATCH_PX = 32
+GRID = 4
+_ORIENTATION_BINS = 4
+_STRIDE_RATIO = 0.25
+# Patch side relative to sqrt(puzzle area / num_pieces)
+_SIDE_FACTORS = (0.7, 0.85, 1.0, 1.2)
+# Without a piece count: patch sides relative to the shorter puzzle side
+_GENERIC_SIDES = (0.08, 0.12, 0.18, 0.26)
+_VERIFY_SIDE = 48
+_PCA_SAMPLE = 20000
+
+
+def _channels(rgb: np.ndarray) -> np.ndarray:
+	"""(H, W, 3 + bins) float32: Lab and orientation-binned gradient magnitude."""
+	from .features import rgb_to_lab
+
+	lab = rgb_to_lab(rgb)
+	gray = lab[..., 0]
+	gx = np.zeros_like(gray)
+	gy = np.zeros_like(gray)
+	gx[:, 1:-1] = gray[:, 2:] - gray[:, :-2]
+	gy[1:-1] = gray[2:] - gray[:-2]
+	magnitude = np.hypot(gx, gy)
+	# Unsigned orientation: a dark-to-light edge matches its reverse
+	orientation = np.mod(np.arctan2(gy, gx), np.pi)
+	bins = np.minimum((orientation * (_ORIENTATION_BINS / np.pi)).astype(np.int8), _ORIENTATION_BINS - 1)
+	gradients = [np.where(bins == b, magnitude, 0.0) for b in range(_ORIENTATION_BINS)]
+	return np.dstack([lab, *gradients]).astype(np.float32)
+
+
+def _integral(values: np.ndarray) -> np.ndarray:
+	"""Summed-area table with a zero first row and column (float64)."""
+	table = np.zeros((values.shape[0] + 1, values.shape[1] + 1) + values.shape[2:], dtype=np.float64)
+	np.cumsum(np.cumsum(values, axis=0, dtype=np.float64), axis=1, out=table[1:, 1:])
+	return table
+
+
+def _cell_sums(table: np.ndarray, ys: np.ndarray, xs: np.ndarray, side: int) -> np.ndarray:
+	"""Per-cell sums of every patch at (ys x xs) top-lefts: (ny, nx, GRID * GRID, C)."""
+	cell = side // GRID
+	y = ys[:, None]
+	x = xs[None, :]
+	cells = []
+	for i in range(GRID):
+		for j in range(GRID):
+			top, left = y + i * cell, x + j * cell
+			cells.append(
+				table[top + cell, left + cell] - table[top, left + cell]
+				- table[top + cell, left] + table[top, left]
+			)
+	return np.stack(cells, axis=2)
+
+
+def _piece_descriptor(piece: ImageArray) -> np.ndarray:
+	"""Raw descriptor of the central square of ``piece``, alpha-weighted."""
+	w, h = piece.size
+	side = min(w, h)
+	left, top = (w - side) // 2, (h - side) // 2
+	box = (left, top, left + side, top + side)
+	rgb = Image.fromarray(np.ascontiguousarray(piece.region(box))).resize((PATCH_PX, PATCH_PX), Image.Resampling.BOX)
+	channels = _channels(np.asarray(rgb))
+	if piece.alpha is not None:
+		alpha = Image.fromarray(np.ascontiguousarray(piece.alpha[top:top + side, left:left + side]))
+		weight = np.asarray(alpha.resize((PATCH_PX, PATCH_PX), Image.Resampling.BOX), dtype=np.float32) / 255.0
+	else:
+		weight = np.ones((PATCH_PX, PATCH_PX), dtype=np.float32)
+	origin = np.zeros(1, dtype=np.int64)
+	sums = _cell_sums(_integral(channels * weight[..., None]), origin, origin, PATCH_PX)[0, 0]
+	weights = _cell_sums(_integral(weight[..., None]), origin, origin, PATCH_PX)[0, 0]
+	# Fully transparent cells take the mean of the visible ones
+	overall = sums.sum(0) / max(weights.sum(), 1e-6)
+	means = np.where(weights > 1e-6, sums / np.maximum(weights, 1e-6), overall)
+	return means.reshape(-1).astype(np.float32)
+
+
+def patch_sides(puzzle_size: tuple[int, int], num_pieces: int | None = None) -> list[int]:
+	"""Patch sides (puzzle pixels) to index for ``num_pieces`` (or generic sizes)."""
+	width, height = puzzle_size
+	if num_pieces and num_pieces > 1:
+		base = math.sqrt(width * height / num_pieces)
+		sides = [base * f for f in _SIDE_FACTORS]
+	else:
+		sides = [min(width, height) * f for f in _GENERIC_SIDES]
+	return sorted({int(s) for s in sides if GRID <= s <= min(width, height)})
+
+
+class PatchIndex:
+	"""ANN index of overlapping puzzle patches, queried with piece images.
+
+	Usage::
+
+		index = PatchIndex(puzzle, num_pieces=500)
+		result = index.locate(piece)  # best_position, piece_size_final, candidates...
+
+	``sides`` overrides the patch sizes (puzzle pixels); ``dims`` is the PCA
+	output size.
+	"""
+
+	def __init__(
+		self,
+		puzzle_img,
+		num_pieces: int | None = None,
+		sides: list[int] | None = None,
+		dims: int = 24,
+		n_lists: int | None = None,
+	):
+		self.puzzle = as_image_array(puzzle_img)
+		self.sides = list(sides) if sides else patch_sides(self.puzzle.size, num_pieces)
+		if not self.sides:
+			raise ValueError("puzzle too small for the requested patch sizes")
+		descriptors = []
+		boxes = []
+		for side in self.sides:
+			level_descriptors, level_boxes = self._level_patches(side)
+			descriptors.append(level_descriptors)
+			boxes.append(level_boxes)
+		raw = np.concatenate(descriptors)
+		# (x, y, side) of every patch in puzzle pixels
+		self.boxes = np.concatenate(boxes)
+
+		# Standardise, then PCA (SVD of a sample) down to ``dims`` components
+		self.mean = raw.mean(0)
+		self.scale = raw.std(0) + 1e-6
+		standard = (raw - self.mean) / self.scale
+		rng = np.random.default_rng(0)
+		sample = standard if len(standard) <= _PCA_SAMPLE else standard[rng.choice(len(standard), _PCA_SAMPLE, replace=False)]
+		_, _, vt = np.linalg.svd(sample - sample.mean(0), full_matrices=False)
+		self.components = np.ascontiguousarray(vt[:min(dims, len(vt))], dtype=np.float32)
+		self.index = IVFIndex(self.embed_raw(raw), n_lists=n_lists)
+		# Verification reads a level where the smallest patch is ~2x the thumbnail,
+		# so its cost does not grow with the puzzle resolution either
+		factor = min(1.0, 2 * _VERIFY_SIDE / min(self.sides))
+		width, height = self.puzzle.size
+		self._verify_factor = factor
+		self._verify_level = self.puzzle.resized((round(width * factor), round(height * factor)), cache=False)
+
+	def _level_patches(self, side: int) -> tuple[np.ndarray, np.ndarray]:
+		"""Raw descriptors and boxes of all patches of one size."""
+		factor = PATCH_PX / side
+		width, height = self.puzzle.size
+		level = self.puzzle.resized((max(PATCH_PX, round(width * factor)), max(PATCH_PX, round(height * factor))), cache=False)
+		table = _integral(_channels(level.rgb))
+		stride = max(1, int(PATCH_PX * _STRIDE_RATIO))
+		ys = np.arange(0, level.height - PATCH_PX + 1, stride)
+		xs = np.arange(0, level.width - PATCH_PX + 1, stride)
+		cell_area = (PATCH_PX // GRID) ** 2
+		sums = _cell_sums(table, ys, xs, PATCH_PX) / cell_area
+		descriptors = sums.reshape(len(ys) * len(xs), -1).astype(np.float32)
+		grid_y, grid_x = np.meshgrid(ys, xs, indexing="ij")
+		# Level pixels back to puzzle pixels
+		boxes = np.stack([
+			grid_x.ravel() * (width / level.width),
+			grid_y.ravel() * (height / level.height),
+			np.full(grid_x.size, side, dtype=np.float64),
+		], axis=1)
+		return descriptors, boxes
+
+	def __len__(self) -> int:
+		return len(self.index)
+
+	def embed_raw(self, raw: np.ndarray) -> np.ndarray:
+		return ((np.atleast_2d(raw) - self.mean) / self.scale @ self.components.T).astype(np.float32)
+
+	def embed(self, piece_img) -> np.ndarray:
+		"""(dims,) embedding of a piece image."""
+		return self.embed_raw(_piece_descriptor(as_image_array(piece_img)))[0]
+
+	def query(self, piece_img, k: int = 32, n_probe: int = 8) -> list[dict]:
+		"""Nearest patches: dicts with ``position`` / ``size`` of the piece placed
+		there (puzzle pixels), ``scale`` and embedding ``distance``."""
+		piece = as_image_array(piece_img)
+		ids, dist = self.index.search(self.embed(piece), k=k, n_probe=n_probe)
+		piece_side = min(piece.size)
+		found = []
+		for i, d in zip(ids[0].tolist(), dist[0].tolist()):
+			if i < 0:
+				break
+			x, y, side = self.boxes[i]
+			scale = side / piece_side
+			w, h = max(1, round(piece.width * scale)), max(1, round(piece.height * scale))
+			# The patch is the central square of the piece's bounding box
+			found.append({
+				"position": (int(round(x + side / 2 - w / 2)), int(round(y + side / 2 - h / 2))),
+				"size": (w, h),
+				"scale": float(scale),
+				"distance": float(d),
+			})
+		return found
+
+	def _clipped_box(self, position, size) -> tuple[int, int, int, int]:
+		width, height = self.puzzle.size
+		w, h = min(size[0], width), min(size[1], height)
+		x = min(max(0, position[0]), width - w)
+		y = min(max(0, position[1]), height - h)
+		return x, y, x + w, y + h
+
+	def _verify(self, piece_small: ImageArray, position, size) -> tuple[float, tuple[int, int]]:
+		"""Mean absolute difference of the piece against the puzzle region there."""
+		from .matching import compute_mean_abs_diff
+
+		box = self._clipped_box(position, size)
+		left, top, right, bottom = (int(round(v * self._verify_factor)) for v in box)
+		level_box = (left, top, max(right, left + 1), max(bottom, top + 1))
+		region = Image.fromarray(np.ascontiguousarray(self._verify_level.region(level_box)))
+		region = ImageArray(np.asarray(region.resize(piece_small.size, Image.Resampling.BOX)))
+		return compute_mean_abs_diff(region, piece_small), box[:2]
+
+	def locate(self, piece_img, top_k: int = 5, k: int = 32, n_probe: int = 8, verify: int = 8) -> dict:
+		"""Localise a piece: ANN lookup, then ``verify`` candidates ranked by
+		mean absolute difference, the best one nudged by a quarter patch.
+
+		Returns the keys of ``multi_scale_template_match`` results that
+		callers use (``best_position``, ``piece_size_final``, ``scale``,
+		``refined_similarity``, ``candidates``, ``ambiguity``) with
+		``method`` = "patch_ann".
+		"""
+		from .matching import _ambiguity_ratio
+
+		piece = as_image_array(piece_img)
+		found = self.query(piece, k=k, n_probe=n_probe)
+		if not found:
+			return {"error": "no_patch_candidates"}
+		ratio = _VERIFY_SIDE / max(piece.size)
+		piece_small = piece.resized((round(piece.width * min(ratio, 1.0)), round(piece.height * min(ratio, 1.0))), cache=False)
+
+		# Keep one candidate per place (nearest embedding first), then verify
+		kept = []
+		for cand in found:
+			cx, cy = cand["position"][0] + cand["size"][0] / 2, cand["position"][1] + cand["size"][1] / 2
+			if all(
+				max(abs(cx - ox), abs(cy - oy)) > min(cand["size"]) / 2
+				for ox, oy in ((o["position"][0] + o["size"][0] / 2, o["position"][1] + o["size"][1] / 2) for o in kept)
+			):
+				kept.append(cand)
+			if len(kept) == verify:
+				break
+		for cand in kept:
+			cand["score"], cand["position"] = self._verify(piece_small, cand["position"], cand["size"])
+		kept.sort(key=lambda c: c["score"])
+
+		# Patches sit on a quarter-patch grid: try the neighbouring offsets
+		best = kept[0]
+		step = max(1, int(min(best["size"]) * _STRIDE_RATIO / 2))
+		for dy in (-step, 0, step):
+			for dx in (-step, 0, step):
+				if dx or dy:
+					score, position = self._verify(
+						piece_small, (best["position"][0] + dx, best["position"][1] + dy), best["size"]
+					)
+					if score < best["score"]:
+						best = {**best, "score": score, "position": position}
+		kept[0] = best
+
+		candidates = [
+			{"position": c["position"], "size": c["size"], "scale": c["scale"], "score": float(c["score"])}
+			for c in kept[:top_k]
+		]
+		return {
+			"best_position": best["position"],
+			"piece_size_final": best["size"],
+			"piece_size_original": piece.size,
+			"scale": best["scale"],
+			"score": float(best["score"]),
+			"refined_similarity": 1.0 - float(best["score"]) / 255.0,
+			"candidates": candidates,
+			"ambiguity": _ambiguity_ratio(candidates[0]["score"], candidates[1]["score"], True) if len(candidates) > 1 else None,
+			"method": "patch_ann",
+		}
+
+
+__all__ = ["PatchIndex", "patch_sides", "PATCH_PX"]
@@ -0,0 +1,268 @@
+"""Persistent cache of match results across runs.
+
+One SQLite database holds one row per (puzzle hash, piece hash, engine
+version, parameters) with the full JSON result, top-K ``candidates``
+included. Sources given as file paths (or ``LazyImage`` handles) are
+identified by file content hash, in-memory images by a hash of their pixels,
+so re-running the same pieces against the same puzzle never decodes or
+matches them again. The database uses WAL journaling: any number of
+processes can read while one writes (WAL needs a local disk, not a network
+share). Rows carry a last-used time and ``prune`` evicts the least recently
+used ones to stay under ``max_bytes``. Perceptual hashes of pieces (see
+``dedup``) are kept alongside, keyed by the same piece identity, so an
+unchanged piece is never decoded again just to be hashed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+CACHE_FILENAME = "match_cache.sqlite"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "puzzle-piece-finder")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+	key TEXT PRIMARY KEY,
+	puzzle TEXT NOT NULL,
+	piece TEXT NOT NULL,
+	engine TEXT NOT NULL,
+	params TEXT NOT NULL,
+	result TEXT NOT NULL,
+	bytes INTEGER NOT NULL,
+	created REAL NOT NULL,
+	last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE INDEX IF NOT EXISTS results_puzzle ON results (puzzle);
+CREATE TABLE IF NOT EXISTS image_hashes (
+	piece TEXT NOT NULL,
+	method TEXT NOT NULL,
+	hash TEXT NOT NULL,
+	width INTEGER NOT NULL,
+	height INTEGER NOT NULL,
+	PRIMARY KEY (piece, method)
+);
+"""
+
+# Result fields stored as (x, y) / (w, h) tuples; JSON turns them into lists
+_PAIR_FIELDS = ("best_position", "piece_size_final", "piece_size_original", "position", "size")
+# SQLite's default limit on host parameters per statement is 999
+_QUERY_CHUNK = 500
+
+
+def array_hash(arr: np.ndarray) -> str:
+	"""Hash of an array's shape, dtype and bytes (BLAKE2b, 128-bit hex)."""
+	arr = np.ascontiguousarray(arr)
+	h = hashlib.blake2b(digest_size=16)
+	h.update(f"{arr.shape}{arr.dtype.str}".encode())
+	h.update(memoryview(arr).cast("B"))
+	return h.hexdigest()
+
+
+def source_hash(source) -> str:
+	"""Identity of an image source: file content hash for paths and ``LazyImage``
+	handles, pixel hash for in-memory images (PIL, ``ImageArray``, arrays)."""
+	from .imagearray import ImageArray
+	from .indexing import file_hash
+
+	path = source if isinstance(source, (str, os.PathLike)) else getattr(source, "path", None)
+	if path is not None and os.path.isfile(path):
+		return "file:" + file_hash(path)
+	image = source if isinstance(source, ImageArray) else ImageArray(source)
+	parts = [array_hash(image.rgb)]
+	if image.alpha is not None:
+		parts.append(array_hash(image.alpha))
+	return "pixels:" + "-".join(parts)
+
+
+def _canonical(value):
+	"""JSON-able, order-independent form of a parameter value."""
+	if isinstance(value, np.ndarray):
+		return {"array": array_hash(value)}
+	if isinstance(value, dict):
+		return {str(k): _canonical(v) for k, v in sorted(value.items())}
+	if isinstance(value, (list, tuple)):
+		return [_canonical(v) for v in value]
+	if isinstance(value, (np.integer, np.floating, np.bool_)):
+		return value.item()
+	if value is None or isinstance(value, (bool, int, float, str)):
+		return value
+	return getattr(value, "name", None) or repr(value)
+
+
+def _to_json(value):
+	if isinstance(value, np.ndarray):
+		return value.tolist()
+	if isinstance(value, (np.integer, np.floating, np.bool_)):
+		return value.item()
+	raise TypeError(f"not JSON serialisable: {type(value).__name__}")
+
+
+def _restore_pairs(value):
+	"""Turn stored [x, y] lists of the known pair fields back into tuples."""
+	if isinstance(value, dict):
+		return {
+			k: tuple(v) if k in _PAIR_FIELDS and isinstance(v, list) else _restore_pairs(v)
+			for k, v in value.items()
+		}
+	if isinstance(value, list):
+		return [_restore_pairs(v) for v in value]
+	return value
+
+
+class MatchCache:
+	"""SQLite-backed match-result cache shared across runs and processes.
+
+	Usage::
+
+		with MatchCache() as cache:
+			session = MatchSession(puzzle, cache=cache)
+			for index, result in session.iter_batch(paths, num_pieces=1000):
+				...
+	"""
+
+	def __init__(self, db_path: str | None = None, max_bytes: int = 256 << 20, wal: bool = True):
+		if db_path is None:
+			os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+			db_path = os.path.join(DEFAULT_CACHE_DIR, CACHE_FILENAME)
+		self.db_path = db_path
+		self.max_bytes = max_bytes
+		self._lock = threading.Lock()
+		try:
+			self._conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+			if wal:
+				self._conn.execute("PRAGMA journal_mode=WAL")
+			self._conn.execute("PRAGMA synchronous=NORMAL")
+			self._conn.executescript(_SCHEMA)
+		except sqlite3.OperationalError:
+			# Read-only location: the cache still works, just not persisted
+			self.db_path = ":memory:"
+			self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+			self._conn.executescript(_SCHEMA)
+
+	def close(self) -> None:
+		with self._lock:
+			self._conn.close()
+
+	def __enter__(self) -> "MatchCache":
+		return self
+
+	def __exit__(self, *exc) -> None:
+		self.close()
+
+	@staticmethod
+	def key(puzzle_hash: str, piece_hash: str, params: dict) -> str:
+		"""Cache key of one match: puzzle, piece, engine version and parameters."""
+		h = hashlib.blake2b(digest_size=16)
+		for part in (puzzle_hash, piece_hash, _engine_version(), json.dumps(_canonical(params), sort_keys=True)):
+			h.update(part.encode())
+			h.update(b"\0")
+		return h.hexdigest()
+
+	def get(self, key: str) -> dict | None:
+		return self.get_many([key]).get(key)
+
+	def get_many(self, keys) -> dict:
+		"""Cached results for the given keys (missing keys are left out)."""
+		keys = list(dict.fromkeys(keys))
+		found = {}
+		with self._lock:
+			for start in range(0, len(keys), _QUERY_CHUNK):
+				chunk = keys[start:start + _QUERY_CHUNK]
+				cursor = self._conn.execute(
+					f"SELECT key, result FROM results WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+				)
+				for key, payload in cursor:
+					found[key] = _restore_pairs(json.loads(payload))
+			if found:
+				# One write for all hits keeps readers and the LRU order cheap
+				now = time.time()
+				with self._conn:
+					self._conn.executemany("UPDATE results SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+		return found
+
+	def put(self, key: str, result: dict, puzzle_hash: str, piece_hash: str, params: dict) -> None:
+		"""Store one successful result (errors and score maps are never cached)."""
+		if "error" in result:
+			return
+		payload = json.dumps({k: v for k, v in result.items() if k != "score_map"}, default=_to_json)
+		now = time.time()
+		with self._lock, self._conn:
+			self._conn.execute(
+				"INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				(
+					key, puzzle_hash, piece_hash, _engine_version(),
+					json.dumps(_canonical(params), sort_keys=True), payload, len(payload), now, now,
+				),
+			)
+
+	def get_image_hashes(self, piece_hashes, method: str) -> dict:
+		"""Stored perceptual hashes: piece hash -> (64-bit hash, (w, h))."""
+		piece_hashes = list(dict.fromkeys(piece_hashes))
+		found = {}
+		with self._lock:
+			for start in range(0, len(piece_hashes), _QUERY_CHUNK):
+				chunk = piece_hashes[start:start + _QUERY_CHUNK]
+				cursor = self._conn.execute(
+					f"SELECT piece, hash, width, height FROM image_hashes WHERE method = ? "
+					f"AND piece IN ({', '.join('?' * len(chunk))})", [method, *chunk]
+				)
+				for piece, value, width, height in cursor:
+					found[piece] = (int(value, 16), (width, height))
+		return found
+
+	def put_image_hashes(self, entries, method: str) -> None:
+		"""Store ``(piece hash, 64-bit hash, (w, h))`` entries."""
+		rows = [(piece, method, f"{int(value):016x}", int(size[0]), int(size[1])) for piece, value, size in entries]
+		if not rows:
+			return
+		with self._lock, self._conn:
+			self._conn.executemany("INSERT OR REPLACE INTO image_hashes VALUES (?, ?, ?, ?, ?)", rows)
+
+	def size_bytes(self) -> int:
+		with self._lock:
+			return self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM results").fetchone()[0]
+
+	def prune(self, max_bytes: int | None = None) -> int:
+		"""Evict least recently used rows until stored results fit ``max_bytes``.
+
+		Prunes down to 90% of the limit so it does not run on every insert.
+		Returns the number of rows removed.
+		"""
+		limit = self.max_bytes if max_bytes is None else max_bytes
+		total = self.size_bytes()
+		if total <= limit:
+			return 0
+		excess = total - int(limit * 0.9)
+		with self._lock, self._conn:
+			# Oldest rows until their cumulative size covers the excess
+			removed = self._conn.execute(
+				"DELETE FROM results WHERE key IN (SELECT key FROM (SELECT key, bytes, "
+				"SUM(bytes) OVER (ORDER BY last_used, key) AS running FROM results) WHERE running - bytes < ?)",
+				(excess,),
+			).rowcount
+		return removed
+
+	def clear(self) -> None:
+		with self._lock, self._conn:
+			self._conn.execute("DELETE FROM results")
+			self._conn.execute("DELETE FROM image_hashes")
+
+	def __len__(self) -> int:
+		with self._lock:
+			return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def _engine_version() -> str:
+	from .matching import MATCH_ENGINE_VERSION
+	return MATCH_ENGINE_VERSION
+
+
+__all__ = ["MatchCache", "source_hash", "array_hash", "CACHE_FILENAME", "DEFAULT_CACHE_DIR"]
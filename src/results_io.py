@@ -0,0 +1,203 @@
+"""Streaming export and reload of matching sessions.
+
+A session is one header (puzzle path and size, creation time) followed by one
+record per matched piece: position, size, scale, similarity, angle, the
+time spent matching it and, for repeated scans of one piece, the id of its
+first copy. Records are written as they are produced, so a session
+is never assembled in memory before saving:
+
+- ``.jsonl``: one JSON object per line (header first), flushed per record;
+  readable with any text tool and safe to interrupt.
+- ``.npz``: fixed-size binary rows are appended to a ``.part`` file next to
+  the target and packed into a compressed NumPy archive on close.
+
+``read_session`` returns the records as columnar NumPy arrays, which is what
+the viewer needs to redraw a session without re-matching.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+
+import numpy as np
+
+SESSION_VERSION = 2
+
+# Numeric per-piece fields, in storage order
+RECORD_FIELDS = ("piece_id", "x", "y", "width", "height", "scale", "similarity", "angle", "elapsed_s", "duplicate_of")
+
+_NPZ_DTYPE = np.dtype([
+	("piece_id", "<i4"),
+	("x", "<i4"),
+	("y", "<i4"),
+	("width", "<i4"),
+	("height", "<i4"),
+	("scale", "<f4"),
+	("similarity", "<f4"),
+	("angle", "<f4"),
+	("elapsed_s", "<f4"),
+	("duplicate_of", "<i4"),  # piece_id of the first copy, 0 = not a duplicate (version 2)
+])
+
+
+def result_record(entry: dict) -> dict:
+	"""Flatten a GUI/batch result entry into a session record."""
+	x, y = entry["position"]
+	w, h = entry["size"]
+	return {
+		"piece_id": int(entry["piece_id"]),
+		"x": int(x),
+		"y": int(y),
+		"width": int(w),
+		"height": int(h),
+		"scale": float(entry.get("scale", 1.0)),
+		"similarity": float(entry.get("similarity", 0.0)),
+		"angle": float(entry.get("angle", 0.0)),
+		"elapsed_s": float(entry.get("elapsed_s", 0.0)),
+		"duplicate_of": int(entry.get("duplicate_of") or 0),
+		"path": entry.get("path") or "",
+	}
+
+
+class ResultWriter:
+	"""Append-only session writer; the format follows the file extension.
+
+	Usage::
+
+		with ResultWriter("session.jsonl", puzzle_path=path, puzzle_size=img.size) as out:
+			for entry in results:
+				out.write(entry)
+	"""
+
+	def __init__(self, path: str, puzzle_path: str | None = None, puzzle_size: tuple[int, int] | None = None):
+		self.path = path
+		self.count = 0
+		self.header = {
+			"type": "session",
+			"version": SESSION_VERSION,
+			"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+			"puzzle_path": puzzle_path,
+			"puzzle_size": list(puzzle_size) if puzzle_size else None,
+		}
+		self._npz = path.lower().endswith(".npz")
+		if self._npz:
+			self._part_path = path + ".part"
+			self._file = open(self._part_path, "wb")
+			self._paths: list[str] = []
+		else:
+			self._file = open(path, "w", encoding="utf-8")
+			self._file.write(json.dumps(self.header, ensure_ascii=False) + "\n")
+			self._file.flush()
+
+	def write(self, entry: dict) -> None:
+		"""Append one result entry (see ``result_record``)."""
+		record = result_record(entry)
+		if self._npz:
+			row = np.array([tuple(record[f] for f in RECORD_FIELDS)], dtype=_NPZ_DTYPE)
+			self._file.write(row.tobytes())
+			self._paths.append(record["path"])
+		else:
+			record["type"] = "result"
+			self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+			self._file.flush()
+		self.count += 1
+
+	def close(self) -> None:
+		if self._file.closed:
+			return
+		self._file.close()
+		if not self._npz:
+			return
+		# Rows are memory-mapped from the part file, not re-read into memory
+		if self.count:
+			rows = np.memmap(self._part_path, dtype=_NPZ_DTYPE, mode="r", shape=(self.count,))
+		else:
+			rows = np.zeros(0, dtype=_NPZ_DTYPE)
+		np.savez_compressed(
+			self.path,
+			records=rows,
+			paths=np.array(self._paths, dtype=str),
+			header=np.array(json.dumps(self.header, ensure_ascii=False)),
+		)
+		del rows
+		os.remove(self._part_path)
+
+	def __enter__(self) -> "ResultWriter":
+		return self
+
+	def __exit__(self, *exc) -> None:
+		self.close()
+
+
+class SessionRecords:
+	"""Read-only sequence over ``read_session`` columns.
+
+	Entries (``piece_id``, ``position``, ``size``, ``similarity``, ...) are
+	built only when accessed. The GUI overlay stores the same column arrays
+	(``OverlayLayer.add_columns`` does not copy), so a loaded session is held
+	once, as columns.
+	"""
+
+	def __init__(self, columns: dict):
+		self.columns = columns
+
+	def __len__(self) -> int:
+		return len(self.columns["piece_id"])
+
+	def __getitem__(self, i: int) -> dict:
+		c = self.columns
+		return {
+			"piece_id": int(c["piece_id"][i]),
+			"position": (int(c["x"][i]), int(c["y"][i])),
+			"size": (int(c["width"][i]), int(c["height"][i])),
+			"similarity": float(c["similarity"][i]),
+			"scale": float(c["scale"][i]),
+			"angle": float(c["angle"][i]),
+			"elapsed_s": float(c["elapsed_s"][i]),
+			"duplicate_of": int(c["duplicate_of"][i]) or None,
+			"path": str(c["path"][i]),
+		}
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self[i]
+
+
+def read_session(path: str) -> tuple[dict, dict]:
+	"""Load a session as ``(header, columns)``.
+
+	``columns`` maps every name in ``RECORD_FIELDS`` (plus ``path``) to a NumPy
+	array with one entry per record; ``SessionRecords`` reads them as entries.
+	"""
+	if path.lower().endswith(".npz"):
+		with np.load(path, allow_pickle=False) as data:
+			header = json.loads(str(data["header"]))
+			rows = data["records"]
+			# Version 1 archives have no duplicate_of column
+			columns = {
+				name: rows[name] if name in rows.dtype.names else np.zeros(len(rows), dtype=_NPZ_DTYPE[name])
+				for name in RECORD_FIELDS
+			}
+			columns["path"] = data["paths"]
+		return header, columns
+
+	header: dict = {}
+	values: dict[str, list] = {name: [] for name in RECORD_FIELDS + ("path",)}
+	with open(path, encoding="utf-8") as f:
+		for line in f:
+			if not line.strip():
+				continue
+			obj = json.loads(line)
+			if obj.get("type") == "session":
+				header = obj
+				continue
+			for name, column in values.items():
+				column.append(obj.get(name, "" if name == "path" else 0))
+	columns = {name: np.asarray(values[name], dtype=_NPZ_DTYPE[name]) for name in RECORD_FIELDS}
+	columns["path"] = np.asarray(values["path"], dtype=str)
+	return header, columns
+
+
+__all__ = ["ResultWriter", "read_session", "result_record", "SessionRecords", "RECORD_FIELDS"]
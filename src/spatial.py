@@ -0,0 +1,157 @@
+"""Uniform-grid spatial index over axis-aligned rectangles (pure numpy).
+
+Rectangles are hashed into square grid cells; each cell stores the indices of
+the rectangles touching it in one CSR-style array. Point and box queries only
+look at the cells they cover, so hit-testing and neighbour searches over
+thousands of matched pieces stay near-constant time per query.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+class RectIndex:
+	"""Grid hash over rectangles given as (x, y, w, h) arrays.
+
+	``cell_size`` defaults to the median of the larger rectangle side, so a
+	typical rectangle touches at most four cells.
+	"""
+
+	def __init__(self, x, y, w, h, cell_size: float | None = None):
+		self.x0 = np.asarray(x, dtype=np.float64).ravel()
+		self.y0 = np.asarray(y, dtype=np.float64).ravel()
+		self.x1 = self.x0 + np.asarray(w, dtype=np.float64).ravel()
+		self.y1 = self.y0 + np.asarray(h, dtype=np.float64).ravel()
+		n = len(self.x0)
+		if cell_size is None:
+			sides = np.maximum(self.x1 - self.x0, self.y1 - self.y0)
+			cell_size = float(np.median(sides)) if n else 1.0
+		self.cell = max(float(cell_size), 1.0)
+		if n == 0:
+			self.origin = (0.0, 0.0)
+			self.grid_w = self.grid_h = 1
+			self._starts = np.zeros(2, dtype=np.int64)
+			self._items = np.zeros(0, dtype=np.int64)
+			return
+
+		self.origin = (float(self.x0.min()), float(self.y0.min()))
+		cx0, cy0 = self._cell_of(self.x0, self.y0)
+		cx1, cy1 = self._cell_of(np.maximum(self.x1 - 1e-9, self.x0), np.maximum(self.y1 - 1e-9, self.y0))
+		self.grid_w = int(cx1.max()) + 1
+		self.grid_h = int(cy1.max()) + 1
+
+		# Expand every rectangle into the cells it covers, then sort by cell
+		span_x = cx1 - cx0 + 1
+		counts = span_x * (cy1 - cy0 + 1)
+		rect = np.repeat(np.arange(n), counts)
+		local = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+		cells = (cy0[rect] + local // span_x[rect]) * self.grid_w + (cx0[rect] + local % span_x[rect])
+		order = np.argsort(cells, kind="stable")
+		self._items = rect[order]
+		self._starts = np.searchsorted(cells[order], np.arange(self.grid_w * self.grid_h + 1))
+
+	def __len__(self) -> int:
+		return len(self.x0)
+
+	def _cell_of(self, x, y) -> tuple[np.ndarray, np.ndarray]:
+		cx = np.floor((np.asarray(x) - self.origin[0]) / self.cell).astype(np.int64)
+		cy = np.floor((np.asarray(y) - self.origin[1]) / self.cell).astype(np.int64)
+		return cx, cy
+
+	def _candidates(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+		if not len(self):
+			return np.zeros(0, dtype=np.int64)
+		cx0, cy0 = self._cell_of(x0, y0)
+		cx1, cy1 = self._cell_of(x1, y1)
+		cx0, cx1 = max(int(cx0), 0), min(int(cx1), self.grid_w - 1)
+		cy0, cy1 = max(int(cy0), 0), min(int(cy1), self.grid_h - 1)
+		if cx0 > cx1 or cy0 > cy1:
+			return np.zeros(0, dtype=np.int64)
+		chunks = []
+		for cy in range(cy0, cy1 + 1):
+			row = cy * self.grid_w
+			chunks.append(self._items[self._starts[row + cx0]:self._starts[row + cx1 + 1]])
+		return np.unique(np.concatenate(chunks))
+
+	def query_box(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+		"""Indices of rectangles intersecting the box (x0, y0)-(x1, y1)."""
+		idx = self._candidates(x0, y0, x1, y1)
+		keep = (self.x0[idx] < x1) & (self.x1[idx] > x0) & (self.y0[idx] < y1) & (self.y1[idx] > y0)
+		return idx[keep]
+
+	def query_point(self, x: float, y: float) -> np.ndarray:
+		"""Indices of rectangles containing point (x, y), smallest area first."""
+		idx = self._candidates(x, y, x, y)
+		keep = (self.x0[idx] <= x) & (self.x1[idx] > x) & (self.y0[idx] <= y) & (self.y1[idx] > y)
+		idx = idx[keep]
+		area = (self.x1[idx] - self.x0[idx]) * (self.y1[idx] - self.y0[idx])
+		return idx[np.argsort(area, kind="stable")]
+
+	def candidate_pairs(self) -> tuple[np.ndarray, np.ndarray]:
+		"""All pairs (i < j) of intersecting rectangles, each reported once.
+
+		Pairs are generated per cell and kept only in the cell holding the
+		top-left corner of their intersection, so no deduplication pass is
+		needed. Cost is linear in the number of (rectangle, cell) entries plus
+		the number of co-located pairs.
+		"""
+		counts = np.diff(self._starts)
+		total = len(self._items)
+		if total < 2:
+			empty = np.zeros(0, dtype=np.int64)
+			return empty, empty
+		cell = np.repeat(np.arange(len(counts)), counts)
+		local = np.arange(total) - self._starts[cell]
+		reps = counts[cell] - 1 - local
+		first = np.repeat(np.arange(total), reps)
+		second = first + 1 + (np.arange(int(reps.sum())) - np.repeat(np.cumsum(reps) - reps, reps))
+		a, b = self._items[first], self._items[second]
+		ix0 = np.maximum(self.x0[a], self.x0[b])
+		iy0 = np.maximum(self.y0[a], self.y0[b])
+		hit = (ix0 < np.minimum(self.x1[a], self.x1[b])) & (iy0 < np.minimum(self.y1[a], self.y1[b]))
+		cx, cy = self._cell_of(ix0, iy0)
+		keep = hit & (cy * self.grid_w + cx == cell[first])
+		a, b = a[keep], b[keep]
+		return np.minimum(a, b), np.maximum(a, b)
+
+
+def overlap_pairs(x, y, w, h, threshold: float = 0.3, index: RectIndex | None = None):
+	"""Pairs of rectangles whose intersection covers more than ``threshold``
+	of the smaller one.
+
+	Returns ``(i, j, ratio)`` arrays with ``i < j``.
+	"""
+	index = index if index is not None else RectIndex(x, y, w, h)
+	i, j = index.candidate_pairs()
+	inter_w = np.minimum(index.x1[i], index.x1[j]) - np.maximum(index.x0[i], index.x0[j])
+	inter_h = np.minimum(index.y1[i], index.y1[j]) - np.maximum(index.y0[i], index.y0[j])
+	area = (index.x1 - index.x0) * (index.y1 - index.y0)
+	min_area = np.minimum(area[i], area[j])
+	ratio = np.divide(inter_w * inter_h, min_area, out=np.zeros(len(i)), where=min_area > 0)
+	keep = ratio > threshold
+	order = np.lexsort((j[keep], i[keep]))
+	return i[keep][order], j[keep][order], ratio[keep][order]
+
+
+def conflict_components(n: int, i, j) -> list[np.ndarray]:
+	"""Connected components (size > 1) of the graph on ``n`` nodes with edges (i, j)."""
+	parent = np.arange(n)
+
+	def find(k):
+		while parent[k] != k:
+			parent[k] = parent[parent[k]]
+			k = parent[k]
+		return k
+
+	for a, b in zip(i.tolist(), j.tolist()):
+		ra, rb = find(a), find(b)
+		if ra != rb:
+			parent[max(ra, rb)] = min(ra, rb)
+	roots = np.array([find(k) for k in range(n)]) if n else np.zeros(0, dtype=np.int64)
+	order = np.argsort(roots, kind="stable")
+	groups = np.split(order, np.flatnonzero(np.diff(roots[order])) + 1) if n else []
+	return [g for g in groups if len(g) > 1]
+
+
+__all__ = ["RectIndex", "overlap_pairs", "conflict_components"]
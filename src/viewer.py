@@ -0,0 +1,618 @@
+"""Zoomable / pannable puzzle viewer for the Tk GUI.
+
+``DisplayPyramid`` keeps the puzzle at 1, 1/2, 1/4, ... resolution (levels are
+built once, on first use) and renders only the visible viewport from the
+level closest to the current zoom, so a redraw costs roughly the number of
+screen pixels, whatever the image size. ``PuzzleViewer`` wires a pyramid to a
+``tk.Canvas`` with mouse-wheel zoom, drag-to-pan and image-coordinate
+transforms for overlays. ``OverlayLayer`` rasterises all match annotations
+into a single image (cached per pyramid level, labels only when legible)
+and hit-tests clicks through a grid spatial index. ``ThumbnailCache``
+produces display-size piece thumbnails on demand under a memory budget and
+prefetches in background.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageTk
+from .spatial import RectIndex
+
+
+class DisplayPyramid:
+    """Power-of-two resolution pyramid of an image for fast viewport rendering."""
+
+    def __init__(self, img: Image.Image, min_size: int = 256):
+        base = img if img.mode in ("RGB", "RGBA") else img.convert("RGB")
+        self.size = base.size
+        self.levels = [base]
+        longest = max(self.size)
+        self.max_level = max(0, int(math.log2(max(longest / min_size, 1.0))))
+
+    def level(self, k: int) -> Image.Image:
+        """Level ``k`` (1/2**k resolution), reduced from the previous level once."""
+        k = min(max(k, 0), self.max_level)
+        while len(self.levels) <= k:
+            self.levels.append(self.levels[-1].reduce(2))
+        return self.levels[k]
+
+    def level_for_zoom(self, zoom: float) -> int:
+        """Coarsest level that is still at least as detailed as ``zoom``."""
+        if zoom >= 1.0:
+            return 0
+        return min(self.max_level, int(math.floor(math.log2(1.0 / zoom))))
+
+    def render(self, box: tuple[float, float, float, float], out_size: tuple[int, int],
+               resample=Image.Resampling.BILINEAR) -> tuple[Image.Image | None, tuple[int, int]]:
+        """Render image region ``box`` (x0, y0, x1, y1, image coords) into ``out_size``.
+
+        Parts of ``box`` outside the image are not drawn. Returns the rendered
+        image (or None if nothing is visible) and its offset in the output.
+        """
+        x0, y0, x1, y1 = box
+        out_w, out_h = out_size
+        if x1 <= x0 or y1 <= y0 or out_w <= 0 or out_h <= 0:
+            return None, (0, 0)
+        zoom = out_w / (x1 - x0)
+        w, h = self.size
+        # Clamp to the image and compute where the clamped part lands
+        cx0, cy0 = max(0.0, x0), max(0.0, y0)
+        cx1, cy1 = min(float(w), x1), min(float(h), y1)
+        if cx1 <= cx0 or cy1 <= cy0:
+            return None, (0, 0)
+        dx0 = int(round((cx0 - x0) * zoom))
+        dy0 = int(round((cy0 - y0) * zoom))
+        dw = max(1, int(round((cx1 - cx0) * zoom)))
+        dh = max(1, int(round((cy1 - cy0) * zoom)))
+
+        lvl = self.level(self.level_for_zoom(zoom))
+        fx = lvl.size[0] / w
+        fy = lvl.size[1] / h
+        src = (cx0 * fx, cy0 * fy, min(cx1 * fx, lvl.size[0]), min(cy1 * fy, lvl.size[1]))
+        return lvl.resize((dw, dh), resample, box=src), (dx0, dy0)
+
+
+class _ChunkedColumns:
+    """Append-only numeric columns stored as a list of chunks.
+
+    Appends with ``share=True`` (and any of at least ``CHUNK_ROWS`` rows) are
+    kept as their own chunk without copying, so the arrays stay shared with
+    their owner (e.g. ``results_io.SessionRecords``). Smaller appends fill a
+    fixed-size tail chunk; a full tail is closed and a new one started, so
+    nothing already stored is ever copied again.
+    """
+
+    CHUNK_ROWS = 4096
+
+    def __init__(self, dtypes: dict):
+        self.dtypes = dtypes
+        self.chunks: list[dict] = []
+        self.starts: list[int] = []
+        self.lengths: list[int] = []
+        self._tail_open = False
+
+    def __len__(self) -> int:
+        return self.starts[-1] + self.lengths[-1] if self.chunks else 0
+
+    def append(self, columns: dict, share: bool = False) -> None:
+        rows = len(next(iter(columns.values())))
+        if not rows:
+            return
+        if share or rows >= self.CHUNK_ROWS:
+            self._tail_open = False
+            self._new_chunk({name: np.asarray(columns[name]) for name in self.dtypes}, rows)
+            return
+        done = 0
+        while done < rows:
+            if not self._tail_open or self.lengths[-1] == self.CHUNK_ROWS:
+                self._new_chunk({name: np.empty(self.CHUNK_ROWS, dtype) for name, dtype in self.dtypes.items()}, 0)
+                self._tail_open = True
+            filled = self.lengths[-1]
+            take = min(rows - done, self.CHUNK_ROWS - filled)
+            for name, arr in self.chunks[-1].items():
+                arr[filled:filled + take] = np.asarray(columns[name])[done:done + take]
+            self.lengths[-1] += take
+            done += take
+
+    def _new_chunk(self, arrays: dict, rows: int) -> None:
+        self.starts.append(len(self))
+        self.chunks.append(arrays)
+        self.lengths.append(rows)
+
+    def take(self, name: str, idx) -> np.ndarray:
+        """Values of column ``name`` at global row indices ``idx``."""
+        idx = np.asarray(idx, dtype=np.int64)
+        if len(self.chunks) == 1:
+            return self.chunks[0][name][idx]
+        which = np.searchsorted(self.starts, idx, side="right") - 1
+        out = np.empty(len(idx), dtype=np.result_type(*(c[name].dtype for c in self.chunks)))
+        for c in np.unique(which):
+            sel = which == c
+            out[sel] = self.chunks[c][name][idx[sel] - self.starts[c]]
+        return out
+
+    def column(self, name: str) -> np.ndarray:
+        """The whole column as one array (a copy unless there is a single chunk)."""
+        parts = [c[name][:n] for c, n in zip(self.chunks, self.lengths)]
+        if not parts:
+            return np.zeros(0, dtype=self.dtypes[name])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+class OverlayLayer:
+    """Rasterised annotations for matched pieces, in image coordinates.
+
+    Rectangles are drawn once into an RGBA image per pyramid level (when that
+    level is small enough to cache) and new results are drawn incrementally
+    into the cached levels. At deeper zoom only the visible rectangles are
+    drawn. Labels (id + similarity) are drawn per frame, and only for pieces
+    at least ``LABEL_MIN_PX`` wide on screen, so a frame never draws more
+    labels than fit legibly in the viewport. Geometry, ids, similarities and
+    colour codes are kept as NumPy columns; label text is formatted only for
+    the rows drawn. Hit-testing and culling use a grid index over all rows
+    plus a small side index over the rows added since; the side index is
+    merged into a full rebuild only once it outgrows ``SIDE_INDEX_MIN`` rows
+    and 1/``SIDE_INDEX_FRACTION`` of the indexed ones.
+    """
+
+    LABEL_MIN_PX = 40
+    MAX_CACHED_PIXELS = 4_000_000
+    LINE_WIDTH = 3
+    SIDE_INDEX_MIN = 1024
+    SIDE_INDEX_FRACTION = 16
+    DEFAULT_COLOR = "#0066FF"
+    _DTYPES = {"x": np.int32, "y": np.int32, "w": np.int32, "h": np.int32,
+               "piece_id": np.int32, "similarity": np.float32, "color": np.uint8}
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self._rows = _ChunkedColumns(self._DTYPES)
+        self._palette: list[tuple] = []  # colour code -> RGB
+        self._index: RectIndex | None = None  # rows [0, _indexed)
+        self._indexed = 0
+        self._recent: RectIndex | None = None  # rows [_indexed, len(self))
+        self._levels: dict = {}  # level -> (scale_x, scale_y, RGBA image)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def column(self, name: str) -> np.ndarray:
+        """One column (``x``, ``y``, ``w``, ``h``, ``piece_id``, ``similarity``) for every row."""
+        return self._rows.column(name)
+
+    def label(self, i: int) -> tuple[str, str]:
+        """Label and caption text of row ``i``."""
+        return (str(int(self._rows.take("piece_id", [i])[0])),
+                f"({float(self._rows.take('similarity', [i])[0]):.0%})")
+
+    def color(self, i: int) -> tuple:
+        return self._palette[int(self._rows.take("color", [i])[0])]
+
+    def _color_codes(self, colors, rows: int) -> np.ndarray:
+        if colors is None or isinstance(colors, str):
+            colors = np.full(rows, colors or self.DEFAULT_COLOR)
+        names, codes = np.unique(np.asarray(colors), return_inverse=True)
+        lookup = []
+        for name in names.tolist():
+            rgb = ImageColor.getrgb(name)[:3]
+            if rgb not in self._palette:
+                self._palette.append(rgb)
+            lookup.append(self._palette.index(rgb))
+        return np.asarray(lookup, dtype=np.uint8)[codes.ravel()]
+
+    def add(self, results) -> None:
+        """Append result dicts (``position``, ``size``, ``piece_id``, ``similarity``, ``color``)."""
+        results = list(results)
+        if not results:
+            return
+        self._append(
+            [r['position'][0] for r in results], [r['position'][1] for r in results],
+            [r['size'][0] for r in results], [r['size'][1] for r in results],
+            [r['piece_id'] for r in results], [r.get('similarity', 0.0) for r in results],
+            [r.get('color', self.DEFAULT_COLOR) for r in results], share=False,
+        )
+
+    def add_columns(self, x, y, w, h, piece_ids, similarity, colors=None) -> None:
+        """Append results given as columns (e.g. ``results_io.read_session``).
+
+        The arrays are stored as given, not copied, so a loaded session shares
+        them with ``SessionRecords``. ``colors`` is one colour per row or a
+        single colour for all rows.
+        """
+        self._append(x, y, w, h, piece_ids, similarity, colors, share=True)
+
+    def _append(self, x, y, w, h, piece_ids, similarity, colors, share) -> None:
+        start = len(self)
+        self._rows.append({
+            "x": x, "y": y, "w": w, "h": h, "piece_id": piece_ids, "similarity": similarity,
+            "color": self._color_codes(colors, len(x)),
+        }, share=share)
+        self._added(start)
+
+    def _added(self, start: int) -> None:
+        # New rectangles are drawn into the cached levels incrementally; the
+        # side index picks them up on the next query
+        self._recent = None
+        for sx, sy, layer in self._levels.values():
+            self._draw_all(ImageDraw.Draw(layer), start, sx, sy, max(1, self.LINE_WIDTH - 1))
+
+    def _indices(self) -> list[tuple[RectIndex, int]]:
+        """(index, row offset) pairs covering every row."""
+        n = len(self)
+        pending = n - self._indexed
+        if self._index is None or pending > max(self.SIDE_INDEX_MIN, self._indexed // self.SIDE_INDEX_FRACTION):
+            self._index = RectIndex(self.column("x"), self.column("y"), self.column("w"), self.column("h"))
+            self._indexed = n
+            self._recent = None
+        elif pending and self._recent is None:
+            rows = np.arange(self._indexed, n)
+            take = self._rows.take
+            self._recent = RectIndex(take("x", rows), take("y", rows), take("w", rows), take("h", rows))
+        if self._recent is None:
+            return [(self._index, 0)]
+        return [(self._index, 0), (self._recent, self._indexed)]
+
+    def query_box(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Rows whose rectangle intersects the image box (x0, y0)-(x1, y1)."""
+        hits = [index.query_box(x0, y0, x1, y1) + offset for index, offset in self._indices()]
+        return hits[0] if len(hits) == 1 else np.concatenate(hits)
+
+    def hit_test(self, x: float, y: float) -> int | None:
+        """Index of the (smallest) annotation containing image point (x, y)."""
+        if not len(self):
+            return None
+        hits = np.concatenate([index.query_point(x, y) + offset for index, offset in self._indices()])
+        if not len(hits):
+            return None
+        area = self._rows.take("w", hits).astype(np.float64) * self._rows.take("h", hits)
+        return int(hits[np.argsort(area, kind="stable")[0]])
+
+    def _draw_rects(self, draw, indices, sx, sy, ox, oy, width) -> None:
+        take = self._rows.take
+        x0s = (take("x", indices) - ox) * sx
+        y0s = (take("y", indices) - oy) * sy
+        x1s = x0s + take("w", indices) * sx
+        y1s = y0s + take("h", indices) * sy
+        for x0, y0, x1, y1, code in zip(x0s.tolist(), y0s.tolist(), x1s.tolist(), y1s.tolist(),
+                                        take("color", indices).tolist()):
+            draw.rectangle([x0, y0, x1, y1], outline=self._palette[code] + (255,), width=width)
+
+    def _draw_all(self, draw, start, sx, sy, width) -> None:
+        # Block by block, so a full redraw never gathers every row at once
+        step = _ChunkedColumns.CHUNK_ROWS
+        for block in range(start, len(self), step):
+            self._draw_rects(draw, np.arange(block, min(block + step, len(self))), sx, sy, 0.0, 0.0, width)
+
+    def _level_layer(self, pyramid: DisplayPyramid, k: int):
+        if k not in self._levels:
+            lw, lh = pyramid.level(k).size
+            sx, sy = lw / pyramid.size[0], lh / pyramid.size[1]
+            layer = Image.new("RGBA", (lw, lh), (0, 0, 0, 0))
+            self._draw_all(ImageDraw.Draw(layer), 0, sx, sy, max(1, self.LINE_WIDTH - 1))
+            self._levels[k] = (sx, sy, layer)
+        return self._levels[k]
+
+    def render(self, pyramid: DisplayPyramid, box: tuple[float, float, float, float],
+               out_size: tuple[int, int]) -> Image.Image | None:
+        """Transparent RGBA image of ``out_size`` with the annotations in ``box``."""
+        if not len(self):
+            return None
+        x0, y0, x1, y1 = box
+        zoom = out_size[0] / (x1 - x0)
+        visible = self.query_box(x0, y0, x1, y1)
+        if not len(visible):
+            return None
+
+        k = pyramid.level_for_zoom(zoom)
+        lw, lh = pyramid.level(k).size
+        if lw * lh <= self.MAX_CACHED_PIXELS:
+            sx, sy, layer = self._level_layer(pyramid, k)
+            out = Image.new("RGBA", out_size, (0, 0, 0, 0))
+            w, h = pyramid.size
+            cx0, cy0 = max(0.0, x0), max(0.0, y0)
+            cx1, cy1 = min(float(w), x1), min(float(h), y1)
+            if cx1 > cx0 and cy1 > cy0:
+                part = layer.resize(
+                    (max(1, int(round((cx1 - cx0) * zoom))), max(1, int(round((cy1 - cy0) * zoom)))),
+                    Image.Resampling.BILINEAR,
+                    box=(cx0 * sx, cy0 * sy, cx1 * sx, cy1 * sy),
+                )
+                out.paste(part, (int(round((cx0 - x0) * zoom)), int(round((cy0 - y0) * zoom))))
+        else:
+            # Deep zoom: draw just the visible rectangles at screen resolution
+            out = Image.new("RGBA", out_size, (0, 0, 0, 0))
+            self._draw_rects(ImageDraw.Draw(out), visible, zoom, zoom, x0, y0, self.LINE_WIDTH)
+
+        # Level of detail: label only pieces that are legible at this zoom
+        widths = self._rows.take("w", visible) * zoom
+        legible = widths >= self.LABEL_MIN_PX
+        if legible.any():
+            draw = ImageDraw.Draw(out)
+            font = ImageFont.load_default()
+            rows = visible[legible]
+            take = self._rows.take
+            for px, py, pid, sim, code, width in zip(
+                    take("x", rows).tolist(), take("y", rows).tolist(), take("piece_id", rows).tolist(),
+                    take("similarity", rows).tolist(), take("color", rows).tolist(), widths[legible].tolist()):
+                color = self._palette[code] + (255,)
+                label = str(pid)
+                tx = (px - x0) * zoom + 5
+                ty = (py - y0) * zoom + 5
+                tb = draw.textbbox((tx, ty), label, font=font)
+                draw.rectangle([tb[0] - 3, tb[1] - 3, tb[2] + 3, tb[3] + 3],
+                               fill=(255, 255, 255, 230), outline=color, width=2)
+                draw.text((tx, ty), label, fill=color, font=font)
+                if width >= 2 * self.LABEL_MIN_PX:
+                    draw.text((tx, tb[3] + 6), f"({sim:.0%})", fill=color, font=font)
+        return out
+
+
+class PuzzleViewer:
+    """Canvas controller: wheel zooms around the cursor, left-drag pans,
+    double-click fits the image to the window.
+
+    View state is ``zoom`` (screen px per image px) and ``origin`` (image
+    coordinates of the canvas top-left). ``overlay`` (an ``OverlayLayer``) is
+    drawn as one extra canvas image on top. ``on_click(x, y)`` receives image
+    coordinates of clicks that were not drags; ``on_view_changed(viewer)`` is
+    called after every redraw.
+    """
+
+    MAX_ZOOM = 8.0
+    ZOOM_STEP = 1.2
+
+    CLICK_SLOP_PX = 3
+
+    def __init__(self, canvas: tk.Canvas, on_view_changed=None, on_click=None, frame_budget_ms: float = 33.0):
+        self.canvas = canvas
+        self.on_view_changed = on_view_changed
+        self.on_click = on_click
+        self.overlay: OverlayLayer | None = None
+        self.frame_budget_ms = frame_budget_ms
+        self.pyramid: DisplayPyramid | None = None
+        self.zoom = 1.0
+        self.origin = (0.0, 0.0)
+        self.last_render_ms = 0.0
+        self._fit_mode = True
+        self._tk_img = None
+        self._tk_overlay = None
+        self._redraw_pending = None
+        self._settle_pending = None
+        self._drag_start = None
+        self._press_pos = None
+        canvas.bind("<Configure>", self._on_configure)
+        canvas.bind("<MouseWheel>", self._on_wheel)
+        canvas.bind("<Button-4>", lambda e: self.zoom_at(self.ZOOM_STEP, e.x, e.y))
+        canvas.bind("<Button-5>", lambda e: self.zoom_at(1 / self.ZOOM_STEP, e.x, e.y))
+        canvas.bind("<ButtonPress-1>", self._on_press, add="+")
+        canvas.bind("<B1-Motion>", self._on_drag, add="+")
+        canvas.bind("<ButtonRelease-1>", self._on_release, add="+")
+        canvas.bind("<Double-Button-1>", lambda _e: self.fit())
+
+    # --- coordinates -------------------------------------------------
+    def image_to_canvas(self, x: float, y: float) -> tuple[float, float]:
+        return (x - self.origin[0]) * self.zoom, (y - self.origin[1]) * self.zoom
+
+    def canvas_to_image(self, x: float, y: float) -> tuple[float, float]:
+        return self.origin[0] + x / self.zoom, self.origin[1] + y / self.zoom
+
+    def viewport_size(self) -> tuple[int, int]:
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if w < 50 or h < 50:
+            w, h = 600, 400
+        return w, h
+
+    def visible_box(self) -> tuple[float, float, float, float]:
+        """Visible region in image coordinates (x0, y0, x1, y1)."""
+        w, h = self.viewport_size()
+        x0, y0 = self.origin
+        return x0, y0, x0 + w / self.zoom, y0 + h / self.zoom
+
+    # --- view changes ------------------------------------------------
+    def set_image(self, img: Image.Image | None) -> None:
+        self.pyramid = DisplayPyramid(img) if img is not None else None
+        self.fit()
+
+    def fit(self) -> None:
+        """Fit the whole image in the canvas (never upscaling) and centre it."""
+        self._fit_mode = True
+        if self.pyramid is None:
+            self.request_redraw()
+            return
+        cw, ch = self.viewport_size()
+        w, h = self.pyramid.size
+        self.zoom = min(cw / w, ch / h, 1.0)
+        self.origin = ((w - cw / self.zoom) / 2, (h - ch / self.zoom) / 2)
+        self.request_redraw()
+
+    def zoom_at(self, factor: float, cx: float, cy: float) -> None:
+        """Zoom by ``factor`` keeping the image point under (cx, cy) fixed."""
+        if self.pyramid is None:
+            return
+        cw, ch = self.viewport_size()
+        w, h = self.pyramid.size
+        min_zoom = min(cw / w, ch / h, 1.0) / 2
+        new_zoom = min(max(self.zoom * factor, min_zoom), self.MAX_ZOOM)
+        ix, iy = self.canvas_to_image(cx, cy)
+        self.zoom = new_zoom
+        self.origin = (ix - cx / new_zoom, iy - cy / new_zoom)
+        self._fit_mode = False
+        self.request_redraw(interactive=True)
+
+    def pan_by(self, dx: float, dy: float) -> None:
+        """Move the view by (dx, dy) canvas pixels."""
+        self.origin = (self.origin[0] - dx / self.zoom, self.origin[1] - dy / self.zoom)
+        self._fit_mode = False
+        self.request_redraw(interactive=True)
+
+    # --- rendering ---------------------------------------------------
+    def request_redraw(self, interactive: bool = False) -> None:
+        """Coalesce redraw requests into one render on the next idle cycle."""
+        if self._redraw_pending is None:
+            self._redraw_pending = self.canvas.after_idle(lambda: self._redraw(interactive))
+        if interactive:
+            # Re-render once at full quality after the interaction settles
+            if self._settle_pending is not None:
+                self.canvas.after_cancel(self._settle_pending)
+            self._settle_pending = self.canvas.after(150, self._settle)
+
+    def _settle(self) -> None:
+        self._settle_pending = None
+        self._redraw(interactive=False)
+
+    def _redraw(self, interactive: bool = False) -> None:
+        self._redraw_pending = None
+        self.canvas.delete("image")
+        if self.pyramid is not None:
+            start = time.perf_counter()
+            # While zooming/panning, drop to nearest-neighbour if the last
+            # frame blew the budget; the settle pass restores quality.
+            resample = Image.Resampling.BILINEAR
+            if interactive and self.last_render_ms > self.frame_budget_ms:
+                resample = Image.Resampling.NEAREST
+            rendered, offset = self.pyramid.render(self.visible_box(), self.viewport_size(), resample)
+            if rendered is not None:
+                self._tk_img = ImageTk.PhotoImage(rendered)
+                self.canvas.create_image(offset[0], offset[1], anchor="nw", image=self._tk_img, tags="image")
+                self.canvas.tag_lower("image")
+            self._tk_overlay = None
+            if self.overlay is not None:
+                layer = self.overlay.render(self.pyramid, self.visible_box(), self.viewport_size())
+                if layer is not None:
+                    self._tk_overlay = ImageTk.PhotoImage(layer)
+                    self.canvas.create_image(0, 0, anchor="nw", image=self._tk_overlay, tags="image")
+            self.last_render_ms = (time.perf_counter() - start) * 1000.0
+        if self.on_view_changed is not None:
+            self.on_view_changed(self)
+
+    # --- events ------------------------------------------------------
+    def _on_configure(self, _event) -> None:
+        if self._fit_mode:
+            self.fit()
+        else:
+            self.request_redraw()
+
+    def _on_wheel(self, event) -> None:
+        factor = self.ZOOM_STEP if event.delta > 0 else 1 / self.ZOOM_STEP
+        self.zoom_at(factor, event.x, event.y)
+
+    def _on_press(self, event) -> None:
+        self._drag_start = (event.x, event.y)
+        self._press_pos = (event.x, event.y)
+
+    def _on_release(self, event) -> None:
+        press, self._press_pos = self._press_pos, None
+        if press is None or self.on_click is None or self.pyramid is None:
+            return
+        if abs(event.x - press[0]) <= self.CLICK_SLOP_PX and abs(event.y - press[1]) <= self.CLICK_SLOP_PX:
+            self.on_click(*self.canvas_to_image(event.x, event.y))
+
+    def _on_drag(self, event) -> None:
+        if self._drag_start is None:
+            return
+        dx = event.x - self._drag_start[0]
+        dy = event.y - self._drag_start[1]
+        self._drag_start = (event.x, event.y)
+        self.pan_by(dx, dy)
+
+
+class ThumbnailCache:
+    """LRU cache of display-size piece thumbnails under a memory budget.
+
+    Thumbnails are decoded at reduced resolution straight from the file (see
+    ``acquisition.open_image``), optionally stamped with a label, and evicted
+    least-recently-used once their pixel bytes exceed ``budget_bytes``.
+    ``prefetch`` builds upcoming thumbnails on a small background pool;
+    ``get`` waits for an in-flight prefetch instead of decoding twice.
+    """
+
+    def __init__(self, budget_bytes: int = 64 * 1024 * 1024, workers: int = 2):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._items: OrderedDict = OrderedDict()
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+
+    @staticmethod
+    def _nbytes(img: Image.Image) -> int:
+        return img.size[0] * img.size[1] * len(img.getbands())
+
+    @staticmethod
+    def _make(path: str, size: tuple[int, int], label: str | None) -> Image.Image:
+        from .acquisition import open_image
+
+        img = open_image(path, max_size=max(size))
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+        if label:
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+            draw = ImageDraw.Draw(img)
+            font_size = max(12, img.size[1] // 8)
+            try:
+                font = ImageFont.truetype("arial.ttf", font_size)
+            except Exception:
+                font = ImageFont.load_default()
+            x0, y0, x1, y1 = draw.textbbox((4, 2), label, font=font)
+            draw.rectangle([0, 0, x1 + 4, y1 + 4], fill=(255, 255, 255, 200))
+            draw.text((4, 2), label, fill=(0, 0, 0), font=font)
+        return img
+
+    def _store(self, key, img: Image.Image) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            if key in self._items:
+                return
+            self._items[key] = img
+            self.used_bytes += self._nbytes(img)
+            while self.used_bytes > self.budget_bytes and len(self._items) > 1:
+                _old_key, old = self._items.popitem(last=False)
+                self.used_bytes -= self._nbytes(old)
+
+    def _build(self, key) -> Image.Image:
+        try:
+            img = self._make(*key)
+        except Exception:
+            with self._lock:
+                self._pending.pop(key, None)
+            raise
+        self._store(key, img)
+        return img
+
+    def get(self, path: str, size: tuple[int, int], label: str | None = None) -> Image.Image:
+        """Thumbnail of ``path`` fitting ``size`` (built now if not cached)."""
+        key = (path, tuple(size), label)
+        with self._lock:
+            img = self._items.get(key)
+            if img is not None:
+                self._items.move_to_end(key)
+                return img
+            future = self._pending.get(key)
+        if future is not None:
+            return future.result()
+        return self._build(key)
+
+    def prefetch(self, items, size: tuple[int, int]) -> None:
+        """Queue (path, label) pairs for background thumbnail generation."""
+        for path, label in items:
+            key = (path, tuple(size), label)
+            with self._lock:
+                if key in self._items or key in self._pending:
+                    continue
+                self._pending[key] = self._pool.submit(self._build, key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.used_bytes = 0
+
+
+__all__ = ["DisplayPyramid", "OverlayLayer", "PuzzleViewer", "ThumbnailCache"]
@@ -0,0 +1,192 @@
+"""Offline visual output: score-map heatmaps and annotated full-resolution exports.
+
+Score maps (``multi_scale_template_match(..., keep_score_map=True)``) are
+coarse-resolution arrays (float16 for normalised methods, float32 for raw
+``SQDIFF``). They are coloured through a lookup table and can be blended
+over the puzzle. Heatmap overlays and annotated composites are rendered per
+tile: all result rectangles are culled against the tile in one numpy step
+and only the visible ones are drawn. Large outputs are written as PNG tiles,
+one tile in memory at a time.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+
+# Anchor colours of the heatmap gradient (dark blue -> yellow), best = bright
+_HEATMAP_ANCHORS = np.array([
+	(13, 8, 135),
+	(126, 3, 168),
+	(204, 71, 120),
+	(248, 149, 64),
+	(240, 249, 33),
+], dtype=np.float64)
+_UNSEARCHED_RGB = (64, 64, 64)
+
+
+def _heatmap_lut() -> np.ndarray:
+	positions = np.linspace(0, 255, len(_HEATMAP_ANCHORS))
+	levels = np.arange(256)
+	return np.stack(
+		[np.interp(levels, positions, _HEATMAP_ANCHORS[:, c]) for c in range(3)], axis=1
+	).astype(np.uint8)
+
+
+_LUT = _heatmap_lut()
+
+
+def save_score_map(path: str, score_map: np.ndarray) -> None:
+	"""Store a score map as ``.npy``: float16 (half the memory and disk of
+	float32) when its finite values fit, float32 otherwise."""
+	scores = np.asarray(score_map)
+	finite = scores[np.isfinite(scores)]
+	fits_half = finite.size == 0 or float(np.abs(finite).max()) <= float(np.finfo(np.float16).max)
+	np.save(path, scores.astype(np.float16 if fits_half else np.float32, copy=False))
+
+
+def load_score_map(path: str) -> np.ndarray:
+	"""Memory-mapped score map saved with ``save_score_map``."""
+	return np.load(path, mmap_mode="r")
+
+
+def score_heatmap(score_map: np.ndarray, lower_is_better: bool = True, size: tuple[int, int] | None = None) -> Image.Image:
+	"""Colour a score map (best scores brightest); unsearched (NaN) cells are grey.
+
+	Values are normalised between the map's 1st and 99th percentile so a few
+	outliers do not wash out the contrast. ``size`` resizes the result (w, h).
+	"""
+	scores = np.asarray(score_map, dtype=np.float32)
+	valid = np.isfinite(scores)
+	rgb = np.empty(scores.shape + (3,), dtype=np.uint8)
+	rgb[...] = _UNSEARCHED_RGB
+	if valid.any():
+		lo, hi = np.percentile(scores[valid], (1, 99))
+		norm = np.clip((scores - lo) / max(hi - lo, 1e-12), 0.0, 1.0)
+		if lower_is_better:
+			norm = 1.0 - norm
+		levels = np.nan_to_num(norm * 255.0).astype(np.uint8)
+		rgb[valid] = _LUT[levels[valid]]
+	img = Image.fromarray(rgb)
+	return img.resize(size, Image.Resampling.BILINEAR) if size else img
+
+
+def heatmap_overlay(
+	puzzle_img: Image.Image,
+	result: dict,
+	alpha: float = 0.5,
+	lower_is_better: bool = True,
+	tile_size: int = 2048,
+) -> Image.Image:
+	"""Blend a result's ``score_map`` over the puzzle.
+
+	Each score-map cell is the top-left of one candidate position; the map is
+	shifted by half the piece so the colour sits under the piece centre. The
+	blend is composited per ``tile_size`` tile straight into the output, so
+	only that output is held at full resolution; each tile's heat is scaled
+	up from the coarse map on demand.
+	"""
+	scale = result.get("coarse_scale_factor", 1.0)
+	piece_w, piece_h = result["piece_size_final"]
+	heat = score_heatmap(result["score_map"], lower_is_better)
+	# Placement of the heat at full resolution
+	heat_left, heat_top = piece_w // 2, piece_h // 2
+	heat_w, heat_h = max(1, round(heat.width / scale)), max(1, round(heat.height / scale))
+	fx, fy = heat.width / heat_w, heat.height / heat_h
+	width, height = puzzle_img.size
+	out = Image.new("RGB", (width, height))
+	for top in range(0, height, tile_size):
+		for left in range(0, width, tile_size):
+			box = (left, top, min(left + tile_size, width), min(top + tile_size, height))
+			base = puzzle_img.crop(box).convert("RGB")
+			layer = Image.new("RGB", base.size, _UNSEARCHED_RGB)
+			il, it = max(box[0], heat_left), max(box[1], heat_top)
+			ir, ib = min(box[2], heat_left + heat_w), min(box[3], heat_top + heat_h)
+			if ir > il and ib > it:
+				src_box = ((il - heat_left) * fx, (it - heat_top) * fy, (ir - heat_left) * fx, (ib - heat_top) * fy)
+				layer.paste(heat.resize((ir - il, ib - it), Image.Resampling.BILINEAR, box=src_box), (il - left, it - top))
+			out.paste(Image.blend(base, layer, alpha), box[:2])
+	return out
+
+
+def _result_boxes(results) -> tuple[np.ndarray, ...]:
+	boxes = np.array(
+		[(*r["position"], *r["size"]) for r in results], dtype=np.int64
+	).reshape(-1, 4)
+	x0, y0 = boxes[:, 0], boxes[:, 1]
+	return x0, y0, x0 + boxes[:, 2], y0 + boxes[:, 3]
+
+
+def annotate_results(
+	puzzle_img: Image.Image,
+	results,
+	color: str = "#0066FF",
+	line_width: int = 3,
+	labels: bool = True,
+	box: tuple[int, int, int, int] | None = None,
+) -> Image.Image:
+	"""Full-resolution copy of ``puzzle_img`` (or its ``box`` region) with results drawn.
+
+	``results`` are GUI/session entries (``position``, ``size``, ``piece_id``).
+	"""
+	x0, y0, x1, y1 = _result_boxes(results)
+	left, top, right, bottom = box or (0, 0, *puzzle_img.size)
+	img = puzzle_img.crop((left, top, right, bottom)).convert("RGB")
+	rgb = ImageColor.getrgb(color)[:3]
+	draw = ImageDraw.Draw(img)
+	# Cull against the tile for all results at once; only visible ones are drawn
+	visible = np.flatnonzero((x1 > left) & (x0 < right) & (y1 > top) & (y0 < bottom))
+	for i in visible:
+		bx, by = int(x0[i]) - left, int(y0[i]) - top
+		draw.rectangle([bx, by, int(x1[i]) - left - 1, int(y1[i]) - top - 1], outline=rgb, width=line_width)
+		if labels:
+			draw.text((bx + line_width + 2, by + line_width + 2), str(results[i]["piece_id"]), fill=rgb)
+	return img
+
+
+def save_tiled_png(
+	puzzle_img: Image.Image,
+	out_dir: str,
+	results=None,
+	tile_size: int = 2048,
+	prefix: str = "tile",
+	compress_level: int = 1,
+	**annotate_kwargs,
+) -> str:
+	"""Write the (optionally annotated) puzzle as PNG tiles plus an ``index.json``.
+
+	Only one tile is rendered at a time, so puzzles far larger than what fits
+	comfortably in memory as one annotated copy can be exported. Returns the
+	path of the index file (tile grid, tile size, file names). PNG encoding
+	dominates the cost; ``compress_level`` 1 trades size for speed.
+	"""
+	os.makedirs(out_dir, exist_ok=True)
+	width, height = puzzle_img.size
+	tiles = []
+	for top in range(0, height, tile_size):
+		for left in range(0, width, tile_size):
+			box = (left, top, min(left + tile_size, width), min(top + tile_size, height))
+			if results:
+				img = annotate_results(puzzle_img, results, box=box, **annotate_kwargs)
+			else:
+				img = puzzle_img.crop(box)
+			name = f"{prefix}_r{top // tile_size:03d}_c{left // tile_size:03d}.png"
+			img.save(os.path.join(out_dir, name), compress_level=compress_level)
+			tiles.append({"file": name, "box": box})
+	index_path = os.path.join(out_dir, "index.json")
+	with open(index_path, "w", encoding="utf-8") as f:
+		json.dump({"size": [width, height], "tile_size": tile_size, "tiles": tiles}, f, indent=2)
+	return index_path
+
+
+__all__ = [
+	"score_heatmap",
+	"heatmap_overlay",
+	"annotate_results",
+	"save_tiled_png",
+	"save_score_map",
+	"load_score_map",
+]
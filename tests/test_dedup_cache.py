@@ -0,0 +1,54 @@
+"""Deduplicated batches check the cache first and never re-hash known pieces."""
+
+import numpy as np
+from PIL import Image
+
+import src.dedup as dedup
+from src.matching import MatchSession
+from src.result_cache import MatchCache
+
+
+def _pieces(tmp_path):
+	rng = np.random.default_rng(3)
+	puzzle = Image.fromarray(rng.integers(0, 255, (40, 60, 3), dtype=np.uint8)).resize((480, 320), Image.Resampling.BICUBIC)
+	paths = []
+	for i, (x, y) in enumerate([(40, 40), (200, 120), (320, 200)]):
+		path = tmp_path / f"piece_{i}.png"
+		puzzle.crop((x, y, x + 60, y + 60)).save(path)
+		paths.append(str(path))
+	# A second scan of piece 1 (re-encoded, same pixels)
+	copy = tmp_path / "piece_1_again.png"
+	Image.open(paths[1]).save(copy, compress_level=9)
+	paths.append(str(copy))
+	return puzzle, paths
+
+
+def test_cached_rerun_skips_hashing(tmp_path, monkeypatch):
+	puzzle, paths = _pieces(tmp_path)
+	hashed = []
+	real = dedup.image_hashes
+	monkeypatch.setattr(dedup, "image_hashes", lambda sources, *a, **k: hashed.append(len(sources)) or real(sources, *a, **k))
+	with MatchCache(str(tmp_path / "cache.sqlite")) as cache:
+		runs = []
+		for _ in range(2):
+			session = MatchSession(puzzle, cache=cache, puzzle_key="puzzle")
+			runs.append(dict(session.iter_batch(paths, dedup=True, num_pieces=40, max_workers=1)))
+	first, second = runs
+	assert hashed == [4]
+	assert first[3]["duplicate_of"] == 1 and second[3]["duplicate_of"] == 1
+	assert all(second[i].get("cached") for i in range(4))
+	assert second[1]["best_position"] == first[1]["best_position"]
+
+
+def test_cached_pieces_without_stored_hash_are_not_decoded(tmp_path, monkeypatch):
+	puzzle, paths = _pieces(tmp_path)
+	with MatchCache(str(tmp_path / "cache.sqlite")) as cache:
+		list(MatchSession(puzzle, cache=cache, puzzle_key="puzzle").iter_batch(paths[:3], num_pieces=40, max_workers=1))
+		hashed = []
+		real = dedup.image_hashes
+		monkeypatch.setattr(dedup, "image_hashes", lambda sources, *a, **k: hashed.append(list(sources)) or real(sources, *a, **k))
+		results = dict(MatchSession(puzzle, cache=cache, puzzle_key="puzzle").iter_batch(
+			paths, dedup=True, num_pieces=40, max_workers=1))
+	# Only the uncached copy is hashed; it is matched on its own
+	assert hashed == [[paths[3]]]
+	assert len(results) == 4 and "error" not in results[3]
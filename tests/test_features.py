@@ -0,0 +1,24 @@
+"""Dominant colours are computed in bounded chunks with unchanged results."""
+
+import numpy as np
+from PIL import Image
+
+from src.features import dominant_color, dominant_colors_batch
+
+
+def test_chunked_batch_matches_single_pass():
+	rng = np.random.default_rng(4)
+	images = [Image.fromarray(rng.integers(0, 255, (32, 48, 3), dtype=np.uint8)) for _ in range(40)]
+	for iterations in (0, 3):
+		whole = dominant_colors_batch(images, iterations=iterations, chunk_size=1000)
+		assert dominant_colors_batch(images, iterations=iterations, chunk_size=7) == whole
+		assert [dominant_color(img, iterations=iterations) for img in images[:5]] == whole[:5]
+
+
+def test_dominant_color_ignores_transparent_background():
+	rgba = np.zeros((64, 64, 4), dtype=np.uint8)
+	rgba[..., :3] = (250, 10, 10)
+	rgba[16:48, 16:48] = (20, 200, 40, 255)
+	r, g, b = dominant_color(Image.fromarray(rgba, "RGBA"))
+	assert abs(r - 20) <= 8 and abs(g - 200) <= 8 and abs(b - 40) <= 8
+	assert dominant_colors_batch([]) == []
@@ -0,0 +1,45 @@
+"""Regression tests: ``ImageArray`` and matching on ``LazyImage`` handles."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.acquisition import LazyImage, load_images
+from src.imagearray import ImageArray, as_image_array
+from src.matching import MatchSession
+
+
+@pytest.fixture
+def puzzle_and_piece(tmp_path):
+	rng = np.random.default_rng(0)
+	small = Image.fromarray(rng.integers(0, 255, (40, 60, 3), dtype=np.uint8))
+	puzzle = small.resize((480, 320), Image.Resampling.BICUBIC)
+	piece_path = tmp_path / "piece.png"
+	puzzle.crop((200, 120, 260, 180)).save(piece_path)
+	return puzzle, str(piece_path)
+
+
+def test_as_image_array_decodes_lazy_image(puzzle_and_piece):
+	_, piece_path = puzzle_and_piece
+	arr = as_image_array(LazyImage(piece_path))
+	assert isinstance(arr, ImageArray)
+	assert arr.rgb.shape == (60, 60, 3)
+	assert arr.rgb.dtype == np.uint8
+	assert arr.alpha is None
+	assert np.array_equal(arr.rgb, np.asarray(Image.open(piece_path).convert("RGB")))
+
+
+def test_lazy_image_views(puzzle_and_piece):
+	_, piece_path = puzzle_and_piece
+	arr = ImageArray(load_images([piece_path])[0])
+	assert isinstance(arr.image, Image.Image)
+	assert arr.resized((30, 30)).rgb.shape == (30, 30, 3)
+	assert arr.region((0, 0, 10, 20)).shape == (20, 10, 3)
+
+
+def test_match_session_accepts_lazy_image(puzzle_and_piece):
+	puzzle, piece_path = puzzle_and_piece
+	result = MatchSession(puzzle).match(LazyImage(piece_path), num_pieces=40)
+	assert "error" not in result
+	x, y = result["best_position"]
+	assert abs(x - 200) <= 2 and abs(y - 120) <= 2
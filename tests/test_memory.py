@@ -0,0 +1,42 @@
+"""Memory plans budget the piece, and matching stays within the plan."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.memory import benchmark_memory, plan_matching_memory
+
+
+@pytest.fixture(scope="module")
+def puzzle_and_piece():
+	rng = np.random.default_rng(1)
+	small = Image.fromarray(rng.integers(0, 255, (60, 90, 3), dtype=np.uint8))
+	puzzle = small.resize((2400, 1600), Image.Resampling.BICUBIC)
+	# The piece is photographed larger than it appears in the puzzle
+	piece = puzzle.crop((900, 600, 1300, 1000)).resize((800, 800), Image.Resampling.BICUBIC)
+	return puzzle, piece
+
+
+def test_plan_budgets_piece():
+	without = plan_matching_memory((7552, 5037), 8 << 20)
+	with_piece = plan_matching_memory((7552, 5037), 8 << 20, piece_size=(1259, 1259), scale_candidates=[1.0, 1.2])
+	assert with_piece["estimated_bytes"] <= with_piece["budget"]
+	assert not with_piece["piece_full_res"]
+	assert with_piece["refine_scale"] < 1.0
+	assert without["piece_full_res"] and without["refine_scale"] == 1.0
+
+
+def test_plan_reports_unmet_budget():
+	plan = plan_matching_memory((7552, 5037), 64 << 10, piece_size=(1259, 1259), scale_candidates=[1.0])
+	assert plan["fits"] is False
+	assert plan["estimated_bytes"] > plan["budget"]
+
+
+def test_benchmark_peak_within_budget(puzzle_and_piece):
+	puzzle, piece = puzzle_and_piece
+	report = benchmark_memory(puzzle, piece, budgets=(4 << 20, 1 << 20), num_pieces=24)
+	for row in report:
+		assert row["plan"]["fits"]
+		assert row["within_budget"], row
+		x, y = row["position"]
+		assert abs(x - 900) <= 12 and abs(y - 600) <= 12
@@ -0,0 +1,26 @@
+"""Patch-index localisation on the piece handles the GUI passes (``LazyImage``)."""
+
+import numpy as np
+from PIL import Image
+
+from src.acquisition import LazyImage
+from src.matching import MatchSession
+
+
+def test_locate_lazy_image_pieces(tmp_path):
+	rng = np.random.default_rng(1)
+	small = Image.fromarray(rng.integers(0, 255, (60, 80, 3), dtype=np.uint8))
+	puzzle = small.resize((1200, 900), Image.Resampling.BICUBIC)
+	session = MatchSession(puzzle)
+	pieces = []
+	for i, (x, y) in enumerate([(150, 120), (600, 450), (900, 600)]):
+		path = tmp_path / f"piece_{i}.png"
+		# Scanned at another resolution than the puzzle photo
+		puzzle.crop((x, y, x + 150, y + 150)).resize((100, 100), Image.Resampling.LANCZOS).save(path)
+		pieces.append(((x, y), LazyImage(str(path))))
+	for (x, y), piece in pieces:
+		result = session.locate(piece, num_pieces=48)
+		assert "error" not in result
+		assert result["method"] == "patch_ann"
+		px, py = result["best_position"]
+		assert abs(px - x) < 40 and abs(py - y) < 40
@@ -0,0 +1,66 @@
+"""Loaded sessions are drawn from their columns and read back as entries."""
+
+import numpy as np
+import pytest
+
+from src.results_io import ResultWriter, SessionRecords, read_session
+from src.viewer import OverlayLayer
+
+ENTRIES = [
+	{"piece_id": 3, "position": (10, 20), "size": (30, 40), "similarity": 0.91, "scale": 1.1, "path": "a.png"},
+	{"piece_id": 7, "position": (50, 60), "size": (30, 40), "similarity": 0.88, "scale": 1.0,
+	 "duplicate_of": 3, "path": "b.png"},
+]
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".npz"])
+def test_session_records_round_trip(tmp_path, suffix):
+	path = str(tmp_path / f"session{suffix}")
+	with ResultWriter(path, puzzle_path="puzzle.jpg", puzzle_size=(100, 100)) as out:
+		for entry in ENTRIES:
+			out.write(entry)
+	header, cols = read_session(path)
+	records = SessionRecords(cols)
+	assert header["puzzle_path"] == "puzzle.jpg"
+	assert len(records) == 2
+	assert records[1]["position"] == (50, 60) and records[1]["duplicate_of"] == 3
+	assert records[0]["duplicate_of"] is None and records[0]["path"] == "a.png"
+	assert [r["piece_id"] for r in records] == [3, 7]
+
+
+def test_overlay_columns_match_entries(tmp_path):
+	path = str(tmp_path / "session.jsonl")
+	with ResultWriter(path) as out:
+		for entry in ENTRIES:
+			out.write(entry)
+	_, cols = read_session(path)
+	from_columns = OverlayLayer()
+	from_columns.add_columns(
+		cols["x"], cols["y"], cols["width"], cols["height"], cols["piece_id"], cols["similarity"],
+		["#0066FF", "#FF8800"],
+	)
+	from_entries = OverlayLayer()
+	from_entries.add([dict(e, color=c) for e, c in zip(ENTRIES, ["#0066FF", "#FF8800"])])
+	for name in ("x", "y", "w", "h", "piece_id", "similarity"):
+		assert np.array_equal(from_columns.column(name), from_entries.column(name))
+	for i in range(2):
+		assert from_columns.label(i) == from_entries.label(i)
+		assert from_columns.color(i) == from_entries.color(i)
+	assert from_columns.label(1) == ("7", "(88%)")
+	assert from_columns.hit_test(55, 65) == 1
+
+
+def test_overlay_shares_session_columns(tmp_path):
+	path = str(tmp_path / "session.npz")
+	with ResultWriter(path) as out:
+		for i in range(50):
+			out.write(dict(ENTRIES[0], piece_id=i, position=(i * 40, 0)))
+	_, cols = read_session(path)
+	layer = OverlayLayer()
+	layer.add_columns(cols["x"], cols["y"], cols["width"], cols["height"], cols["piece_id"], cols["similarity"])
+	assert np.shares_memory(layer.column("x"), cols["x"])
+	assert np.shares_memory(layer.column("similarity"), cols["similarity"])
+	# Streamed results after a load go to a separate tail chunk
+	layer.add([dict(ENTRIES[1], position=(5000, 5000))])
+	assert len(layer) == 51 and layer.hit_test(5010, 5010) == 50
+	assert layer.label(50) == ("7", "(88%)")
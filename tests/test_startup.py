@@ -0,0 +1,27 @@
+"""The CLI entry point starts without loading Pillow or NumPy."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_cli_import_is_light():
+	probe = "import sys, src.main; print(sorted({'PIL', 'numpy'} & set(sys.modules)))"
+	out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+	assert out.stdout.strip() == "[]"
+
+
+def test_cli_prewarms_match(monkeypatch):
+	import src.main
+	import src.startup
+
+	calls = []
+	monkeypatch.setattr(src.startup, "start_prewarm", lambda match=True: calls.append(match))
+	monkeypatch.setattr(src.main, "load_puzzle", lambda: (_ for _ in ()).throw(KeyboardInterrupt))
+	try:
+		src.main.main()
+	except KeyboardInterrupt:
+		pass
+	assert calls == [True]
@@ -0,0 +1,44 @@
+"""Overlay index: streamed results are indexed without rebuilding every row."""
+
+import numpy as np
+
+from src.viewer import OverlayLayer
+
+
+def _brute_box(x, y, w, h, box):
+	x0, y0, x1, y1 = box
+	return np.flatnonzero((x < x1) & (x + w > x0) & (y < y1) & (y + h > y0))
+
+
+def test_streamed_results_use_side_index():
+	rng = np.random.default_rng(0)
+	n = 20000
+	layer = OverlayLayer()
+	layer.add_columns(
+		rng.integers(0, 10000, n), rng.integers(0, 10000, n), np.full(n, 50), np.full(n, 50),
+		np.arange(n), np.full(n, 0.9, dtype=np.float32),
+	)
+	layer.query_box(0, 0, 1, 1)
+	main = layer._index
+	for i in range(200):
+		layer.add([{"piece_id": n + i, "position": (int(rng.integers(0, 10000)), int(rng.integers(0, 10000))),
+		            "size": (30, 30), "similarity": 0.5}])
+		box = (1000, 1000, 3000, 2500)
+		found = np.sort(layer.query_box(*box))
+		expected = _brute_box(layer.column("x"), layer.column("y"), layer.column("w"), layer.column("h"), box)
+		assert np.array_equal(found, expected)
+	assert layer._index is main
+	# A new small rectangle inside an old one wins the hit test
+	layer.add([{"piece_id": -1, "position": (5000, 5000), "size": (5, 5)}])
+	layer.add_columns([4990], [4990], [40], [40], [-2], [0.1])
+	assert layer.hit_test(5002, 5002) == len(layer) - 2
+
+
+def test_side_index_merges_past_threshold():
+	layer = OverlayLayer()
+	layer.add([{"piece_id": 0, "position": (0, 0), "size": (10, 10)}])
+	layer.hit_test(5, 5)
+	for i in range(OverlayLayer.SIDE_INDEX_MIN + 1):
+		layer.add([{"piece_id": i + 1, "position": (20 * i, 50), "size": (10, 10)}])
+	assert layer.hit_test(20 * 7 + 5, 55) == 8
+	assert layer._indexed == len(layer) and layer._recent is None
@@ -0,0 +1,47 @@
+"""Score maps keep raw scores finite; heatmap overlays composite per tile."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.matching import multi_scale_template_match
+from src.visualization import heatmap_overlay, load_score_map, save_score_map
+
+
+@pytest.fixture(scope="module")
+def puzzle_and_piece():
+	rng = np.random.default_rng(2)
+	small = Image.fromarray(rng.integers(0, 255, (40, 60, 3), dtype=np.uint8))
+	puzzle = small.resize((1200, 800), Image.Resampling.BICUBIC)
+	return puzzle, puzzle.crop((450, 300, 650, 500))
+
+
+def test_raw_sqdiff_score_map_stays_finite(puzzle_and_piece):
+	puzzle, piece = puzzle_and_piece
+	result = multi_scale_template_match(puzzle, piece, num_pieces=24, method="SQDIFF", keep_score_map=True)
+	score_map = result["score_map"]
+	assert score_map.dtype == np.float32
+	assert not np.isinf(score_map).any()
+	assert np.nanmax(score_map) > np.finfo(np.float16).max
+
+
+def test_normalised_score_map_is_half_precision(puzzle_and_piece):
+	puzzle, piece = puzzle_and_piece
+	result = multi_scale_template_match(puzzle, piece, num_pieces=24, keep_score_map=True)
+	assert result["score_map"].dtype == np.float16
+
+
+def test_save_score_map_keeps_large_values(tmp_path):
+	path = str(tmp_path / "scores.npy")
+	save_score_map(path, np.array([[1.0, 1e6], [np.nan, 2.0]], dtype=np.float32))
+	loaded = load_score_map(path)
+	assert loaded.dtype == np.float32 and loaded[0, 1] == 1e6
+
+
+def test_heatmap_overlay_tiles_match_single_tile(puzzle_and_piece):
+	puzzle, piece = puzzle_and_piece
+	result = multi_scale_template_match(puzzle, piece, num_pieces=24, keep_score_map=True)
+	whole = np.asarray(heatmap_overlay(puzzle, result, tile_size=4096), dtype=np.int16)
+	tiled = np.asarray(heatmap_overlay(puzzle, result, tile_size=300), dtype=np.int16)
+	assert tiled.shape == (800, 1200, 3)
+	assert np.abs(whole - tiled).max() <= 1